@@ -0,0 +1,173 @@
+"""
+Check that the pgvector ann search is served by the vector index (hnsw or ivfflat).
+
+It creates a collection of --rows random vectors, builds its vector index, then runs EXPLAIN on the
+search sql of the provider (PgVectorDBProvider.prepare_search, the same sql and SET LOCALs as
+search_by_vector) for each accuracy profile. The plan must have an Index Scan using the vector index
+of the collection, except for the exact profile which disables it. Exits with status 1 when a plan
+doesn't match. The collection is dropped at the end (unless --keep).
+tests/test_pgvector_explain.py runs the same checks with pytest.
+
+Needs the postgres database of the .env (with the vector extension), run from src/:
+
+    python -m benchmarks.pgvector_explain --rows 10000 --dim 64
+    python -m benchmarks.pgvector_explain --layout partitioned --index-type ivfflat
+"""
+from helpers import get_settings
+from stores.vector_db.providers import PgVectorDBProvider, PgVectorPartitionedDBProvider
+from stores.vector_db.vector_db_enums import PgVectorLayoutEnum
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import text as sql_text
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+
+def random_vector(dimension: int) -> list:
+    return [random.uniform(-1, 1) for _ in range(dimension)]
+
+
+def iter_plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+async def get_vector_index_names(db_client, table_name: str) -> set:
+    """hnsw/ivfflat indexes of the table, or of its partitions for the partitioned layout."""
+    async with db_client() as session:
+        result = await session.execute(sql_text("""
+            SELECT ic.relname
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = ic.relam
+            WHERE am.amname IN ('hnsw', 'ivfflat')
+              AND (i.indrelid = to_regclass(:table_name)
+                   OR i.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table_name)))
+        """), {"table_name": table_name})
+        return set(result.scalars().all())
+
+
+async def explain_search(provider, collection_name: str, dimension: int, top_k: int, accuracy: str) -> dict:
+    metadata = await provider.get_collection_metadata(collection_name)
+    async with provider.db_client() as session:
+        async with session.begin():
+            search_sql, params = await provider.prepare_search(
+                session, collection_name, metadata, random_vector(dimension), top_k, accuracy=accuracy
+            )
+            result = await session.execute(sql_text("EXPLAIN (FORMAT JSON) " + search_sql), params)
+            plan = result.scalar_one()
+    # asyncpg returns the json plan as text
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]["Plan"]
+
+
+def get_db_client(settings):
+    postgres_conn = f"postgresql+asyncpg://{settings.POSTGRESQL_USERNAME}:{settings.POSTGRESQL_PASSWORD}@/{settings.POSTGRESQL_MAIN_DB}{settings.ADDITIONAL_GCP}"
+    engine = create_async_engine(postgres_conn)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def check_index_plans(db_client, settings, layout: str, index_type: str, rows: int, dim: int, top_k: int,
+                            project_id: int, keep: bool = False):
+    """
+    Load the collection and EXPLAIN its search for each accuracy profile.
+    Returns (vector index names, [(accuracy, uses_vector_index, expected, plan)]).
+    """
+    provider_args = dict(
+        db_client=db_client,
+        default_distance_method=settings.VECTOR_DB_DISTANCE_METRIC,
+        default_vector_dimension=dim,
+        index_threshold=1,
+        index_type=index_type,
+        search_profiles=settings.VECTOR_DB_SEARCH_PROFILES,
+        default_search_profile=settings.VECTOR_DB_SEARCH_DEFAULT_PROFILE,
+        iterative_scan=settings.VECTOR_DB_PGVEC_ITERATIVE_SCAN
+    )
+    if layout == PgVectorLayoutEnum.PARTITIONED.value:
+        provider = PgVectorPartitionedDBProvider(**provider_args, partitions_count=settings.VECTOR_DB_PGVEC_PARTITIONS)
+    else:
+        provider = PgVectorDBProvider(**provider_args)
+
+    collection_name = f"collection_{dim}_{project_id}"
+    results = []
+    try:
+        await provider.connect()
+        await provider.create_collection(collection_name, dim, do_reset=True)
+        await provider.begin_bulk_load(collection_name)
+        await provider.insert_many(
+            collection_name,
+            texts=[f"chunk {i}" for i in range(rows)],
+            vectors=[random_vector(dim) for _ in range(rows)],
+            record_ids=[None] * rows
+        )
+        # the table per collection layout builds its index in the background after the load
+        await provider.end_bulk_load(collection_name)
+        if collection_name in provider.index_tasks:
+            await provider.index_tasks[collection_name]
+
+        metadata = await provider.get_collection_metadata(collection_name)
+        table_name = metadata.get("table_name", collection_name)
+        async with db_client() as session:
+            await session.execute(sql_text(f"ANALYZE {table_name}"))
+
+        index_names = await get_vector_index_names(db_client, table_name)
+        if not index_names:
+            return index_names, results
+
+        for accuracy, search_params in settings.VECTOR_DB_SEARCH_PROFILES.items():
+            plan = await explain_search(provider, collection_name, dim, top_k, accuracy)
+            scanned_indexes = {
+                node.get("Index Name") for node in iter_plan_nodes(plan)
+                if node["Node Type"] in ("Index Scan", "Index Only Scan")
+            }
+            # the exact profile turns the index scans off on purpose
+            results.append((accuracy, bool(scanned_indexes & index_names), not search_params.get("exact"), plan))
+    finally:
+        if not keep:
+            await provider.delete_collection(collection_name)
+        await provider.disconnect()
+
+    return index_names, results
+
+
+async def main(args) -> int:
+    settings = get_settings()
+    engine, db_client = get_db_client(settings)
+    try:
+        index_names, results = await check_index_plans(db_client, settings, args.layout, args.index_type, args.rows,
+                                                       args.dim, args.top_k, args.project_id, keep=args.keep)
+    finally:
+        await engine.dispose()
+
+    print(f"vector indexes: {', '.join(sorted(index_names)) or 'none'}")
+    if not index_names:
+        return 1
+
+    failures = 0
+    for accuracy, uses_vector_index, expected, plan in results:
+        status = "ok" if uses_vector_index == expected else "FAILED"
+        if status == "FAILED":
+            failures += 1
+        print(f"{accuracy:<10} {'index scan' if uses_vector_index else 'no vector index scan':<22} {status}")
+        if status == "FAILED" or args.verbose:
+            print(json.dumps(plan, indent=2))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check with EXPLAIN that the pgvector search uses the vector index.")
+    parser.add_argument("--layout", default=PgVectorLayoutEnum.TABLE_PER_COLLECTION.value,
+                        choices=[layout.value for layout in PgVectorLayoutEnum])
+    parser.add_argument("--index-type", default="hnsw", choices=["hnsw", "ivfflat"])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=64, help="use a dimension the app doesn't use")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--project-id", type=int, default=900000)
+    parser.add_argument("--keep", action="store_true", help="keep the created collection")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    sys.exit(asyncio.run(main(parser.parse_args())))
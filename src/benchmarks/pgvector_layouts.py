@@ -0,0 +1,151 @@
+"""
+Benchmark of the two pgvector layouts (table per collection vs partitioned) with many small projects.
+
+For each layout it creates N collections of R random vectors, then measures the catalog size
+(relations and indexes created), the disk size, list_all_collections, and the search latency
+on random projects, with a cold and a warm provider metadata cache. Everything it creates uses
+a dedicated dimension and project ids starting at --first-project-id, and is dropped at the end
+(unless --keep).
+
+Needs the postgres database of the .env, run from src/:
+
+    python -m benchmarks.pgvector_layouts --projects 10000 --rows 20 --dim 64
+"""
+from helpers import get_settings
+from stores.vector_db.providers import PgVectorDBProvider, PgVectorPartitionedDBProvider
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import text as sql_text
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+
+def collection_name(dimension: int, project_id: int) -> str:
+    return f"collection_{dimension}_{project_id}"
+
+
+def random_vector(dimension: int) -> list:
+    return [random.uniform(-1, 1) for _ in range(dimension)]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def catalog_stats(db_client, name_pattern: str) -> dict:
+    async with db_client() as session:
+        result = await session.execute(sql_text("""
+            SELECT COUNT(*) FILTER (WHERE relkind IN ('r', 'p')) AS tables,
+                   COUNT(*) FILTER (WHERE relkind IN ('i', 'I')) AS indexes,
+                   COALESCE(SUM(pg_total_relation_size(oid)) FILTER (WHERE relkind = 'r'), 0) AS total_bytes
+            FROM pg_class
+            WHERE relname LIKE :name_pattern
+        """), {"name_pattern": name_pattern})
+        return dict(result.first()._mapping)
+
+
+async def timed(coroutine) -> float:
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+async def search_latencies(provider, project_ids: list, dimension: int, top_k: int) -> list:
+    latencies = []
+    for project_id in project_ids:
+        latencies.append(await timed(provider.search_by_vector(
+            collection_name(dimension, project_id), random_vector(dimension), top_k=top_k
+        )))
+    return latencies
+
+
+async def run_layout(name: str, make_provider, db_client, args, name_pattern: str):
+    project_ids = list(range(args.first_project_id, args.first_project_id + args.projects))
+    provider = make_provider()
+
+    start = time.perf_counter()
+    for project_id in project_ids:
+        collection = collection_name(args.dim, project_id)
+        await provider.create_collection(collection, args.dim)
+        await provider.insert_many(
+            collection,
+            texts=[f"chunk {i} of project {project_id}" for i in range(args.rows)],
+            vectors=[random_vector(args.dim) for _ in range(args.rows)],
+            record_ids=[None] * args.rows
+        )
+    load_seconds = time.perf_counter() - start
+
+    async with db_client() as session:
+        await session.execute(sql_text("ANALYZE"))
+
+    stats = await catalog_stats(db_client, name_pattern)
+    list_seconds = await timed(provider.list_all_collections())
+
+    sample = random.sample(project_ids, min(args.searches, len(project_ids)))
+    # a new provider starts with an empty metadata cache
+    cold_latencies = await search_latencies(make_provider(), sample, args.dim, args.top_k)
+    warm_latencies = await search_latencies(provider, sample, args.dim, args.top_k)
+
+    print(f"\n== {name} ({args.projects} projects x {args.rows} rows, dim {args.dim})")
+    print(f"load:                 {load_seconds:10.2f} s")
+    print(f"tables / indexes:     {stats['tables']:10d} / {stats['indexes']}")
+    print(f"size:                 {stats['total_bytes'] / 1024 / 1024:10.1f} MB")
+    print(f"list_all_collections: {list_seconds * 1000:10.1f} ms")
+    for label, latencies in (("search cold", cold_latencies), ("search warm", warm_latencies)):
+        print(f"{label + ':':<22}{statistics.median(latencies) * 1000:10.2f} ms p50, "
+              f"{percentile(latencies, 0.95) * 1000:.2f} ms p95")
+
+    if not args.keep:
+        for project_id in project_ids:
+            await provider.delete_collection(collection_name(args.dim, project_id))
+
+
+async def main(args):
+    settings = get_settings()
+    postgres_conn = f"postgresql+asyncpg://{settings.POSTGRESQL_USERNAME}:{settings.POSTGRESQL_PASSWORD}@/{settings.POSTGRESQL_MAIN_DB}{settings.ADDITIONAL_GCP}"
+    engine = create_async_engine(postgres_conn)
+    db_client = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    provider_args = dict(
+        db_client=db_client,
+        default_distance_method=settings.VECTOR_DB_DISTANCE_METRIC,
+        default_vector_dimension=args.dim,
+        index_threshold=settings.VECTOR_DB_PGVEC_INDEX_THRESHOLD
+    )
+    try:
+        await PgVectorDBProvider(**provider_args).connect()
+        await run_layout(
+            "table_per_collection", lambda: PgVectorDBProvider(**provider_args), db_client, args,
+            name_pattern=f"collection\\_{args.dim}\\_%"
+        )
+        await run_layout(
+            "partitioned", lambda: PgVectorPartitionedDBProvider(
+                **provider_args,
+                partitions_count=args.partitions,
+                iterative_scan=settings.VECTOR_DB_PGVEC_ITERATIVE_SCAN
+            ), db_client, args,
+            name_pattern=f"pgvector\\_{args.dim}%"
+        )
+        if not args.keep:
+            async with db_client() as session:
+                async with session.begin():
+                    await session.execute(sql_text(f"DROP TABLE IF EXISTS pgvector_{args.dim}"))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the pgvector table-per-collection and partitioned layouts.")
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--rows", type=int, default=20, help="vectors per project")
+    parser.add_argument("--dim", type=int, default=64, help="use a dimension the app doesn't use")
+    parser.add_argument("--partitions", type=int, default=64)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--first-project-id", type=int, default=900000)
+    parser.add_argument("--keep", action="store_true", help="keep the created tables")
+    asyncio.run(main(parser.parse_args()))
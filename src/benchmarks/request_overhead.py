@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the per-request setup overhead of the api routes.
+
+"before" rebuilds what a /process request used to build: Settings() from .env once per
+controller/model (6 times), plus a fresh NLPCntroller, ProjectModel, AssetModel and ChunkModel.
+"after" reads the app-scoped singletons built at startup and the cached settings.
+
+Run from src/:  python -m benchmarks.request_overhead
+"""
+from helpers.config import Settings, get_settings
+from controllers import NLPCntroller
+from models import ProjectModel, AssetModel, ChunkModel
+from types import SimpleNamespace
+import timeit
+
+
+def build_app_state():
+    # clients are not used by the constructors, so placeholders are enough
+    app = SimpleNamespace(db_client=None, vector_db_client=None, generation_client=None,
+                          embedding_client=None, template_parser=None, embedding_cache=None, answer_cache=None)
+    app.project_model = ProjectModel(app.db_client)
+    app.asset_model = AssetModel(app.db_client)
+    app.chunk_model = ChunkModel(app.db_client)
+    app.nlp_controller = NLPCntroller(app.vector_db_client, app.generation_client, app.embedding_client)
+    return app
+
+
+def request_before(app):
+    for _ in range(6):
+        Settings()
+    NLPCntroller(app.vector_db_client, app.generation_client, app.embedding_client,
+                 template_parser=app.template_parser, embedding_cache=app.embedding_cache)
+    ProjectModel(app.db_client)
+    AssetModel(app.db_client)
+    ChunkModel(app.db_client)
+
+
+def request_after(app):
+    get_settings()
+    app.nlp_controller, app.project_model, app.asset_model, app.chunk_model
+
+
+def run(name, func, number):
+    total = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{name:<32} {total / number * 1e6:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    app = build_app_state()
+    run("Settings() (uncached)", Settings, 200)
+    run("get_settings() (cached)", get_settings, 200000)
+    run("/process setup, before", lambda: request_before(app), 200)
+    run("/process setup, after", lambda: request_after(app), 2000)
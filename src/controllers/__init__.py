@@ -3,3 +3,8 @@ from .project_controller import ProjectController
 from .process_controller import ProcessController
 from .base_controller import BaseController
 from .nlp_controller import NLPCntroller
+from .embedding_cache_controller import EmbeddingCacheController
+from .embedding_batch_controller import EmbeddingBatchController
+from .answer_cache_controller import AnswerCacheController
+from .rag_context_controller import RAGContextController
+from .job_controller import JobController, JobCancelledError
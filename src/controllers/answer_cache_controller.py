@@ -0,0 +1,170 @@
+from .base_controller import BaseController
+from models import ProjectModel
+from collections import OrderedDict
+import logging
+import numpy as np
+import time
+import unicodedata
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class AnswerCacheController(BaseController):
+    """
+    Per-project in-memory cache of RAG answers.
+    Lookups match the normalized query text first, then (when a similarity threshold is set)
+    the cached query whose embedding is the closest by cosine similarity, scored with one matrix product
+    over the cached query vectors of the same (top_k, variant).
+    A project's entries are dropped whenever its collection is re-indexed or reset, and its generation
+    is bumped: an answer computed from a generation read before the invalidation is not stored.
+    With a db_client the generation is the `answer_cache_generation` column of the project, shared by all the
+    processes (api workers, external job workers): it is read before each lookup and a process that sees it
+    changed drops its entries of the project. Without one it only lives in this process.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, semantic_threshold: float = None,
+                 db_client=None):
+        super().__init__()
+
+        self.max_entries = max_entries if max_entries is not None else self.app_settings.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else self.app_settings.ANSWER_CACHE_TTL_SECONDS
+        self.semantic_threshold = (semantic_threshold if semantic_threshold is not None
+                                   else self.app_settings.ANSWER_CACHE_SEMANTIC_THRESHOLD)
+        # project_id -> OrderedDict((normalized query, top_k, variant) -> entry), variant tells apart
+        # the answers of the same question retrieved with other search settings (accuracy profile, filter), in LRU order
+        self.projects = {}
+        # project_id -> last known number of invalidations, read before the retrieval and checked by put
+        self.generations = {}
+        # project_id -> {(top_k, variant): (keys, matrix of their normalized query vectors)}, rebuilt after a change
+        self.semantic_indexes = {}
+        self.project_model = ProjectModel(db_client) if db_client is not None else None
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0, "stale_puts": 0}
+
+    @property
+    def is_semantic_enabled(self) -> bool:
+        return bool(self.semantic_threshold) and self.semantic_threshold > 0
+
+    def normalize_query(self, query_text: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", query_text).casefold().split())
+
+    def normalize_vector(self, vector: list) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def is_expired(self, entry: dict) -> bool:
+        return bool(self.ttl_seconds) and time.monotonic() - entry["created_at"] > self.ttl_seconds
+
+    def get_exact(self, project_id: int, query_text: str, top_k: int, variant: str = None):
+        entries = self.projects.get(project_id)
+        key = (self.normalize_query(query_text), top_k, variant)
+        entry = entries.get(key) if entries else None
+
+        if entry is None or self.is_expired(entry):
+            if entry is not None:
+                entries.pop(key, None)
+                self.semantic_indexes.pop(project_id, None)
+            return None
+
+        entries.move_to_end(key)
+        self.stats["exact_hits"] += 1
+        return entry
+
+    def get_semantic_index(self, project_id: int, top_k: int, variant: str = None):
+        indexes = self.semantic_indexes.setdefault(project_id, {})
+        index = indexes.get((top_k, variant))
+        if index is None:
+            entries = self.projects[project_id]
+            keys = [key for key, entry in entries.items()
+                    if key[1:] == (top_k, variant) and entry["query_vector"] is not None]
+            matrix = np.stack([entries[key]["query_vector"] for key in keys]) if keys else None
+            index = indexes[(top_k, variant)] = (keys, matrix)
+        return index
+
+    def get_semantic(self, project_id: int, query_vector: list, top_k: int, variant: str = None):
+        entries = self.projects.get(project_id)
+        query_vector = self.normalize_vector(query_vector) if query_vector is not None and len(query_vector) else None
+        if not self.is_semantic_enabled or not entries or query_vector is None:
+            return None
+
+        keys, matrix = self.get_semantic_index(project_id, top_k, variant)
+        if not keys:
+            return None
+
+        # best scores first, the expired entries are skipped
+        scores = matrix @ query_vector
+        best_key = None
+        for position in np.argsort(-scores):
+            if scores[position] < self.semantic_threshold:
+                break
+            if not self.is_expired(entries[keys[position]]):
+                best_key = keys[position]
+                break
+
+        if best_key is None:
+            return None
+
+        entries.move_to_end(best_key)
+        self.stats["semantic_hits"] += 1
+        return entries[best_key]
+
+    def record_miss(self):
+        self.stats["misses"] += 1
+
+    async def get_generation(self, project_id: int) -> int:
+        generation = self.generations.get(project_id, 0)
+        if self.project_model is None:
+            return generation
+
+        shared_generation = await self.project_model.get_answer_cache_generation(project_id)
+        if shared_generation > generation:
+            # invalidated by another process
+            self.drop_project(project_id)
+            self.generations[project_id] = shared_generation
+        return shared_generation
+
+    def put(self, project_id: int, query_text: str, top_k: int, answer: str, retrieved_documents: list,
+            query_vector: list = None, variant: str = None, generation: int = None):
+        # the project was re-indexed or reset while the answer was computed, it may come from the old chunks
+        if generation is not None and generation != self.generations.get(project_id, 0):
+            self.stats["stale_puts"] += 1
+            return
+
+        entries = self.projects.setdefault(project_id, OrderedDict())
+        key = (self.normalize_query(query_text), top_k, variant)
+        entries[key] = {
+            "answer": answer,
+            "retrieved_documents": retrieved_documents,
+            "query_vector": self.normalize_vector(query_vector) if query_vector is not None and len(query_vector) else None,
+            "created_at": time.monotonic()
+        }
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        self.semantic_indexes.pop(project_id, None)
+
+    async def invalidate_project(self, project_id: int):
+        # bumped even without cached entries, answers being computed are stale too
+        if self.project_model is not None:
+            generation = await self.project_model.bump_answer_cache_generation(project_id)
+        else:
+            generation = self.generations.get(project_id, 0) + 1
+        self.generations[project_id] = max(generation, self.generations.get(project_id, 0))
+        self.drop_project(project_id)
+
+    def drop_project(self, project_id: int):
+        self.semantic_indexes.pop(project_id, None)
+        if self.projects.pop(project_id, None):
+            self.stats["invalidations"] += 1
+            logger.info("Answer cache invalidated for project %s", project_id)
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": (self.stats["exact_hits"] + self.stats["semantic_hits"]) / lookups if lookups else 0.0,
+            "projects": len(self.projects),
+            "entries": sum(len(entries) for entries in self.projects.values())
+        }
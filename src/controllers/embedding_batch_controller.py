@@ -0,0 +1,107 @@
+from .base_controller import BaseController
+from helpers.metrics import Histogram
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class EmbeddingBatchController(BaseController):
+    """
+    Coalesces the single-text embeddings of concurrent requests (the search/answer queries) into batched calls.
+    The first text waits up to window_ms for others with the same document type, or less when max_batch_size
+    texts are queued, then they are embedded in one aembed_text call and each caller gets its own vector.
+    embedder is the embedding cache or the embedding client (anything with aembed_text(text, document_type)).
+    """
+
+    def __init__(self, embedder, window_ms: float = None, max_batch_size: int = None):
+        super().__init__()
+
+        self.embedder = embedder
+        self.window_ms = window_ms if window_ms is not None else self.app_settings.EMBEDDING_BATCH_WINDOW_MS
+        self.max_batch_size = max_batch_size if max_batch_size is not None else self.app_settings.EMBEDDING_BATCH_MAX_SIZE
+        # document_type -> [(text, future, enqueued_at)] waiting for the next flush
+        self.pending = {}
+        self.flush_handles = {}
+        # keep a reference to the running batches, the event loop only keeps weak ones
+        self.batch_tasks = set()
+
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.wait_ms_histogram = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000])
+        self.stats = {"batches": 0, "texts": 0, "failed_batches": 0}
+
+    async def aembed_text(self, text: str, document_type: str = None):
+        """Same result as the embedder for a single text: [vector], or None when the batch failed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        queue = self.pending.setdefault(document_type, [])
+        queue.append((text, future, time.monotonic()))
+        if len(queue) >= self.max_batch_size:
+            self.flush(document_type)
+        elif document_type not in self.flush_handles:
+            self.flush_handles[document_type] = loop.call_later(self.window_ms / 1000, self.flush, document_type)
+
+        return await future
+
+    def flush(self, document_type: str):
+        handle = self.flush_handles.pop(document_type, None)
+        if handle is not None:
+            handle.cancel()
+
+        queue = self.pending.pop(document_type, None)
+        if not queue:
+            return
+
+        task = asyncio.create_task(self.embed_batch(queue, document_type))
+        self.batch_tasks.add(task)
+        task.add_done_callback(self.batch_tasks.discard)
+
+    async def embed_batch(self, queue: list, document_type: str):
+        # skip the callers cancelled while waiting
+        queue = [item for item in queue if not item[1].done()]
+        if not queue:
+            return
+
+        now = time.monotonic()
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(queue)
+        self.batch_size_histogram.observe(len(queue))
+        for _, _, enqueued_at in queue:
+            self.wait_ms_histogram.observe((now - enqueued_at) * 1000)
+
+        # the same question asked by many clients is embedded once
+        texts = list(dict.fromkeys(text for text, _, _ in queue))
+        try:
+            vectors = await self.embedder.aembed_text(text=texts, document_type=document_type)
+        except Exception as e:
+            logger.error("Error embedding a batch of %d texts: %s", len(texts), str(e))
+            vectors = None
+
+        if not vectors or len(vectors) != len(texts):
+            self.stats["failed_batches"] += 1
+            vectors_by_text = {}
+        else:
+            vectors_by_text = dict(zip(texts, vectors))
+
+        for text, future, _ in queue:
+            # the caller may have been cancelled meanwhile
+            if not future.done():
+                vector = vectors_by_text.get(text)
+                future.set_result([vector] if vector is not None else None)
+
+    async def close(self):
+        for document_type in list(self.pending):
+            self.flush(document_type)
+        if self.batch_tasks:
+            await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "batch_size": self.batch_size_histogram.to_dict(),
+            "wait_ms": self.wait_ms_histogram.to_dict()
+        }
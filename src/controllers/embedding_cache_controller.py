@@ -0,0 +1,98 @@
+from .base_controller import BaseController
+from models import EmbeddingCacheModel
+from collections import OrderedDict
+from typing import List, Union
+import hashlib
+import logging
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class EmbeddingCacheController(BaseController):
+    """
+    Content-hash embedding cache in front of the embedding client.
+    Lookups go to an in-memory LRU first, then to the `embedding_cache` table;
+    only the remaining texts are sent to the embedding provider.
+    Entries are keyed by (backend, model id, dimension, document type, sha256 of the processed text),
+    so they are shared across projects and re-indexes.
+    """
+
+    def __init__(self, db_client, embedding_client, embedding_backend: str, lru_size: int = None):
+        super().__init__()
+
+        self.embedding_client = embedding_client
+        self.embedding_backend = embedding_backend
+        self.embedding_cache_model = EmbeddingCacheModel(db_client)
+        self.lru_size = lru_size if lru_size is not None else self.app_settings.EMBEDDING_CACHE_LRU_SIZE
+        self.lru = OrderedDict()
+
+    def get_text_hash(self, text: str) -> str:
+        # hash what the provider actually embeds, not the raw chunk
+        return hashlib.sha256(self.embedding_client.process_text(text).encode("utf-8")).hexdigest()
+
+    def get_cache_key(self, document_type: str):
+        return (
+            self.embedding_backend,
+            self.embedding_client.embedding_model_id,
+            self.embedding_client.embedding_size,
+            document_type
+        )
+
+    def lru_get(self, key):
+        embedding = self.lru.get(key)
+        if embedding is not None:
+            self.lru.move_to_end(key)
+        return embedding
+
+    def lru_put(self, key, embedding):
+        self.lru[key] = embedding
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None):
+        if isinstance(text, str):
+            text = [text]
+
+        cache_key = self.get_cache_key(document_type)
+        text_hashes = [self.get_text_hash(t) for t in text]
+
+        embeddings = {}
+        for text_hash in set(text_hashes):
+            embedding = self.lru_get(cache_key + (text_hash,))
+            if embedding is not None:
+                embeddings[text_hash] = embedding
+
+        missing_hashes = [h for h in set(text_hashes) if h not in embeddings]
+        if missing_hashes:
+            try:
+                stored_embeddings = await self.embedding_cache_model.get_embeddings(*cache_key, text_hashes=missing_hashes)
+            except Exception as e:
+                logger.error(f"Embedding cache lookup failed: {e}")
+                stored_embeddings = {}
+            for text_hash, embedding in stored_embeddings.items():
+                embeddings[text_hash] = embedding
+                self.lru_put(cache_key + (text_hash,), embedding)
+
+        # embed each missing text once, even if it appears many times in the batch
+        missing_texts = {}
+        for text_hash, t in zip(text_hashes, text):
+            if text_hash not in embeddings and text_hash not in missing_texts:
+                missing_texts[text_hash] = t
+
+        if missing_texts:
+            vectors = await self.embedding_client.aembed_text(text=list(missing_texts.values()), document_type=document_type)
+            if not vectors or len(vectors) != len(missing_texts):
+                return None
+
+            new_embeddings = dict(zip(missing_texts.keys(), vectors))
+            for text_hash, embedding in new_embeddings.items():
+                embeddings[text_hash] = embedding
+                self.lru_put(cache_key + (text_hash,), embedding)
+
+            try:
+                await self.embedding_cache_model.insert_embeddings(*cache_key, embeddings=new_embeddings)
+            except Exception as e:
+                logger.error(f"Embedding cache insert failed: {e}")
+
+        return [embeddings[text_hash] for text_hash in text_hashes]
@@ -0,0 +1,241 @@
+from .base_controller import BaseController
+from .nlp_controller import NLPCntroller
+from .process_controller import ProcessController
+from models import JobModel, ProjectModel, AssetModel, ChunkModel, JobTypeEnum, JobStatusEnum
+from models.db_schemes import Job
+import asyncio
+import logging
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class JobCancelledError(Exception):
+    """Raised inside a running job once its record has been marked as cancelled."""
+    pass
+
+
+class JobController(BaseController):
+    """
+    Runs processing/indexing jobs in the background.
+    Jobs are persisted in the `jobs` table and claimed with SKIP LOCKED, so the same loop
+    works for the in-process asyncio workers and for the out-of-process worker (job_worker.py).
+    """
+
+    def __init__(self, db_client, vector_db_client, generation_client, embedding_client, template_parser=None,
+                 embedding_cache=None, answer_cache=None, process_pool=None, project_model=None):
+        super().__init__()
+
+        self.db_client = db_client
+        self.job_model = JobModel(db_client)
+        # the app's project model, so the jobs and the requests share one project cache
+        self.project_model = project_model or ProjectModel(db_client)
+        self.process_pool = process_pool
+        self.nlp_controller = NLPCntroller(
+            vector_db_client=vector_db_client,
+            generation_client=generation_client,
+            embedding_client=embedding_client,
+            template_parser=template_parser,
+            embedding_cache=embedding_cache,
+            answer_cache=answer_cache
+        )
+
+        self.poll_interval = self.app_settings.JOB_POLL_INTERVAL
+        self.lease_timeout = self.app_settings.JOB_LEASE_TIMEOUT_SECONDS
+        self.workers = []
+        self.running_jobs = {}
+        self.cancel_requested = set()
+        self.new_job_event = asyncio.Event()
+
+    async def start(self, workers_count: int = None):
+        workers_count = workers_count or self.app_settings.JOB_WORKERS_COUNT
+        self.workers = [
+            asyncio.create_task(self.worker_loop(worker_no)) for worker_no in range(workers_count)
+        ]
+        logger.info("Started %d background job workers.", workers_count)
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, job_type: str, project_id: int, params: dict = None) -> Job:
+        job = await self.job_model.create_job(Job(
+            job_type=job_type,
+            job_status=JobStatusEnum.PENDING.value,
+            job_params=params or {},
+            job_progress={},
+            job_project_id=project_id
+        ))
+        self.new_job_event.set()
+        return job
+
+    async def cancel(self, job_id: int) -> bool:
+        is_cancelled = await self.job_model.set_job_status(
+            job_id,
+            JobStatusEnum.CANCELLED.value,
+            from_statuses=[JobStatusEnum.PENDING.value, JobStatusEnum.RUNNING.value]
+        )
+        if is_cancelled and job_id in self.running_jobs:
+            # running in this process, stop it right away; other workers notice on their next progress update
+            self.cancel_requested.add(job_id)
+            self.running_jobs[job_id].cancel()
+        return is_cancelled
+
+    async def worker_loop(self, worker_no: int = 0):
+        while True:
+            try:
+                job = await self.job_model.claim_next_job(lease_timeout_seconds=self.lease_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_no} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                self.new_job_event.clear()
+                try:
+                    await asyncio.wait_for(self.new_job_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self.run_job(job))
+            self.running_jobs[job.job_id] = task
+            lease_task = asyncio.create_task(self.keep_lease(job)) if self.lease_timeout else None
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if task.done():
+                    # the job itself was cancelled, keep the worker alive
+                    continue
+                # the worker is shutting down
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            finally:
+                self.running_jobs.pop(job.job_id, None)
+                if lease_task is not None:
+                    lease_task.cancel()
+
+    async def keep_lease(self, job: Job):
+        # the progress updates renew it too, but a single step (an embedding call, the index build) can be long
+        while True:
+            await asyncio.sleep(self.lease_timeout / 3)
+            try:
+                await self.job_model.renew_job_lease(job.job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to renew the lease of job {job.job_id}: {e}")
+
+    async def run_job(self, job: Job):
+        logger.info("Running %s job %d for project %d", job.job_type, job.job_id, job.job_project_id)
+        try:
+            if job.job_type == JobTypeEnum.PROCESS.value:
+                result = await self.run_process_job(job)
+            elif job.job_type == JobTypeEnum.INDEX.value:
+                result = await self.run_index_job(job)
+            else:
+                raise ValueError(f"Unsupported job type: {job.job_type}")
+        except JobCancelledError:
+            logger.info("Job %d was cancelled.", job.job_id)
+            return
+        except asyncio.CancelledError:
+            if job.job_id in self.cancel_requested:
+                self.cancel_requested.discard(job.job_id)
+                logger.info("Job %d was cancelled.", job.job_id)
+                return
+            # shutdown, give the job back so another worker picks it up
+            await self.job_model.set_job_status(job.job_id, JobStatusEnum.PENDING.value,
+                                                from_statuses=[JobStatusEnum.RUNNING.value])
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+            await self.job_model.set_job_status(job.job_id, JobStatusEnum.FAILED.value,
+                                                from_statuses=[JobStatusEnum.RUNNING.value], error=str(e))
+            return
+
+        await self.job_model.set_job_status(job.job_id, JobStatusEnum.COMPLETED.value,
+                                            from_statuses=[JobStatusEnum.RUNNING.value], result=result)
+
+    async def report_progress(self, job: Job, progress: dict):
+        job_status = await self.job_model.update_job_progress(job.job_id, progress)
+        if job_status == JobStatusEnum.CANCELLED.value:
+            raise JobCancelledError(job.job_id)
+
+    async def run_process_job(self, job: Job) -> dict:
+        params = job.job_params or {}
+
+        asset_model = AssetModel(self.db_client)
+        chunk_model = ChunkModel(self.db_client)
+        project_assets = await asset_model.get_project_file_assets(job.job_project_id, params.get("file_id"))
+        if not project_assets:
+            raise ValueError("no files to process")
+
+        if params.get("do_reset"):
+            # delete vector db collection and chunks from db
+            collection_name = self.nlp_controller.create_collection_name(project_id=job.job_project_id)
+            _ = await self.nlp_controller.vector_db_client.delete_collection(collection_name=collection_name)
+            await self.nlp_controller.invalidate_answer_cache(job.job_project_id)
+            _ = await chunk_model.delete_chunks_by_project_id(job.job_project_id)
+
+        progress = {"total_files": len(project_assets), "files_processed": 0, "chunks_parsed": 0}
+        await self.report_progress(job, progress)
+
+        async def on_progress(files_processed: int, chunks_parsed: int):
+            progress.update(files_processed=files_processed, chunks_parsed=chunks_parsed)
+            await self.report_progress(job, progress)
+
+        process_controller = ProcessController(job.job_project_id, executor=self.process_pool)
+        is_processed, process_stats = await process_controller.process_assets(
+            chunk_model=chunk_model,
+            asset_model=asset_model,
+            project_id=job.job_project_id,
+            assets=project_assets,
+            chunk_size=params.get("chunk_size", 500),
+            chunk_overlap=params.get("overlap_size", 30),
+            force=params.get("do_reset", False),
+            nlp_controller=self.nlp_controller,
+            on_progress=on_progress
+        )
+        if not is_processed:
+            raise ValueError("file processing failed")
+
+        return process_stats
+
+    async def run_index_job(self, job: Job) -> dict:
+        params = job.job_params or {}
+
+        chunk_model = ChunkModel(self.db_client)
+        project = await self.project_model.get_project_or_create_one(job.job_project_id)
+
+        collection_name = self.nlp_controller.create_collection_name(project_id=project.project_id)
+        _ = await self.nlp_controller.vector_db_client.create_collection(
+            collection_name=collection_name,
+            dimension=self.nlp_controller.embedding_client.embedding_size,
+            do_reset=params.get("do_reset", False)
+        )
+
+        total_chunks_count = await chunk_model.get_total_chunks_count(project.project_id)
+        progress = {"total_chunks": total_chunks_count, "chunks_embedded": 0, "chunks_indexed": 0}
+        await self.report_progress(job, progress)
+
+        async def on_progress(count: int):
+            # each batch is embedded then written before it is reported
+            progress["chunks_embedded"] += count
+            progress["chunks_indexed"] += count
+            await self.report_progress(job, progress)
+
+        is_inserted, inserted_items_count = await self.nlp_controller.index_project_chunks(
+            project=project,
+            chunk_model=chunk_model,
+            page_size=params.get("page_size", 200),
+            batch_size=params.get("batch_size", 50),
+            max_concurrent_batches=params.get("max_concurrent_batches", 4),
+            on_progress=on_progress
+        )
+        if not is_inserted:
+            raise ValueError("insert into vector db failed")
+
+        return {"inserted_items_count": inserted_items_count}
@@ -1,24 +1,46 @@
 from .base_controller import BaseController
+from .rag_context_controller import RAGContextController
 from models.db_schemes import Project, DataChunk
 from typing import List
-from stores.llm.llm_enums import DocumentTypeEnums
+from contextlib import aclosing
+from stores.llm.llm_enums import DocumentTypeEnums, CallPriorityEnum
+from stores.llm.llm_scheduler import llm_call_priority
+from stores.vector_db.vector_db_enums import SearchModeEnum
+import asyncio
+import inspect
 import json
+import logging
+
+logger = logging.getLogger('uvicorn.error')
 
 class NLPCntroller(BaseController):
     
-    def __init__(self, vector_db_client, generation_client, embedding_client, template_parser=None):
+    def __init__(self, vector_db_client, generation_client, embedding_client, template_parser=None, embedding_cache=None,
+                 answer_cache=None, chunk_model=None, embedding_batcher=None):
         super().__init__()
 
         self.vector_db_client = vector_db_client
         self.generation_client = generation_client
         self.embedding_client = embedding_client
         self.template_parser = template_parser
+        self.embedding_cache = embedding_cache
+        self.answer_cache = answer_cache
+        self.embedding_batcher = embedding_batcher
+        # looks up the asset/order of the retrieved chunks, to merge the adjacent ones in the rag context
+        self.chunk_model = chunk_model
+        self.rag_context = RAGContextController(tokenizer=generation_client)
         
     def create_collection_name(self, project_id: str):
         return f"collection_{self.vector_db_client.default_vector_dimension}_{project_id}".strip()
     
+    async def invalidate_answer_cache(self, project_id: int):
+        # cached answers were built from the old collection content
+        if self.answer_cache is not None:
+            await self.answer_cache.invalidate_project(project_id)
+    
     async def reset_vector_db_collection(self, project: Project):
         collection_name = self.create_collection_name(project_id=project.project_id)
+        await self.invalidate_answer_cache(project.project_id)
         return await self.vector_db_client.delete_collection(collection_name=collection_name)
     
     async def get_collection_info(self, project: Project):
@@ -28,25 +50,47 @@ class NLPCntroller(BaseController):
             json.dumps(collection_info, default=lambda o: o.__dict__)
         )
     
+    async def get_index_build_progress(self, project: Project):
+        collection_name = self.create_collection_name(project_id=project.project_id)
+        return await self.vector_db_client.get_index_build_progress(collection_name=collection_name)
+    
+    async def embed_text(self, text, document_type: str):
+        # go through the embedding cache when it is enabled
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.aembed_text(text=text, document_type=document_type)
+        return await self.embedding_client.aembed_text(text=text, document_type=document_type)
+    
     async def index_into_vector_db(self, project: Project, chunks: List[DataChunk], do_reset: bool=False):
                 
         # step1: get collection name
         collection_name = self.create_collection_name(project_id=project.project_id)
         
-        # step2: manage items
-        chunk_ids = [c.chunk_id for c in chunks]
-        texts = [c.chunk_text for c in chunks]
-        metadatas = [c.chunk_metadata for c in chunks]
-        vectors = self.embedding_client.embed_text(text=texts, document_type=DocumentTypeEnums.DOCUMENT.value)
-        
-        # step3: create collection if not exists
+        # step2: create collection if not exists
         _ = await self.vector_db_client.create_collection(
             collection_name=collection_name,
             dimension=self.embedding_client.embedding_size
-        )    
+        )
+        
+        # step3: skip the chunks that are already indexed, so pushing again only adds the new/changed ones
+        existing_ids = await self.vector_db_client.get_existing_record_ids(
+            collection_name=collection_name,
+            record_ids=[c.chunk_id for c in chunks]
+        )
+        chunks = [c for c in chunks if c.chunk_id not in existing_ids]
+        if not chunks:
+            return True
+        
+        chunk_ids = [c.chunk_id for c in chunks]
+        texts = [c.chunk_text for c in chunks]
+        # the asset id goes with the metadata so searches can filter on it
+        metadatas = [{**(c.chunk_metadata or {}), "chunk_asset_id": c.chunk_asset_id} for c in chunks]
+        vectors = await self.embed_text(text=texts, document_type=DocumentTypeEnums.DOCUMENT.value)
+        
+        if not vectors or len(vectors) != len(texts):
+            return False
         
         # step4: insert into vector db
-        _= await self.vector_db_client.insert_many(
+        is_inserted = await self.vector_db_client.insert_many(
             collection_name=collection_name,
             texts=texts,
             metadatas=metadatas,
@@ -54,56 +98,272 @@ class NLPCntroller(BaseController):
             record_ids=chunk_ids
         )
         
-        return True
+        return bool(is_inserted)
+    
+    async def delete_chunks_from_vector_db(self, project_id: int, chunk_ids: List[int]):
+        collection_name = self.create_collection_name(project_id=project_id)
+        await self.invalidate_answer_cache(project_id)
+        return await self.vector_db_client.delete_by_record_ids(collection_name=collection_name, record_ids=chunk_ids)
     
-    async def search_vector_db_collection(self, project: Project, query_text: str, top_k: int=5):
+    async def index_project_chunks(self, project: Project, chunk_model, page_size: int=200,
+                                   batch_size: int=50, max_concurrent_batches: int=4, on_progress=None):
+        """
+        Stream the project chunks by chunk_id cursor and index them batch by batch.
+        Up to `max_concurrent_batches` batches are embedded/inserted at the same time,
+        while the next page is fetched from the db.
+        on_progress(count) is called (and awaited if needed) after each indexed batch.
+        The vector index build is deferred until all the batches are inserted (bulk load).
+        Its embedding calls go through the bulk priority lane of the provider scheduler.
+        Returns (is_inserted, inserted_items_count), an error of the embedding call or of the vector db insert is raised.
+        """
+        collection_name = self.create_collection_name(project_id=project.project_id)
+        _ = await self.vector_db_client.create_collection(
+            collection_name=collection_name,
+            dimension=self.embedding_client.embedding_size
+        )
+        await self.vector_db_client.begin_bulk_load(collection_name)
+        
+        semaphore = asyncio.Semaphore(max_concurrent_batches)
+        pending = set()
+        inserted_items_count = 0
+        
+        async def index_batch(batch: List[DataChunk]):
+            try:
+                return await self.index_into_vector_db(project, batch), len(batch)
+            finally:
+                semaphore.release()
+        
+        async def collect(tasks) -> bool:
+            # every task is retrieved, even after a failure, else asyncio logs the unretrieved exceptions
+            nonlocal inserted_items_count
+            is_all_inserted, error = True, None
+            for task in tasks:
+                try:
+                    is_inserted, count = task.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if not is_inserted:
+                    is_all_inserted = False
+                    continue
+                inserted_items_count += count
+                if on_progress:
+                    progress = on_progress(count)
+                    if inspect.isawaitable(progress):
+                        await progress
+            if error is not None:
+                raise error
+            return is_all_inserted
+        
+        last_chunk_id = 0
+        # inherited by the batch tasks created below
+        priority_token = llm_call_priority.set(CallPriorityEnum.BULK.value)
+        try:
+            while True:
+                page_chunks = await chunk_model.get_project_chunks_after(
+                    project_id=project.project_id, last_chunk_id=last_chunk_id, page_size=page_size
+                )
+                if not page_chunks:
+                    break
+                last_chunk_id = page_chunks[-1].chunk_id
+                
+                for i in range(0, len(page_chunks), batch_size):
+                    # wait for a free slot, this bounds the number of batches in flight
+                    await semaphore.acquire()
+                    pending.add(asyncio.create_task(index_batch(page_chunks[i:i+batch_size])))
+                
+                done = {task for task in pending if task.done()}
+                pending -= done
+                if not await collect(done):
+                    return False, inserted_items_count
+            
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                if not await collect(done):
+                    return False, inserted_items_count
+        finally:
+            for task in pending:
+                task.cancel()
+            # the cancelled inserts must be rolled back before the index build starts and before returning
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.vector_db_client.end_bulk_load(collection_name)
+            await self.invalidate_answer_cache(project.project_id)
+            llm_call_priority.reset(priority_token)
+        
+        return True, inserted_items_count
+    
+    async def embed_query(self, query_text: str):
+        # single queries of concurrent requests are embedded together when batching is enabled
+        try:
+            if self.embedding_batcher is not None:
+                vectors = await self.embedding_batcher.aembed_text(text=query_text, document_type=DocumentTypeEnums.QUERY.value)
+            else:
+                vectors = await self.embed_text(text=query_text, document_type=DocumentTypeEnums.QUERY.value)
+        except Exception as e:
+            # the requests answer a failed query embedding with their own error signal
+            logger.error("Error embedding the query: %s", str(e))
+            return None
+        
+        if not vectors or len(vectors) == 0:
+            return None
+        
+        return vectors[0]
+    
+    async def embed_queries(self, query_texts: List[str]):
+        # one embedding call for all the queries
+        try:
+            vectors = await self.embed_text(text=query_texts, document_type=DocumentTypeEnums.QUERY.value)
+        except Exception as e:
+            logger.error("Error embedding %d queries: %s", len(query_texts), str(e))
+            return None
+        
+        if not vectors or len(vectors) != len(query_texts):
+            return None
+        
+        return vectors
+    
+    def is_valid_search_profile(self, accuracy: str) -> bool:
+        return accuracy is None or accuracy in self.vector_db_client.search_profiles
+    
+    async def search_vector_db_collection(self, project: Project, query_text: str, top_k: int=5, query_vector: list=None,
+                                          accuracy: str=None, filter: dict=None, mode: str=None,
+                                          vector_weight: float=None, lexical_weight: float=None):
         
-        query_vector = None
         # step1: get collection name
         collection_name = self.create_collection_name(project_id=project.project_id)
         
-        # step2: get text embedding vector
-        vectors = self.embedding_client.embed_text(text=query_text, document_type=DocumentTypeEnums.QUERY.value)
+        # step2: get text embedding vector (unless the caller already has it)
+        if query_vector is None:
+            query_vector = await self.embed_query(query_text)
         
-        if not vectors or len(vectors) == 0:
+        if query_vector is None:
             return False
         
-        if isinstance(vectors, list) and len(vectors) > 0:
-            query_vector = vectors[0]
+        # step3: do semantic (or hybrid semantic + full-text) search
+        if (mode or self.app_settings.VECTOR_DB_SEARCH_DEFAULT_MODE) == SearchModeEnum.HYBRID.value:
+            results = await self.vector_db_client.hybrid_search(
+                collection_name= collection_name,
+                query_text= query_text,
+                query_vector= query_vector,
+                top_k= top_k,
+                filter= filter,
+                accuracy= accuracy,
+                vector_weight= vector_weight,
+                lexical_weight= lexical_weight
+            )
+        else:
+            results = await self.vector_db_client.search_by_vector(
+                collection_name= collection_name,
+                query_vector= query_vector,
+                top_k= top_k,
+                filter= filter,
+                accuracy= accuracy
+            )
         
-        # step3: do semantic search
-        results = await self.vector_db_client.search_by_vector(
-            collection_name= collection_name,
-            query_vector= query_vector,
-            top_k= top_k
-        )
+        # nothing found (or no collection yet) is an empty result, False is kept for the embedding failure
+        return results or []
+    
+    async def search_vector_db_collection_batch(self, project: Project, query_texts: List[str], top_k: int=5,
+                                                query_vectors: list=None, accuracy: str=None, filter: dict=None,
+                                                mode: str=None, vector_weight: float=None, lexical_weight: float=None):
+        """
+        Search many queries: one embedding call for all of them, then one multi-query vector db call
+        (in hybrid mode, one hybrid search per query, NLP_BATCH_MAX_CONCURRENT_SEARCHES at a time).
+        Returns one result list per query, or False if the embedding failed or the collection doesn't exist
+        (vector db errors are raised).
+        """
+        collection_name = self.create_collection_name(project_id=project.project_id)
+        
+        if query_vectors is None:
+            query_vectors = await self.embed_queries(query_texts)
         
-        if not results:
+        if query_vectors is None:
+            return False
+        
+        if (mode or self.app_settings.VECTOR_DB_SEARCH_DEFAULT_MODE) != SearchModeEnum.HYBRID.value:
+            return await self.vector_db_client.search_by_vectors(
+                collection_name= collection_name,
+                query_vectors= query_vectors,
+                top_k= top_k,
+                filter= filter,
+                accuracy= accuracy
+            )
+        
+        semaphore = asyncio.Semaphore(self.app_settings.NLP_BATCH_MAX_CONCURRENT_SEARCHES)
+        
+        async def hybrid_search(query_text: str, query_vector: list):
+            async with semaphore:
+                return await self.vector_db_client.hybrid_search(
+                    collection_name= collection_name,
+                    query_text= query_text,
+                    query_vector= query_vector,
+                    top_k= top_k,
+                    filter= filter,
+                    accuracy= accuracy,
+                    vector_weight= vector_weight,
+                    lexical_weight= lexical_weight
+                )
+        
+        results = await asyncio.gather(*[
+            hybrid_search(query_text, query_vector) for query_text, query_vector in zip(query_texts, query_vectors)
+        ])
+        if any(result is False for result in results):
             return False
         
         return results
     
-    async def answer_rag_question(self, project: Project, query_text: str, top_k: int=5):
+    def get_rag_context_budget(self, query_text: str):
+        """
+        (token_budget, document_overhead) of the documents in the rag prompt: the context window minus the
+        answer tokens and the rest of the prompt, capped by RAG_CONTEXT_MAX_TOKENS.
+        """
+        prompt_tokens = sum(
+            self.generation_client.count_tokens(prompt)
+            for prompt in (
+                self.template_parser.get(group='rag', key='system_prompt'),
+                self.template_parser.get(group='rag', key='query_prompt', vars={'query_text': query_text}),
+                self.template_parser.get(group='rag', key='footer_prompt')
+            )
+        )
+        token_budget = (self.app_settings.GENERATION_CONTEXT_WINDOW - self.app_settings.GENERATION_DEFAULT_MAX_TOKENS
+                        - prompt_tokens)
+        if self.app_settings.RAG_CONTEXT_MAX_TOKENS:
+            token_budget = min(token_budget, self.app_settings.RAG_CONTEXT_MAX_TOKENS)
         
-        answer, full_prompt, chat_history = None, None, None
+        # the document template around each chunk text, plus the line break joining them
+        document_overhead = self.generation_client.count_tokens(
+            self.template_parser.get(group='rag', key='document_prompt', vars={'doc_num': 99, 'chunk_text': ''})
+        ) + 1
+        return max(token_budget, 0), document_overhead
+    
+    async def build_rag_context(self, query_text: str, retrieved_documents: list):
+        """The documents of the rag prompt, packed into the token budget (see RAGContextController)."""
+        if not self.app_settings.RAG_CONTEXT_PACKING_ENABLED:
+            return retrieved_documents
         
-        # step1: retrieve related documents
-        retrieved_documents = await self.search_vector_db_collection(project=project, query_text=query_text, top_k=top_k)
+        chunk_positions = {}
+        if self.chunk_model is not None and self.rag_context.merge_adjacent:
+            chunk_ids = [doc.chunk_id for doc in retrieved_documents if doc.chunk_id is not None]
+            chunk_positions = await self.chunk_model.get_chunks_positions(chunk_ids)
         
-        if not retrieved_documents or len(retrieved_documents) == 0:
-            return answer, full_prompt, chat_history
+        token_budget, document_overhead = self.get_rag_context_budget(query_text)
+        return self.rag_context.build_context(retrieved_documents, token_budget, chunk_positions, document_overhead)
+    
+    def construct_rag_prompt(self, query_text: str, retrieved_documents: list):
         
-        # step2: construct llm prompt
         system_prompt = self.template_parser.get(group='rag', key='system_prompt')
         
-        document_prompt = "\n".join([
-            self.template_parser.get(
-                group='rag',
-                key='document_prompt',
-                vars={'doc_num': idx+1, 'chunk_text': self.generation_client.process_text(doc.text)}
-            )
-            for idx, doc in enumerate(retrieved_documents)
-        ])
+        # packed documents already fit the token budget, otherwise each chunk is clipped to a max length
+        is_packed = self.app_settings.RAG_CONTEXT_PACKING_ENABLED
+        document_prompt = self.template_parser.render_many(
+            group='rag',
+            key='document_prompt',
+            vars_list=[
+                {'doc_num': idx+1, 'chunk_text': doc.text if is_packed else self.generation_client.process_text(doc.text)}
+                for idx, doc in enumerate(retrieved_documents)
+            ],
+            separator="\n"
+        )
         
         query_prompt = self.template_parser.get(group='rag', key='query_prompt', vars={'query_text': query_text})
         
@@ -119,12 +379,222 @@ class NLPCntroller(BaseController):
         
         full_prompt = "\n\n".join([query_prompt, document_prompt, footer_prompt])
         
+        return full_prompt, chat_history
+    
+    def get_answer_cache_variant(self, search_options: dict):
+        # search options change the retrieved documents, so the answers are cached per set of options
+        search_options = {
+            **search_options,
+            # the default profile/mode written out or left unset is the same search
+            "accuracy": search_options.get("accuracy") or self.vector_db_client.default_search_profile,
+            "mode": search_options.get("mode") or self.app_settings.VECTOR_DB_SEARCH_DEFAULT_MODE
+        }
+        search_options = {key: value for key, value in search_options.items() if value is not None}
+        if not search_options:
+            return None
+        return json.dumps(search_options, sort_keys=True)
+    
+    async def get_cached_answer(self, project: Project, query_text: str, top_k: int, **search_options):
+        """
+        Look the question up in the answer cache, exact text first then by query embedding.
+        Returns (entry, query_vector); query_vector is set when it had to be computed, so the search can reuse it.
+        """
+        if self.answer_cache is None:
+            return None, None
+        
+        variant = self.get_answer_cache_variant(search_options)
+        entry = self.answer_cache.get_exact(project.project_id, query_text, top_k, variant)
+        if entry is not None:
+            return entry, None
+        
+        query_vector = None
+        if self.answer_cache.is_semantic_enabled:
+            query_vector = await self.embed_query(query_text)
+            entry = self.answer_cache.get_semantic(project.project_id, query_vector, top_k, variant)
+            if entry is not None:
+                return entry, query_vector
+        
+        self.answer_cache.record_miss()
+        return None, query_vector
+    
+    async def get_answer_cache_generation(self, project: Project):
+        # read before the retrieval, cache_answer drops the answer if the project was invalidated meanwhile
+        if self.answer_cache is None:
+            return None
+        return await self.answer_cache.get_generation(project.project_id)
+    
+    def cache_answer(self, project: Project, query_text: str, top_k: int, answer: str, retrieved_documents: list,
+                     query_vector: list=None, generation: int=None, **search_options):
+        if self.answer_cache is not None and answer:
+            self.answer_cache.put(project.project_id, query_text, top_k, answer, retrieved_documents, query_vector,
+                                  self.get_answer_cache_variant(search_options), generation)
+    
+    async def answer_rag_question(self, project: Project, query_text: str, top_k: int=5, **search_options):
+        """search_options (accuracy, filter, mode, vector_weight, lexical_weight) go to search_vector_db_collection."""
+        
+        answer, full_prompt, chat_history = None, None, None
+        generation = await self.get_answer_cache_generation(project)
+        
+        # cached answers skip retrieval and generation, so there is no prompt to return
+        cached_entry, query_vector = await self.get_cached_answer(project, query_text, top_k, **search_options)
+        if cached_entry is not None:
+            return cached_entry["answer"], full_prompt, chat_history
+        
+        # step1: retrieve related documents
+        retrieved_documents = await self.search_vector_db_collection(project=project, query_text=query_text, top_k=top_k,
+                                                                     query_vector=query_vector, **search_options)
+        
+        if not retrieved_documents or len(retrieved_documents) == 0:
+            return answer, full_prompt, chat_history
+        
+        # step2: pack the documents into the context budget and construct llm prompt
+        context_documents = await self.build_rag_context(query_text, retrieved_documents)
+        full_prompt, chat_history = self.construct_rag_prompt(query_text, context_documents)
         
         # step3: generate answer
-        answer = self.generation_client.generate_text(
-            prompt= full_prompt,
-            chat_history= chat_history
-        )
+        try:
+            answer = await self.generation_client.agenerate_text(
+                prompt= full_prompt,
+                chat_history= chat_history
+            )
+        except Exception as e:
+            logger.error("Error generating the RAG answer: %s", str(e))
+            return None, full_prompt, chat_history
+        
+        self.cache_answer(project, query_text, top_k, answer, retrieved_documents, query_vector, generation, **search_options)
         
         return answer, full_prompt, chat_history
-    
\ No newline at end of file
+    
+    async def answer_rag_questions(self, project: Project, query_texts: List[str], top_k: int=5,
+                                   max_concurrency: int=None, **search_options):
+        """
+        Answer many questions, yielding (index, answer) as soon as each answer is ready (answer is None when
+        no document was retrieved or the generation failed). Cached answers come first, the other questions are
+        embedded in one call and searched in one vector db round trip, then up to `max_concurrency` answers
+        (NLP_BATCH_MAX_CONCURRENT_GENERATIONS by default) are generated at the same time.
+        """
+        max_concurrency = max_concurrency or self.app_settings.NLP_BATCH_MAX_CONCURRENT_GENERATIONS
+        variant = self.get_answer_cache_variant(search_options)
+        generation = await self.get_answer_cache_generation(project)
+        
+        pending = []
+        for index, query_text in enumerate(query_texts):
+            entry = None
+            if self.answer_cache is not None:
+                entry = self.answer_cache.get_exact(project.project_id, query_text, top_k, variant)
+            if entry is not None:
+                yield index, entry["answer"]
+            else:
+                pending.append(index)
+        
+        if not pending:
+            return
+        
+        query_vectors = await self.embed_queries([query_texts[index] for index in pending])
+        if query_vectors is None:
+            for index in pending:
+                yield index, None
+            return
+        query_vectors = dict(zip(pending, query_vectors))
+        
+        if self.answer_cache is not None:
+            misses = []
+            for index in pending:
+                entry = self.answer_cache.get_semantic(project.project_id, query_vectors[index], top_k, variant)
+                if entry is not None:
+                    yield index, entry["answer"]
+                else:
+                    self.answer_cache.record_miss()
+                    misses.append(index)
+            pending = misses
+        
+        if not pending:
+            return
+        
+        try:
+            retrieved_documents = await self.search_vector_db_collection_batch(
+                project, [query_texts[index] for index in pending], top_k=top_k,
+                query_vectors=[query_vectors[index] for index in pending], **search_options
+            )
+        except Exception as e:
+            # the answers are already streaming, each pending question gets its error event
+            logger.error("Error searching the batch of %d questions: %s", len(pending), str(e))
+            retrieved_documents = None
+        if not retrieved_documents:
+            for index in pending:
+                yield index, None
+            return
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate_answer(index: int, documents: list):
+            if not documents:
+                return index, None
+            try:
+                async with semaphore:
+                    context_documents = await self.build_rag_context(query_texts[index], documents)
+                    full_prompt, chat_history = self.construct_rag_prompt(query_texts[index], context_documents)
+                    answer = await self.generation_client.agenerate_text(prompt= full_prompt, chat_history= chat_history)
+            except Exception as e:
+                logger.error("Error generating answer %d of the batch: %s", index, str(e))
+                return index, None
+            self.cache_answer(project, query_texts[index], top_k, answer, documents, query_vectors[index], generation,
+                              **search_options)
+            return index, answer
+        
+        tasks = [asyncio.create_task(generate_answer(index, documents)) for index, documents in zip(pending, retrieved_documents)]
+        try:
+            for next_answer in asyncio.as_completed(tasks):
+                yield await next_answer
+        finally:
+            # the client went away, don't keep generating
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_rag_answer(self, project: Project, query_text: str, top_k: int=5, **search_options):
+        """
+        Same as answer_rag_question but yields (event, data) pairs as soon as they are ready:
+        ("documents", [RetrievedDocument]) first, then ("token", str) for each generated piece,
+        and ("error", None) last when the generation failed, even after some pieces.
+        Nothing is yielded when no document is retrieved.
+        The answer is cached only when the stream completed.
+        """
+        
+        generation = await self.get_answer_cache_generation(project)
+        cached_entry, query_vector = await self.get_cached_answer(project, query_text, top_k, **search_options)
+        if cached_entry is not None:
+            yield "documents", cached_entry["retrieved_documents"]
+            yield "token", cached_entry["answer"]
+            return
+        
+        # step1: retrieve related documents
+        retrieved_documents = await self.search_vector_db_collection(project=project, query_text=query_text, top_k=top_k,
+                                                                     query_vector=query_vector, **search_options)
+        
+        if not retrieved_documents or len(retrieved_documents) == 0:
+            return
+        
+        yield "documents", retrieved_documents
+        
+        # step2: pack the documents into the context budget and construct llm prompt
+        context_documents = await self.build_rag_context(query_text, retrieved_documents)
+        full_prompt, chat_history = self.construct_rag_prompt(query_text, context_documents)
+        
+        # step3: stream the answer tokens
+        tokens = []
+        is_completed = False
+        try:
+            # closed with this generator when the client goes away, which frees the backend slot right away
+            async with aclosing(self.generation_client.astream_text(prompt= full_prompt, chat_history= chat_history)) as pieces:
+                async for token in pieces:
+                    tokens.append(token)
+                    yield "token", token
+            is_completed = True
+        except Exception as e:
+            logger.error("RAG answer stream failed after %d pieces: %s", len(tokens), str(e))
+            yield "error", None
+        
+        # a cut answer would be served to every later identical question
+        if is_completed:
+            self.cache_answer(project, query_text, top_k, "".join(tokens), retrieved_documents, query_vector, generation,
+                              **search_options)
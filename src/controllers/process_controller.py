@@ -1,30 +1,129 @@
 from .base_controller import BaseController
 from .project_controller import ProjectController
 from langchain_community.document_loaders import PyMuPDFLoader, TextLoader
+from langchain_community.document_loaders.parsers import PyMuPDFParser
+from langchain_core.documents.base import Blob
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from models import ProcessingFiles
+from models.db_schemes import DataChunk
+from concurrent.futures import Executor
+import asyncio
+import hashlib
+import inspect
 import os
 import logging
+import pymupdf
 
 logger = logging.getLogger(__name__)
 
+
+# The functions below run inside the process pool, so they must stay at module level (picklable).
+
+def get_pdf_page_count(file_path: str) -> int:
+    with pymupdf.open(file_path) as doc:
+        return doc.page_count
+
+
+def load_pdf_pages(file_path: str, from_page: int, to_page: int) -> list:
+    """Load pages [from_page, to_page] of a pdf with the same output as PyMuPDFLoader."""
+    with pymupdf.open(file_path) as doc:
+        total_pages = doc.page_count
+        with pymupdf.open() as part:
+            part.insert_pdf(doc, from_page=from_page, to_page=to_page)
+            part.set_metadata(doc.metadata)
+            part_bytes = part.tobytes()
+    
+    documents = list(PyMuPDFParser().lazy_parse(Blob.from_data(part_bytes, path=file_path)))
+    for document in documents:
+        document.metadata["page"] += from_page
+        document.metadata["total_pages"] = total_pages
+    return documents
+
+
+def load_file_documents(file_path: str, file_extension: str, page_range: tuple = None) -> list:
+    
+    if not os.path.exists(file_path):
+        return None
+    
+    if file_extension == ProcessingFiles.TXT.value:
+        return TextLoader(file_path, encoding='utf-8').load()
+    elif file_extension == ProcessingFiles.PDF.value:
+        if page_range is not None:
+            return load_pdf_pages(file_path, *page_range)
+        return PyMuPDFLoader(file_path).load()
+    
+    return None
+
+
+def split_documents(documents: list, chunk_size: int = 100, chunk_overlap: int = 20) -> list:
+    
+    if not documents:
+        return None
+    
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    
+    file_page_content = [doc.page_content for doc in documents]
+    file_content_metadata = [doc.metadata for doc in documents]
+    
+    return text_splitter.create_documents(file_page_content, metadatas=file_content_metadata)
+
+
+def load_and_split_file(file_path: str, file_extension: str, chunk_size: int, chunk_overlap: int,
+                        page_range: tuple = None) -> list:
+    try:
+        documents = load_file_documents(file_path, file_extension, page_range)
+    except Exception as e:
+        logger.error(f"Error loading file {file_path}: {e}")
+        return None
+    
+    if documents is None:
+        return None
+    
+    return split_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap) or []
+
+
+def get_file_hash(file_path: str) -> str:
+    
+    if not os.path.exists(file_path):
+        return None
+    
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 class ProcessController(BaseController):
     
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, executor: Executor = None):
         super().__init__()
         
         self.project_id = project_id
         self.project_path = ProjectController().get_project_path(project_id)
-        
+        # process pool used for loading/splitting, None runs it in the default thread pool
+        self.executor = executor
+    
     
     def get_file_extension(self, file_id: str):
         return os.path.splitext(file_id)[-1]
     
+    def get_file_path(self, file_id: str):
+        return os.path.join(self.project_path, file_id)
+    
     def get_file_loader(self, file_id: str):
         
         file_extension = self.get_file_extension(file_id)
         
-        file_path = os.path.join(self.project_path, file_id)
+        file_path = self.get_file_path(file_id)
         
         if not os.path.exists(file_path):
             return None
@@ -38,34 +137,191 @@ class ProcessController(BaseController):
     
     def get_file_content(self, file_id: str):
         
-        loader = self.get_file_loader(file_id)
-        
-        if not loader:
-            return None
-
         try:
-            return loader.load()
+            return load_file_documents(self.get_file_path(file_id), self.get_file_extension(file_id))
         except Exception as e:
             logger.error(f"Error loading file {file_id}: {e}")
             return None
     
     def process_file_content(self, file_content: list, file_id: str, chunk_size: int = 100, chunk_overlap: int = 20):
+        return split_documents(file_content, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    
+    async def get_file_page_ranges(self, file_id: str) -> list:
+        """Split big pdfs into page ranges so their pages are parsed in parallel."""
+        pages_per_task = self.app_settings.PROCESS_PDF_PAGES_PER_TASK
+        file_path = self.get_file_path(file_id)
+        
+        if self.get_file_extension(file_id) != ProcessingFiles.PDF.value or not pages_per_task or not os.path.exists(file_path):
+            return [None]
         
-        if not file_content:
+        loop = asyncio.get_running_loop()
+        try:
+            page_count = await loop.run_in_executor(self.executor, get_pdf_page_count, file_path)
+        except Exception as e:
+            logger.error(f"Error reading pdf {file_id}: {e}")
+            return [None]
+        
+        if page_count <= pages_per_task:
+            return [None]
+        
+        return [
+            (from_page, min(from_page + pages_per_task, page_count) - 1)
+            for from_page in range(0, page_count, pages_per_task)
+        ]
+    
+    async def load_file_chunks(self, file_id: str, chunk_size: int, chunk_overlap: int):
+        
+        loop = asyncio.get_running_loop()
+        file_path = self.get_file_path(file_id)
+        file_extension = self.get_file_extension(file_id)
+        
+        page_ranges = await self.get_file_page_ranges(file_id)
+        try:
+            parts = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, load_and_split_file,
+                                     file_path, file_extension, chunk_size, chunk_overlap, page_range)
+                for page_range in page_ranges
+            ])
+        except Exception as e:
+            logger.error(f"Error processing file {file_id}: {e}")
             return None
         
+        if any(part is None for part in parts):
+            return None
         
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-        )
+        # keep the pages order inside the file
+        return [chunk for part in parts for chunk in part]
+    
+    async def iter_files_chunks(self, project_files_ids: dict, chunk_size: int = 100, chunk_overlap: int = 20):
+        """Load and split all the files in parallel, yield (asset_id, file_id, chunks) as each file completes."""
         
-        file_page_content = [doc.page_content for doc in file_content]
-        file_content_metadata = [doc.metadata for doc in file_content]
+        async def load(asset_id, file_id):
+            return asset_id, file_id, await self.load_file_chunks(file_id, chunk_size, chunk_overlap)
         
-
-        chunks = text_splitter.create_documents(file_page_content, metadatas=file_content_metadata)
+        tasks = [asyncio.create_task(load(asset_id, file_id)) for asset_id, file_id in project_files_ids.items()]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def get_changed_assets(self, assets: list, processing_config: dict, force: bool = False) -> dict:
+        """
+        Hash the asset files and keep the ones whose content or chunking parameters changed
+        since they were last processed. Returns {asset_id: (asset, content_hash)}.
+        """
+        loop = asyncio.get_running_loop()
+        content_hashes = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, get_file_hash, self.get_file_path(asset.asset_name))
+            for asset in assets
+        ])
+        
+        changed_assets = {}
+        for asset, content_hash in zip(assets, content_hashes):
+            if content_hash is None:
+                logger.error(f"File not found for file_id: {asset.asset_name}")
+                continue
+            if not force and asset.asset_content_hash == content_hash and asset.asset_config == processing_config:
+                continue
+            changed_assets[asset.asset_id] = (asset, content_hash)
+        
+        return changed_assets
+    
+    async def sync_asset_chunks(self, chunk_model, project_id: int, asset_id: int, file_chunks: list,
+                                nlp_controller=None):
+        """
+        Replace the stored chunks of an asset with file_chunks, touching only what changed:
+        chunks with the same text are kept (their order/metadata updated), the others are
+        deleted or inserted. The vector rows of deleted chunks, and of kept chunks whose
+        metadata changed, are removed so the next index push re-indexes them.
+        Returns (no_added, no_removed).
+        """
+        existing_chunks = {}
+        for chunk in await chunk_model.get_asset_chunks(asset_id):
+            existing_chunks.setdefault(get_text_hash(chunk.chunk_text), []).append(chunk)
+        
+        new_records, chunk_updates, kept_ids, invalidated_ids = [], [], set(), []
+        for index, chunk in enumerate(file_chunks):
+            chunk_order = index + 1
+            same_text_chunks = existing_chunks.get(get_text_hash(chunk.page_content))
+            
+            if not same_text_chunks:
+                new_records.append(DataChunk(
+                    chunk_text=chunk.page_content,
+                    chunk_metadata=chunk.metadata,
+                    chunk_order=chunk_order,
+                    chunk_project_id=project_id,
+                    chunk_asset_id=asset_id
+                ))
+                continue
+            
+            old_chunk = same_text_chunks.pop(0)
+            kept_ids.add(old_chunk.chunk_id)
+            if old_chunk.chunk_metadata != chunk.metadata:
+                invalidated_ids.append(old_chunk.chunk_id)
+            if old_chunk.chunk_order != chunk_order or old_chunk.chunk_metadata != chunk.metadata:
+                chunk_updates.append({
+                    "chunk_id": old_chunk.chunk_id,
+                    "chunk_order": chunk_order,
+                    "chunk_metadata": chunk.metadata
+                })
+        
+        removed_ids = [
+            chunk.chunk_id for chunks in existing_chunks.values() for chunk in chunks
+            if chunk.chunk_id not in kept_ids
+        ]
+        
+        if nlp_controller is not None and (removed_ids or invalidated_ids):
+            _ = await nlp_controller.delete_chunks_from_vector_db(project_id, removed_ids + invalidated_ids)
+        
+        no_removed = await chunk_model.delete_chunks_by_ids(removed_ids)
+        _ = await chunk_model.update_chunks(chunk_updates)
+        no_added = await chunk_model.insert_many_chunks(new_records) if new_records else 0
+        
+        return no_added, no_removed
+    
+    async def process_assets(self, chunk_model, asset_model, project_id: int, assets: list,
+                             chunk_size: int = 100, chunk_overlap: int = 20, force: bool = False,
+                             nlp_controller=None, on_progress=None):
+        """
+        Load, split and store the chunks of the given file assets.
+        Assets whose file and chunking parameters did not change since the last run are skipped
+        (unless force), changed ones only have their changed chunks replaced.
+        on_progress(files_processed, chunks_parsed) is called after each file.
+        Returns (is_processed, stats).
+        """
+        processing_config = {"chunk_size": chunk_size, "overlap_size": chunk_overlap}
+        stats = {"added_chunks": 0, "removed_chunks": 0, "files_processed": 0, "files_skipped": 0}
+        
+        changed_assets = await self.get_changed_assets(assets, processing_config, force=force)
+        stats["files_skipped"] = len(assets) - len(changed_assets)
+        project_files_ids = {asset_id: asset.asset_name for asset_id, (asset, _) in changed_assets.items()}
+        chunks_parsed = 0
+        
+        async for asset_id, file_id, file_chunks in self.iter_files_chunks(project_files_ids, chunk_size, chunk_overlap):
+            
+            if file_chunks is None:
+                logger.error(f"File content not found for file_id: {file_id}")
+                continue
+            
+            if len(file_chunks) == 0:
+                return False, stats
+            
+            no_added, no_removed = await self.sync_asset_chunks(
+                chunk_model, project_id, asset_id, file_chunks, nlp_controller=nlp_controller
+            )
+            _, content_hash = changed_assets[asset_id]
+            await asset_model.update_asset_processing(asset_id, content_hash, processing_config)
+            
+            stats["added_chunks"] += no_added
+            stats["removed_chunks"] += no_removed
+            stats["files_processed"] += 1
+            chunks_parsed += len(file_chunks)
+            
+            if on_progress:
+                progress = on_progress(stats["files_processed"], chunks_parsed)
+                if inspect.isawaitable(progress):
+                    await progress
         
-        return chunks
-    
\ No newline at end of file
+        return True, stats
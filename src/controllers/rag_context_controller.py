@@ -0,0 +1,138 @@
+from .base_controller import BaseController
+from models.db_schemes import RetrievedDocument
+from typing import List
+import re
+import unicodedata
+
+WORD_PATTERN = re.compile(r"\w+")
+# sentence ends of latin and arabic text, or a line break
+SENTENCE_END_PATTERN = re.compile(r"[.!?؟。]+[\"')\]]*(?=\s)|\n")
+
+
+class RAGContextController(BaseController):
+    """
+    Builds the documents of a RAG prompt within a token budget.
+    Near-duplicate chunks are dropped, retrieved chunks that follow each other in the same asset
+    (by chunk_order) are merged into one passage, then the best scoring passages are packed greedily
+    until the budget is spent, the remaining budget being filled with the start of the best skipped
+    passage cut at a sentence end.
+    Token counts come from the tokenizer of the generation client (count_tokens / truncate_text).
+    """
+
+    def __init__(self, tokenizer, dedup_threshold: float = None, merge_adjacent: bool = None,
+                 min_partial_tokens: int = None, shingle_size: int = 3, max_overlap_characters: int = 1000):
+        super().__init__()
+
+        self.tokenizer = tokenizer
+        self.dedup_threshold = (dedup_threshold if dedup_threshold is not None
+                                else self.app_settings.RAG_CONTEXT_DEDUP_THRESHOLD)
+        self.merge_adjacent = merge_adjacent if merge_adjacent is not None else self.app_settings.RAG_CONTEXT_MERGE_ADJACENT
+        self.min_partial_tokens = (min_partial_tokens if min_partial_tokens is not None
+                                   else self.app_settings.RAG_CONTEXT_MIN_PARTIAL_TOKENS)
+        self.shingle_size = shingle_size
+        self.max_overlap_characters = max_overlap_characters
+
+    def get_shingles(self, text: str) -> set:
+        words = WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+        if len(words) < self.shingle_size:
+            return {tuple(words)}
+        return {tuple(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def drop_near_duplicates(self, documents: List[RetrievedDocument]) -> List[RetrievedDocument]:
+        """Keep the best scoring document of each group whose word shingles overlap above dedup_threshold (jaccard)."""
+        if not self.dedup_threshold or self.dedup_threshold <= 0:
+            return documents
+
+        kept, kept_shingles = [], []
+        for document in sorted(documents, key=lambda d: d.score, reverse=True):
+            shingles = self.get_shingles(document.text)
+            if any(
+                len(shingles & other) / len(shingles | other) >= self.dedup_threshold
+                for other in kept_shingles if shingles | other
+            ):
+                continue
+            kept.append(document)
+            kept_shingles.append(shingles)
+        return kept
+
+    def join_texts(self, first: str, second: str) -> str:
+        # consecutive chunks repeat the splitter overlap, keep it once
+        first, second = first.rstrip(), second.lstrip()
+        for size in range(min(len(first), len(second), self.max_overlap_characters), 0, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+        return first + "\n" + second
+
+    def merge_adjacent_chunks(self, documents: List[RetrievedDocument], chunk_positions: dict) -> List[RetrievedDocument]:
+        """
+        Merge the documents that are consecutive chunks of the same asset into one passage, scored by its best chunk.
+        chunk_positions maps chunk_id -> (chunk_asset_id, chunk_order), documents without a position are kept as is.
+        """
+        if not self.merge_adjacent or not chunk_positions:
+            return documents
+
+        passages, runs = [], {}
+        positioned = sorted(
+            ((chunk_positions[d.chunk_id], d) for d in documents if d.chunk_id in chunk_positions),
+            key=lambda item: item[0]
+        )
+        for (asset_id, chunk_order), document in positioned:
+            run = runs.get(asset_id)
+            if run is not None and run["last_order"] == chunk_order - 1:
+                run["text"] = self.join_texts(run["text"], document.text)
+                run["score"] = max(run["score"], document.score)
+                run["last_order"] = chunk_order
+            else:
+                if run is not None:
+                    passages.append(run)
+                runs[asset_id] = {"chunk_id": document.chunk_id, "text": document.text,
+                                  "score": document.score, "last_order": chunk_order}
+        passages.extend(runs.values())
+
+        merged = [
+            RetrievedDocument(chunk_id=p["chunk_id"], text=p["text"], score=p["score"])
+            for p in passages
+        ]
+        merged.extend(d for d in documents if d.chunk_id not in chunk_positions)
+        return sorted(merged, key=lambda d: d.score, reverse=True)
+
+    def truncate_at_sentence(self, text: str, max_tokens: int) -> str:
+        truncated = self.tokenizer.truncate_text(text, max_tokens)
+        if len(truncated) >= len(text):
+            return text
+        sentence_ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(truncated)]
+        if sentence_ends:
+            return truncated[:sentence_ends[-1]].strip()
+        # a single long sentence, cut at the last word
+        return truncated.rsplit(maxsplit=1)[0] if " " in truncated.strip() else truncated
+
+    def pack_documents(self, documents: List[RetrievedDocument], token_budget: int,
+                       document_overhead: int = 0) -> List[RetrievedDocument]:
+        """
+        Greedy packing by score: a document that doesn't fit is skipped for the next (smaller) ones.
+        document_overhead is the token count of the template around each document.
+        """
+        packed, skipped = [], None
+        remaining = token_budget
+        for document in sorted(documents, key=lambda d: d.score, reverse=True):
+            text = document.text.strip()
+            tokens = self.tokenizer.count_tokens(text) + document_overhead
+            if tokens <= remaining:
+                packed.append(document if text == document.text else document.model_copy(update={"text": text}))
+                remaining -= tokens
+            elif skipped is None:
+                skipped = document
+
+        partial_budget = remaining - document_overhead
+        if skipped is not None and partial_budget >= self.min_partial_tokens:
+            text = self.truncate_at_sentence(skipped.text.strip(), partial_budget)
+            if text:
+                packed.append(skipped.model_copy(update={"text": text}))
+
+        return sorted(packed, key=lambda d: d.score, reverse=True)
+
+    def build_context(self, documents: List[RetrievedDocument], token_budget: int, chunk_positions: dict = None,
+                      document_overhead: int = 0) -> List[RetrievedDocument]:
+        documents = self.drop_near_duplicates(documents)
+        documents = self.merge_adjacent_chunks(documents, chunk_positions or {})
+        return self.pack_documents(documents, token_budget, document_overhead)
@@ -1 +1,2 @@
-from .config import get_settings, Settings
\ No newline at end of file
+from .config import get_settings, reload_settings, Settings
+from .metrics import Histogram
\ No newline at end of file
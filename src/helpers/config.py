@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
+from functools import lru_cache
 
 class Settings(BaseSettings):
 
@@ -18,8 +19,8 @@ class Settings(BaseSettings):
     POSTGRESQL_PORT: int = 5432
     ADDITIONAL_GCP: str = "?host=/cloudsql/pdf-ocr-extractor-488523:us-central1:mini-rag-db-instance"  # Additional connection parameters for GCP Cloud SQL
 
-    GENERATION_BACKEND: str = "gemini"  # Options: openai, gemini, huggingface
-    EMBEDDING_BACKEND: str = "gemini"   # Options: openai, gemini, huggingface
+    GENERATION_BACKEND: str = "gemini"  # Options: openai, gemini, huggingface, ollama, fake
+    EMBEDDING_BACKEND: str = "gemini"   # Options: openai, gemini, huggingface, ollama, fake
 
 
     OPENAI_API_KEY: Optional[str] = None
@@ -27,26 +28,114 @@ class Settings(BaseSettings):
     HUGGING_FACE_API_KEY: Optional[str] = None
     OLLAMA_API_KEY: Optional[str] = None
     OLLAMA_HOST: Optional[str] = None
+
+    # fake backend: local deterministic stand-in for benchmarks and offline runs, no network
+    FAKE_LATENCY_MS: float = 300.0  # Median time to the first token, log-normally distributed
+    FAKE_LATENCY_SIGMA: float = 0.5  # Spread of the log-normal latency, 0 gives a constant latency
+    FAKE_TOKENS_PER_SECOND: float = 50.0  # Decoding speed after the first token, 0 for instant
+    FAKE_OUTPUT_TOKENS: int = 200  # Answer length, capped by the max output tokens of the call
+    FAKE_EMBEDDING_LATENCY_MS: float = 20.0  # Median latency of an embedding call
+    FAKE_ERROR_RATE: float = 0.0  # Fraction of the calls failing with a retryable 503
+    FAKE_FAIL_AFTER_TOKENS: int = 0  # Failing streams fail after this many tokens, 0 fails them before the first one
+    FAKE_SEED: int = 0  # Seed of the embeddings, latencies and failures
     
     GENERATION_MODEL_ID: str = "gemini-2.5-flash"  # OpenAI: gpt-4o, gpt-3.5-turbo | Gemini: gemini-1.5-pro | HuggingFace: meta-llama/Llama-2-7b-chat-hf
     EMBEDDING_MODEL_ID: str = "gemini-embedding-001"  # OpenAI: text-embedding-3-small | Gemini: models/text-embedding-004 | HuggingFace: sentence-transformers/all-MiniLM-L6-v2
     EMBEDDING_SIZE: int = 768  # OpenAI: 3076,1536 | Gemini: 768 | HuggingFace: 384
 
+    EMBEDDING_CACHE_ENABLED: bool = True  # Reuse embeddings of already seen texts (same backend, model, size and document type)
+    EMBEDDING_CACHE_LRU_SIZE: int = 10000  # Number of embeddings kept in memory in front of the postgres cache table
+
+    EMBEDDING_BATCH_ENABLED: bool = True  # Coalesce the query embeddings of concurrent search/answer requests into one embedding call
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # How long the first query of a batch waits for others
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # A batch is sent as soon as it holds this many queries
+
+    ANSWER_CACHE_ENABLED: bool = True  # Reuse RAG answers of repeated questions, per project, until the project is re-indexed or reset
+    ANSWER_CACHE_MAX_ENTRIES: int = 500  # Cached answers kept per project (LRU)
+    ANSWER_CACHE_TTL_SECONDS: int = 3600  # Max age of a cached answer, 0 keeps them until invalidated
+    ANSWER_CACHE_SEMANTIC_THRESHOLD: float = 0.0  # Cosine similarity above which a similar question reuses a cached answer, 0 disables it (e.g. 0.95)
+
     INPUT_DEFAULT_MAX_CHARACTERS: int = 2000
     GENERATION_DEFAULT_MAX_TOKENS: int = 2000
     GENERATION_DEFAULT_TEMPERATURE: float = 0.2
+    LLM_SCHEDULER_ENABLED: bool = True  # Send the provider calls through a per-backend scheduler: rate limits, adaptive concurrency, retries, interactive calls before indexing ones
+    LLM_RATE_LIMITS: dict = {}  # Per backend token buckets, e.g. {"openai": {"requests_per_minute": 500, "tokens_per_minute": 200000}}, missing or 0 means no limit
+    LLM_MIN_CONCURRENCY: int = 1  # Lower bound of the adaptive (AIMD) number of calls in flight per backend
+    LLM_MAX_CONCURRENCY: int = 32  # Upper bound of the adaptive number of calls in flight per backend
+    LLM_INITIAL_CONCURRENCY: int = 8  # Calls in flight per backend at startup, grows by 1 per window of successful calls, halved on 429s
+    LLM_MAX_RETRIES: int = 4  # Retries of a call failing with 429, 5xx or a timeout (full jitter exponential backoff, or the Retry-After delay)
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    LLM_LATENCY_TOLERANCE: float = 2.0  # Concurrency is reduced when the recent latency goes above this times the long term average, 0 disables it
+    GENERATION_FALLBACK_BACKENDS: list = []  # Ordered backends tried after GENERATION_BACKEND, e.g. [{"backend": "openai", "model_id": "gpt-4o-mini"}]
+    EMBEDDING_FALLBACK_BACKENDS: list = []  # Ordered backends tried after EMBEDDING_BACKEND, e.g. [{"backend": "ollama", "model_id": "nomic-embed-text", "embedding_space": "nomic-embed-text-v1.5:768"}]
+    EMBEDDING_SPACE: Optional[str] = None  # Embedding fallbacks are only used with the same space, defaults to "EMBEDDING_MODEL_ID:EMBEDDING_SIZE"
+    LLM_HEDGE_ENABLED: bool = True  # Also send a slow interactive call to the next backend, the first answer wins
+    LLM_HEDGE_PERCENTILE: float = 0.95  # A call is hedged after this percentile of its backend latency
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Calls of a backend observed before hedging its calls
+    LLM_LATENCY_WINDOW: int = 200  # Last calls per backend and call kind used for the hedge percentile
+    
+    GENERATION_CONTEXT_WINDOW: int = 32768  # Context window (tokens) of the generation model, GENERATION_DEFAULT_MAX_TOKENS of it are kept for the answer
+    
+    RAG_CONTEXT_PACKING_ENABLED: bool = True  # Fit the retrieved chunks in a token budget (dedup, merge adjacent chunks, greedy packing by score), otherwise each chunk is clipped to INPUT_DEFAULT_MAX_CHARACTERS
+    RAG_CONTEXT_MAX_TOKENS: int = 4000  # Token budget of the retrieved documents in the RAG prompt, 0 only limits it by the context window
+    RAG_CONTEXT_DEDUP_THRESHOLD: float = 0.9  # Word 3-gram jaccard similarity above which a lower scoring chunk is dropped as a near-duplicate, 0 disables it
+    RAG_CONTEXT_MERGE_ADJACENT: bool = True  # Merge retrieved chunks that follow each other (chunk_order) in the same asset into one passage
+    RAG_CONTEXT_MIN_PARTIAL_TOKENS: int = 64  # Smallest leftover budget filled with the start of a passage that doesn't fit (cut at a sentence end)
+    
+    NLP_BATCH_MAX_CONCURRENT_GENERATIONS: int = 4  # /index/answer/batch: answers generated at the same time (per request)
+    NLP_BATCH_MAX_CONCURRENT_SEARCHES: int = 8  # /index/search|answer/batch in hybrid mode: hybrid searches run at the same time (vector mode is a single query)
     
     VECTOR_DB_BACKEND: str= "pgvector"  # Options: qdrant_db, pinecone_db, weaviate_db, faiss_db
     VECTOR_DB_PATH: str= "qdrant_db"  # For qdrant_db, this is the path where the qdrant server will store its data. For pgvector, this is not used.
     VECTOR_DB_DISTANCE_METRIC: str = "cosine"  # Options: Cosine, Euclidean, DotProduct
+    VECTOR_DB_PGVEC_LAYOUT: str = "table_per_collection"  # Options: table_per_collection, partitioned (one table per dimension hash-partitioned by project id, see pgvector_migrate_layout.py)
+    VECTOR_DB_PGVEC_PARTITIONS: int = 64  # Number of hash partitions of the partitioned layout, fixed when its table is created
+    VECTOR_DB_PGVEC_ITERATIVE_SCAN: str = "strict_order"  # hnsw.iterative_scan mode for filtered searches and the partitioned layout (strict_order, relaxed_order, off), needs pgvector >= 0.8
     VECTOR_DB_PGVEC_INDEX_THRESHOLD: int = 8000  # Threshold for apply indexing strategy in pgvector provider, if number of vectors in collection exceeds this threshold, it will create an index on the vector column for faster similarity search
+    VECTOR_DB_PGVEC_INDEX_TYPE: str = "hnsw"  # Options: hnsw, ivfflat. Built in the background with CREATE INDEX CONCURRENTLY, after a bulk load
+    VECTOR_DB_PGVEC_HNSW_M: int = 16  # HNSW max connections per node, higher gives better recall and a bigger, slower to build index
+    VECTOR_DB_PGVEC_HNSW_EF_CONSTRUCTION: int = 64  # HNSW candidate list size while building, higher gives better recall and slower builds
+    VECTOR_DB_PGVEC_IVFFLAT_LISTS: int = 0  # IVFFlat lists, 0 means rows / 1000 (sqrt(rows) above 1M rows) at build time
+    VECTOR_DB_SEARCH_PROFILES: dict = {  # Search accuracy presets selectable per request (hnsw.ef_search / ivfflat.probes on pgvector, hnsw_ef on qdrant, exact disables the index)
+        "fast": {"hnsw_ef_search": 16, "ivfflat_probes": 1},
+        "balanced": {"hnsw_ef_search": 64, "ivfflat_probes": 10},
+        "exact": {"exact": True}
+    }
+    VECTOR_DB_SEARCH_DEFAULT_PROFILE: str = "balanced"  # Profile used when a search request doesn't name one
+    VECTOR_DB_SEARCH_DEFAULT_MODE: str = "vector"  # Options: vector, hybrid (vector + full-text search fused with reciprocal rank fusion), selectable per request
+    VECTOR_DB_HYBRID_VECTOR_WEIGHT: float = 1.0  # Default RRF weight of the vector ranking in hybrid search
+    VECTOR_DB_HYBRID_LEXICAL_WEIGHT: float = 1.0  # Default RRF weight of the full-text ranking in hybrid search
+    VECTOR_DB_HYBRID_RRF_K: int = 60  # RRF constant, a row scores weight / (k + rank) in each ranking
+    VECTOR_DB_HYBRID_CANDIDATES: int = 50  # Rows taken from each ranking before fusing (at least top_k)
+    VECTOR_DB_PGVEC_TEXT_SEARCH_CONFIG: str = "simple"  # Postgres text search configuration of the tsvector column (simple keeps identifiers and works for any language, or e.g. english)
+    VECTOR_DB_FILTER_INDEXED_KEYS: dict = {"page": "integer"}  # Chunk metadata keys indexed for search filters (btree on pgvector, payload index of the given type on qdrant: integer, float, keyword), for new collections
+    
+    PROJECT_CACHE_MAX_SIZE: int = 10000  # Known project ids kept in memory, so requests skip the project lookup query
+    PROJECT_CACHE_TTL_SECONDS: int = 300  # Max age of a cached project, 0 keeps them until evicted
+    
+    PROCESS_POOL_WORKERS: int = 0  # Processes used to load and split files, 0 means one per CPU core
+    PROCESS_PDF_PAGES_PER_TASK: int = 50  # Bigger pdfs are split into page ranges parsed in parallel, 0 disables it
+    
+    JOB_WORKER_MODE: str = "in_process"  # Options: in_process (asyncio workers inside the api), external (run job_worker.py)
+    JOB_WORKERS_COUNT: int = 2  # Number of concurrent background jobs per process
+    JOB_POLL_INTERVAL: float = 2.0  # Seconds between polls for pending jobs when idle
+    JOB_LEASE_TIMEOUT_SECONDS: int = 300  # A running job whose worker stopped renewing it (crash, OOM kill) for this long is claimed again, 0 never reclaims
     
     PRIMARY_LANGUAGE: str = 'en'
     DEFAULT_LANGUAGE: str = 'en'
+    TEMPLATES_HOT_RELOAD: bool = False  # Reload the prompt templates (stores/llm/templates/locales) when their files change, for development
+    TEMPLATES_RELOAD_INTERVAL_SECONDS: float = 2.0  # Min seconds between two checks of the template files when hot reload is on
     
     model_config = SettingsConfigDict(env_file=".env")
         
+@lru_cache(maxsize=1)
 def get_settings():
+    # parsed once per process, call reload_settings() to pick up .env / environment changes
     return Settings()
+
+def reload_settings():
+    get_settings.cache_clear()
+    return get_settings()
     
 
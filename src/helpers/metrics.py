@@ -0,0 +1,31 @@
+import bisect
+
+
+class Histogram:
+    """
+    In-memory histogram with fixed upper bounds, exported like a prometheus histogram:
+    cumulative counts per bucket (le), plus the count and the sum of the observed values.
+    """
+
+    def __init__(self, buckets: list):
+        self.buckets = sorted(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets + ["+Inf"], self.bucket_counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0
+        }
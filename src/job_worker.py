@@ -0,0 +1,32 @@
+"""
+Out-of-process worker for background jobs.
+Run it next to the api (with JOB_WORKER_MODE=external on the api side):
+
+    python job_worker.py
+"""
+import asyncio
+import logging
+from main import app, startup, shutdown
+from helpers import get_settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+async def run_worker():
+    await startup()
+    settings = get_settings()
+    try:
+        if settings.JOB_WORKER_MODE != "in_process":
+            await app.job_controller.start(settings.JOB_WORKERS_COUNT)
+        logger.info("Job worker is running, waiting for jobs...")
+        await asyncio.gather(*app.job_controller.workers)
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
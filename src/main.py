@@ -1,12 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import base, data, nlp
+from routes import base, data, nlp, jobs
 from helpers import get_settings
 from stores.llm import LLMProviderFactory
 from stores.vector_db import VectorDBProviderFactory
 from stores.llm.templates.template_parser import TemplateParser
+from controllers import JobController, EmbeddingCacheController, EmbeddingBatchController, AnswerCacheController, NLPCntroller, DataController
+from models import ProjectModel, AssetModel, ChunkModel, JobModel
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 # from utils.metrics import setup_metrics
 import logging
 logger = logging.getLogger("uvicorn.error")
@@ -43,27 +47,102 @@ async def startup():
     app.db_client = sessionmaker(app.postgres_engine, class_=AsyncSession, expire_on_commit=False)
     logger.info("Connected to the PostgreSQL database!")
     
+    # Process pool for loading and splitting files (spawn: forking a process with running threads is unsafe)
+    app.process_pool = ProcessPoolExecutor(
+        max_workers=settings.PROCESS_POOL_WORKERS or None,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    
     llm_provider_factory = LLMProviderFactory(config=settings)
     vector_db_provider_factory = VectorDBProviderFactory(config=settings, db_client=app.db_client)
 
     # Generation Client
-    app.generation_client = llm_provider_factory.create(provider_name=settings.GENERATION_BACKEND)
-    app.generation_client.set_generation_model(settings.GENERATION_MODEL_ID)
+    app.generation_client = llm_provider_factory.create_generation_client()
     
     # Embedding Client
-    app.embedding_client = llm_provider_factory.create(provider_name=settings.EMBEDDING_BACKEND)
-    app.embedding_client.set_embedding_model(settings.EMBEDDING_MODEL_ID, settings.EMBEDDING_SIZE)
+    app.embedding_client = llm_provider_factory.create_embedding_client()
+    
+    # Embedding Cache
+    app.embedding_cache = None
+    if settings.EMBEDDING_CACHE_ENABLED:
+        app.embedding_cache = EmbeddingCacheController(
+            db_client=app.db_client,
+            embedding_client=app.embedding_client,
+            embedding_backend=settings.EMBEDDING_BACKEND,
+            lru_size=settings.EMBEDDING_CACHE_LRU_SIZE
+        )
+    
+    # Query embeddings of concurrent requests are sent in batches (through the cache when it is enabled)
+    app.embedding_batcher = None
+    if settings.EMBEDDING_BATCH_ENABLED:
+        app.embedding_batcher = EmbeddingBatchController(
+            embedder=app.embedding_cache or app.embedding_client,
+            window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE
+        )
+    
+    # Answer Cache
+    app.answer_cache = None
+    if settings.ANSWER_CACHE_ENABLED:
+        app.answer_cache = AnswerCacheController(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            semantic_threshold=settings.ANSWER_CACHE_SEMANTIC_THRESHOLD,
+            db_client=app.db_client
+        )
     
     # Vector DB Client
     app.vector_db_client = vector_db_provider_factory.create(provider=settings.VECTOR_DB_BACKEND)
     await app.vector_db_client.connect()
     
-    app.template_parser = TemplateParser(language=settings.PRIMARY_LANGUAGE, default_language=settings.DEFAULT_LANGUAGE)
+    # all the prompt templates are loaded and compiled once here
+    app.template_parser = TemplateParser(
+        language=settings.PRIMARY_LANGUAGE,
+        default_language=settings.DEFAULT_LANGUAGE,
+        hot_reload=settings.TEMPLATES_HOT_RELOAD,
+        reload_interval_seconds=settings.TEMPLATES_RELOAD_INTERVAL_SECONDS
+    )
+    
+    # App-scoped models and controllers, shared by all requests (they only hold clients and settings)
+    app.project_model = await ProjectModel.create_instance(app.db_client)
+    app.asset_model = await AssetModel.create_instance(app.db_client)
+    app.chunk_model = await ChunkModel.create_instance(app.db_client)
+    app.job_model = await JobModel.create_instance(app.db_client)
+    app.data_controller = DataController()
+    app.nlp_controller = NLPCntroller(
+        vector_db_client=app.vector_db_client,
+        generation_client=app.generation_client,
+        embedding_client=app.embedding_client,
+        template_parser=app.template_parser,
+        embedding_cache=app.embedding_cache,
+        answer_cache=app.answer_cache,
+        chunk_model=app.chunk_model,
+        embedding_batcher=app.embedding_batcher
+    )
     
+    # Background jobs (processing / indexing)
+    app.job_controller = JobController(
+        db_client=app.db_client,
+        vector_db_client=app.vector_db_client,
+        generation_client=app.generation_client,
+        embedding_client=app.embedding_client,
+        template_parser=app.template_parser,
+        embedding_cache=app.embedding_cache,
+        answer_cache=app.answer_cache,
+        process_pool=app.process_pool,
+        project_model=app.project_model
+    )
+    if settings.JOB_WORKER_MODE == "in_process":
+        await app.job_controller.start(settings.JOB_WORKERS_COUNT)
     
     
 @app.on_event("shutdown")
 async def shutdown():
+    await app.job_controller.stop()
+    if app.embedding_batcher is not None:
+        # answer the queries still waiting for their batch
+        await app.embedding_batcher.close()
+    app.process_pool.shutdown(cancel_futures=True)
     await app.postgres_engine.dispose()
     logger.info("Disconnected from the PostgreSQL database!")
     await app.vector_db_client.disconnect()
@@ -74,3 +153,4 @@ async def shutdown():
 app.include_router(base.base_router)
 app.include_router(data.data_router)
 app.include_router(nlp.nlp_router)
+app.include_router(jobs.jobs_router)
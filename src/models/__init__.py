@@ -4,3 +4,6 @@ from .enums.asset_type_enum import AssetTypeEnum
 from .project_model import ProjectModel
 from .chunk_model import ChunkModel
 from .asset_model import AssetModel
+from .job_model import JobModel
+from .embedding_cache_model import EmbeddingCacheModel
+from .enums.job_enum import JobTypeEnum, JobStatusEnum
@@ -1,9 +1,10 @@
 from .base_data_model import BaseDataModel
 from .db_schemes import Asset
 from .enums.db_Enum import DB_Enum
+from .enums.asset_type_enum import AssetTypeEnum
 from bson import ObjectId
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, update
 
 class AssetModel(BaseDataModel):
     
@@ -45,4 +46,23 @@ class AssetModel(BaseDataModel):
             )
             result = await session.execute(stmt)
             asset = result.scalar_one_or_none()
-            return asset
\ No newline at end of file
+            return asset
+        
+    async def get_project_file_assets(self, asset_project_id: int, asset_id: int = None) -> list[Asset]:
+        """One file asset (asset_id) or all the file assets of the project."""
+        if asset_id:
+            asset = await self.get_asset_record(asset_id, asset_project_id)
+            if asset is None:
+                return []
+            return [asset]
+        
+        return await self.get_all_assets_by_project_id(asset_project_id, AssetTypeEnum.FILE.value)
+    
+    async def update_asset_processing(self, asset_id: int, asset_content_hash: str, asset_config: dict) -> None:
+        async with self.db_client() as session:
+            async with session.begin():
+                stmt = update(Asset).where(Asset.asset_id == asset_id).values(
+                    asset_content_hash=asset_content_hash,
+                    asset_config=asset_config
+                )
+                await session.execute(stmt)
@@ -5,4 +5,8 @@ from helpers.config import get_settings, Settings
 class BaseDataModel:
     def __init__(self, db_client):
         self.db_client = db_client
-        self.app_settings: Settings = get_settings()
\ No newline at end of file
+    
+    @property
+    def app_settings(self) -> Settings:
+        # read through the cached settings so app-scoped models follow reload_settings()
+        return get_settings()
\ No newline at end of file
@@ -5,7 +5,10 @@ from bson.objectid import ObjectId
 from pymongo import InsertOne
 from typing import Any
 from sqlalchemy.future import select
-from sqlalchemy import func, delete
+from sqlalchemy import func, delete, update
+from sqlalchemy.sql import text as sql_text
+import json
+import uuid
 
 class ChunkModel(BaseDataModel):
     
@@ -35,13 +38,47 @@ class ChunkModel(BaseDataModel):
         
     
     async def insert_many_chunks(self, chunks: list[DataChunk], batch_size: int=100) -> int:
+        chunk_ids = await self.copy_chunks(chunks)
+        return len(chunk_ids)
+    
+    async def copy_chunks(self, chunks: list[DataChunk]) -> list[int]:
+        """
+        Bulk insert the chunks with a binary COPY and return their chunk_ids (in the same order).
+        COPY can't return generated keys, so the ids are reserved from the sequence first.
+        """
+        if not chunks:
+            return []
+        
         async with self.db_client() as session:
             async with session.begin():
-                for i in range(0, len(chunks), batch_size):
-                    batch = chunks[i:i+batch_size]
-                    session.add_all(batch)
-            await session.commit()
-        return len(chunks)
+                result = await session.execute(sql_text(
+                    "SELECT nextval(pg_get_serial_sequence('chunks', 'chunk_id')) FROM generate_series(1, :count)"
+                ), {"count": len(chunks)})
+                chunk_ids = result.scalars().all()
+                
+                records = []
+                for chunk_id, chunk in zip(chunk_ids, chunks):
+                    chunk.chunk_id = chunk_id
+                    chunk.chunk_uuid = chunk.chunk_uuid or uuid.uuid4()
+                    records.append((
+                        chunk.chunk_id,
+                        chunk.chunk_uuid,
+                        chunk.chunk_text,
+                        json.dumps(chunk.chunk_metadata) if chunk.chunk_metadata is not None else None,
+                        chunk.chunk_order,
+                        chunk.chunk_project_id,
+                        chunk.chunk_asset_id
+                    ))
+                
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    DataChunk.__tablename__,
+                    records=records,
+                    columns=["chunk_id", "chunk_uuid", "chunk_text", "chunk_metadata",
+                             "chunk_order", "chunk_project_id", "chunk_asset_id"]
+                )
+        return chunk_ids
             
     async def delete_chunks_by_project_id(self, project_id: ObjectId) -> int:
         async with self.db_client() as session:
@@ -50,12 +87,62 @@ class ChunkModel(BaseDataModel):
             await session.commit()
         return result.rowcount
     
+    async def get_asset_chunks(self, asset_id: int):
+        async with self.db_client() as session:
+            stmt = select(
+                DataChunk.chunk_id, DataChunk.chunk_text, DataChunk.chunk_metadata, DataChunk.chunk_order
+            ).where(DataChunk.chunk_asset_id == asset_id).order_by(DataChunk.chunk_order)
+            result = await session.execute(stmt)
+            records = result.all()
+        return records
+    
+    async def get_chunks_positions(self, chunk_ids: list[int]) -> dict:
+        """chunk_id -> (chunk_asset_id, chunk_order) of the given chunks."""
+        if not chunk_ids:
+            return {}
+        async with self.db_client() as session:
+            stmt = select(
+                DataChunk.chunk_id, DataChunk.chunk_asset_id, DataChunk.chunk_order
+            ).where(DataChunk.chunk_id.in_(chunk_ids))
+            result = await session.execute(stmt)
+            records = result.all()
+        return {record.chunk_id: (record.chunk_asset_id, record.chunk_order) for record in records}
+    
+    async def delete_chunks_by_ids(self, chunk_ids: list[int]) -> int:
+        if not chunk_ids:
+            return 0
+        async with self.db_client() as session:
+            stmt = delete(DataChunk).where(DataChunk.chunk_id.in_(chunk_ids))
+            result = await session.execute(stmt)
+            await session.commit()
+        return result.rowcount
+    
+    async def update_chunks(self, chunks: list[dict]) -> int:
+        """Bulk update by primary key, each dict holds chunk_id and the columns to set."""
+        if not chunks:
+            return 0
+        async with self.db_client() as session:
+            async with session.begin():
+                await session.execute(update(DataChunk), chunks)
+        return len(chunks)
+    
     async def get_project_chunks(self, project_id: ObjectId, page_no: int=1, page_size:int=50):
         async with self.db_client() as session:
             stmt = select(DataChunk).where(DataChunk.chunk_project_id == project_id).offset((page_no - 1) * page_size).limit(page_size)
             result = await session.execute(stmt)
             records = result.scalars().all()
         return records
+    
+    async def get_project_chunks_after(self, project_id: int, last_chunk_id: int=0, page_size: int=50):
+        """Keyset pagination: fetch the next page of chunks with chunk_id greater than last_chunk_id."""
+        async with self.db_client() as session:
+            stmt = select(DataChunk).where(
+                DataChunk.chunk_project_id == project_id,
+                DataChunk.chunk_id > last_chunk_id
+            ).order_by(DataChunk.chunk_id).limit(page_size)
+            result = await session.execute(stmt)
+            records = result.scalars().all()
+        return records
         
     async def get_total_chunks_count(self, project_id: ObjectId) -> int:
         total_count = 0
@@ -1 +1 @@
-from .minirag.schemes import Project, Asset, DataChunk, RetrievedDocument
+from .minirag.schemes import Project, Asset, DataChunk, RetrievedDocument, Job, EmbeddingCache
@@ -0,0 +1,64 @@
+"""add collection text search
+
+Revision ID: e6f1a9c3b8d2
+Revises: d2a8f5e37c14
+Create Date: 2026-10-18 16:05:27.431902
+
+"""
+from typing import Sequence, Union
+import os
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f1a9c3b8d2'
+down_revision: Union[str, Sequence[str], None] = 'd2a8f5e37c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the vector collections are created by the pgvector providers, not by the models:
+# collection_{dim}_{project_id} tables, or the pgvector_{dim} partitioned tables
+COLLECTION_TABLE_PATTERN = re.compile(r"^(collection_\d+_\d+|pgvector_\d+)$")
+# same value as the VECTOR_DB_PGVEC_TEXT_SEARCH_CONFIG setting of the app
+TEXT_SEARCH_CONFIG = os.getenv("VECTOR_DB_PGVEC_TEXT_SEARCH_CONFIG", "simple")
+
+
+def get_collection_tables_without_text_search() -> list:
+    # partitions get the column and the index from their parent table
+    results = op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_class c
+        WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition
+          AND EXISTS (SELECT 1 FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attname = 'vector')
+          AND NOT EXISTS (SELECT 1 FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attname = 'text_search')
+    """))
+    return sorted(name for name in results.scalars().all() if COLLECTION_TABLE_PATTERN.match(name))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", TEXT_SEARCH_CONFIG):
+        raise ValueError(f"Invalid text search configuration: {TEXT_SEARCH_CONFIG}")
+
+    # rewrites each table under an exclusive lock, run it with the api and the job workers stopped
+    for table_name in get_collection_tables_without_text_search():
+        op.execute(
+            f"ALTER TABLE {table_name} ADD COLUMN text_search tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(text, ''))) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_text_search_idx ON {table_name} USING gin (text_search)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    results = op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_class c
+        WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition
+          AND EXISTS (SELECT 1 FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attname = 'text_search')
+    """))
+    for table_name in results.scalars().all():
+        if COLLECTION_TABLE_PATTERN.match(table_name):
+            # drops its index too
+            op.execute(f"ALTER TABLE {table_name} DROP COLUMN text_search")
@@ -2,4 +2,6 @@ from .minirag_base import SQLAlchemyBase
 from .project import Project
 from .asset import Asset
 from .data_chunk import DataChunk, RetrievedDocument
+from .job import Job
+from .embedding_cache import EmbeddingCache
 
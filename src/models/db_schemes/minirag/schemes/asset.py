@@ -16,7 +16,8 @@ class Asset(SQLAlchemyBase):
     asset_name = Column(String, nullable=False)
     asset_type = Column(String, nullable=False)
     asset_size = Column(Integer, nullable=False)
-    asset_config = Column(JSONB, nullable=True)
+    asset_config = Column(JSONB, nullable=True)  # chunking parameters used for the last processing
+    asset_content_hash = Column(String(64), nullable=True)  # sha256 of the file content at the last processing
     
     asset_project_id = Column(Integer, ForeignKey("projects.project_id"), nullable=False)
     
@@ -5,6 +5,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy import Index
 import uuid
 from pydantic import BaseModel, Field
+from typing import Optional
 
 
 class DataChunk(SQLAlchemyBase):
@@ -30,8 +31,10 @@ class DataChunk(SQLAlchemyBase):
     __table_args__ = (
         Index('ix_chunk_asset_id', chunk_asset_id),
         Index('ix_chunk_project_id', chunk_project_id),
+        Index('ix_chunk_project_id_chunk_id', chunk_project_id, chunk_id),
     )
 
 class RetrievedDocument(BaseModel):
     text: str
-    score: float
\ No newline at end of file
+    score: float
+    chunk_id: Optional[int] = None
\ No newline at end of file
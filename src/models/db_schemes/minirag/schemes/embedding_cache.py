@@ -0,0 +1,19 @@
+from .minirag_base import SQLAlchemyBase
+from sqlalchemy import Column, Integer, String, DateTime, func, REAL
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+class EmbeddingCache(SQLAlchemyBase):
+    
+    __tablename__ = "embedding_cache"
+
+    # the key covers everything that changes the produced vector
+    embedding_backend = Column(String, primary_key=True)
+    embedding_model_id = Column(String, primary_key=True)
+    embedding_size = Column(Integer, primary_key=True)
+    document_type = Column(String, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)  # sha256 of the processed text
+    
+    embedding = Column(ARRAY(REAL), nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -9,10 +9,13 @@ class Project(SQLAlchemyBase):
 
     project_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     project_uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, nullable=False)
+    # bumped whenever the project is re-indexed or reset, the api processes drop their cached answers when it changes
+    answer_cache_generation = Column(Integer, nullable=False, server_default="0")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
     chunks = relationship("DataChunk", back_populates="project")
     assets = relationship("Asset", back_populates="project")
+    jobs = relationship("Job", back_populates="project")
        
\ No newline at end of file
@@ -0,0 +1,60 @@
+from .base_data_model import BaseDataModel
+from .db_schemes import EmbeddingCache
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+
+class EmbeddingCacheModel(BaseDataModel):
+    
+    def __init__(self, db_client: object):
+        super().__init__(db_client)
+        self.db_client = db_client
+    
+    @classmethod
+    async def create_instance(cls, db_client: object):
+        instance = cls(db_client)
+        return instance 
+    
+    
+    async def get_embeddings(self, embedding_backend: str, embedding_model_id: str, embedding_size: int,
+                             document_type: str, text_hashes: list[str]) -> dict:
+        """Return {text_hash: embedding} for the cached hashes."""
+        if not text_hashes:
+            return {}
+        
+        async with self.db_client() as session:
+            stmt = select(EmbeddingCache.text_hash, EmbeddingCache.embedding).where(
+                EmbeddingCache.embedding_backend == embedding_backend,
+                EmbeddingCache.embedding_model_id == embedding_model_id,
+                EmbeddingCache.embedding_size == embedding_size,
+                EmbeddingCache.document_type == document_type,
+                EmbeddingCache.text_hash.in_(text_hashes)
+            )
+            result = await session.execute(stmt)
+            records = result.all()
+        return {record.text_hash: list(record.embedding) for record in records}
+    
+    async def insert_embeddings(self, embedding_backend: str, embedding_model_id: str, embedding_size: int,
+                                document_type: str, embeddings: dict, batch_size: int=1000) -> int:
+        """Store {text_hash: embedding}, already cached hashes are left untouched."""
+        if not embeddings:
+            return 0
+        
+        values = [
+            {
+                "embedding_backend": embedding_backend,
+                "embedding_model_id": embedding_model_id,
+                "embedding_size": embedding_size,
+                "document_type": document_type,
+                "text_hash": text_hash,
+                "embedding": embedding
+            }
+            for text_hash, embedding in embeddings.items()
+        ]
+        
+        async with self.db_client() as session:
+            async with session.begin():
+                for i in range(0, len(values), batch_size):
+                    stmt = insert(EmbeddingCache).values(values[i:i+batch_size]).on_conflict_do_nothing()
+                    await session.execute(stmt)
+        return len(values)
+    
@@ -21,8 +21,13 @@ class ResponseSignals(Enum):
     VECTORDB_COLLECTION_RETRIEVED = "vectordb collection retrieved"
     VECTORDB_SEARCH_ERROR_OR_NOT_FOUND = "vector db search error or not found"
     VECTORDB_SEARCH_SUCCESS = "vector db search success"
+    VECTORDB_COLLECTION_NOT_FOUND = "vector db collection not found"
+    SEARCH_PROFILE_NOT_FOUND = "search accuracy profile not found"
+    INVALID_SEARCH_FILTER = "invalid search filter"
     RAG_ANSWER_ERROR = "rag answer error"
     RAG_ANSWER_SUCCESS = "rag answer success"
+    JOB_NOT_FOUND = "job not found with given id"
+    JOB_CANNOT_BE_CANCELLED = "job already finished and cannot be cancelled"
     
     
     
\ No newline at end of file
@@ -0,0 +1,104 @@
+from .base_data_model import BaseDataModel
+from .db_schemes import Job
+from .enums.job_enum import JobStatusEnum
+from sqlalchemy.future import select
+from sqlalchemy import func, update, or_, and_
+from datetime import timedelta
+
+class JobModel(BaseDataModel):
+    
+    def __init__(self, db_client: object):
+        super().__init__(db_client)
+        self.db_client = db_client
+    
+    @classmethod
+    async def create_instance(cls, db_client: object):
+        instance = cls(db_client)
+        return instance 
+    
+    
+    async def create_job(self, job: Job) -> Job:
+        async with self.db_client() as session:
+            async with session.begin():
+                session.add(job)
+            await session.commit()
+            await session.refresh(job)
+        return job
+    
+    async def get_job(self, job_id: int) -> Job | None:
+        async with self.db_client() as session:
+            result = await session.execute(select(Job).where(Job.job_id == job_id))
+        return result.scalar_one_or_none()
+    
+    async def get_project_jobs(self, project_id: int, page: int=1, page_size: int=20) -> list[Job]:
+        async with self.db_client() as session:
+            stmt = select(Job).where(Job.job_project_id == project_id).order_by(Job.job_id.desc()).offset((page - 1) * page_size).limit(page_size)
+            result = await session.execute(stmt)
+            records = result.scalars().all()
+        return records
+    
+    async def claim_next_job(self, lease_timeout_seconds: int = 0) -> Job | None:
+        """
+        Atomically move the oldest pending job to running, safe with many workers (SKIP LOCKED).
+        updated_at is the lease of a running job, renewed by its worker: a running job not renewed for
+        lease_timeout_seconds (its worker crashed or was killed) is claimed again. 0 only claims pending jobs.
+        """
+        is_claimable = Job.job_status == JobStatusEnum.PENDING.value
+        if lease_timeout_seconds:
+            is_claimable = or_(is_claimable, and_(
+                Job.job_status == JobStatusEnum.RUNNING.value,
+                func.coalesce(Job.updated_at, Job.started_at) < func.now() - timedelta(seconds=lease_timeout_seconds)
+            ))
+        
+        async with self.db_client() as session:
+            async with session.begin():
+                next_job = select(Job.job_id).where(
+                    is_claimable
+                ).order_by(Job.job_id).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+                
+                stmt = update(Job).where(Job.job_id == next_job).values(
+                    job_status=JobStatusEnum.RUNNING.value,
+                    started_at=func.now()
+                ).returning(Job)
+                result = await session.execute(stmt)
+                job = result.scalar_one_or_none()
+        return job
+    
+    async def renew_job_lease(self, job_id: int) -> bool:
+        async with self.db_client() as session:
+            async with session.begin():
+                stmt = update(Job).where(
+                    Job.job_id == job_id, Job.job_status == JobStatusEnum.RUNNING.value
+                ).values(updated_at=func.now())
+                result = await session.execute(stmt)
+        return result.rowcount > 0
+    
+    async def update_job_progress(self, job_id: int, progress: dict) -> str | None:
+        """Store the job progress and return the current job status (used to detect cancellation)."""
+        async with self.db_client() as session:
+            async with session.begin():
+                stmt = update(Job).where(Job.job_id == job_id).values(
+                    job_progress=progress
+                ).returning(Job.job_status)
+                result = await session.execute(stmt)
+                job_status = result.scalar_one_or_none()
+        return job_status
+    
+    async def set_job_status(self, job_id: int, job_status: str, from_statuses: list[str]=None,
+                             result: dict=None, error: str=None) -> bool:
+        values = {"job_status": job_status}
+        if job_status in (JobStatusEnum.COMPLETED.value, JobStatusEnum.FAILED.value, JobStatusEnum.CANCELLED.value):
+            values["finished_at"] = func.now()
+        if result is not None:
+            values["job_result"] = result
+        if error is not None:
+            values["job_error"] = error
+        
+        async with self.db_client() as session:
+            async with session.begin():
+                stmt = update(Job).where(Job.job_id == job_id)
+                if from_statuses:
+                    stmt = stmt.where(Job.job_status.in_(from_statuses))
+                result = await session.execute(stmt.values(**values))
+        return result.rowcount > 0
+    
@@ -2,13 +2,18 @@ from .base_data_model import BaseDataModel
 from .db_schemes import Project
 from .enums.db_Enum import DB_Enum
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from collections import OrderedDict
+import time
 
 class ProjectModel(BaseDataModel):
     
     def __init__(self, db_client: object):
         super().__init__(db_client)
         self.db_client = db_client
+        # known projects: project_id -> (project, expires_at), in LRU order
+        self.projects_cache = OrderedDict()
     
     @classmethod
     async def create_instance(cls, db_client: object):
@@ -24,20 +29,69 @@ class ProjectModel(BaseDataModel):
             await session.refresh(project)
         return project
     
+    def get_cached_project(self, project_id: int) -> Project:
+        cached = self.projects_cache.get(project_id)
+        if cached is None:
+            return None
+        
+        project, expires_at = cached
+        if expires_at is not None and time.monotonic() > expires_at:
+            self.projects_cache.pop(project_id, None)
+            return None
+        
+        self.projects_cache.move_to_end(project_id)
+        return project
+    
+    def cache_project(self, project: Project):
+        ttl = self.app_settings.PROJECT_CACHE_TTL_SECONDS
+        self.projects_cache[project.project_id] = (project, time.monotonic() + ttl if ttl else None)
+        self.projects_cache.move_to_end(project.project_id)
+        while len(self.projects_cache) > self.app_settings.PROJECT_CACHE_MAX_SIZE:
+            self.projects_cache.popitem(last=False)
+    
     async def get_project_or_create_one(self, project_id: int) -> Project:
         
+        # known projects are served from memory, without any query
+        project = self.get_cached_project(project_id)
+        if project is not None:
+            return project
+        
         async with self.db_client() as session:
             async with session.begin():
-                query = select(Project).where(Project.project_id == project_id)
-                result = await session.execute(query)
+                # create it if missing in one statement, so concurrent first requests don't race
+                stmt = insert(Project).values(project_id=project_id).on_conflict_do_nothing(
+                    index_elements=[Project.project_id]
+                ).returning(Project)
+                result = await session.execute(stmt)
                 project = result.scalar_one_or_none()
+                
                 if project is None:
-                    project_rec = Project(project_id=project_id)
-                    project = await self.create_project(project_rec)
-                    return project
-                else:
-                    return project
-     
+                    result = await session.execute(select(Project).where(Project.project_id == project_id))
+                    project = result.scalar_one_or_none()
+        
+        if project is not None:
+            self.cache_project(project)
+        return project
+    
+    async def get_answer_cache_generation(self, project_id: int) -> int:
+        # not served from the projects cache, another process may have bumped it
+        async with self.db_client() as session:
+            result = await session.execute(
+                select(Project.answer_cache_generation).where(Project.project_id == project_id)
+            )
+            return result.scalar_one_or_none() or 0
+    
+    async def bump_answer_cache_generation(self, project_id: int) -> int:
+        async with self.db_client() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(Project)
+                    .where(Project.project_id == project_id)
+                    .values(answer_cache_generation=Project.answer_cache_generation + 1)
+                    .returning(Project.answer_cache_generation)
+                )
+                return result.scalar_one_or_none() or 0
+    
     async def get_all_projects(self, page: int=1, page_size: int=10) -> list[Project]:
         
         async with self.db_client() as session:
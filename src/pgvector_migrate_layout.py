@@ -0,0 +1,106 @@
+"""
+Move the pgvector collections from the table-per-collection layout (collection_{dim}_{project_id} tables)
+into the partitioned layout (pgvector_{dim} hash-partitioned by project id).
+Stop the api and job workers, run it, then set VECTOR_DB_PGVEC_LAYOUT=partitioned:
+
+    python pgvector_migrate_layout.py             # copy every collection, keep the old tables
+    python pgvector_migrate_layout.py --drop-old  # copy, then drop each old table
+    python pgvector_migrate_layout.py --dry-run   # only list what would be moved
+
+Each collection is copied in its own transaction, and collections already present in the partitioned
+layout are skipped, so an interrupted run can simply be started again.
+"""
+import argparse
+import asyncio
+import logging
+from helpers import get_settings
+from stores.vector_db.providers import PgVectorPartitionedDBProvider
+from stores.vector_db.providers.pgvector_partitioned_db_provider import COLLECTION_NAME_PATTERN
+from stores.vector_db.vector_db_enums import PgVectorTableSchemaEnum
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import text as sql_text
+
+logger = logging.getLogger("uvicorn.error")
+
+
+async def list_table_collections(db_client) -> list:
+    async with db_client() as session:
+        results = await session.execute(sql_text("SELECT tablename FROM pg_tables WHERE tablename LIKE 'collection\\_%'"))
+        return sorted(name for name in results.scalars().all() if COLLECTION_NAME_PATTERN.match(name))
+
+
+async def migrate_collection(db_client, provider: PgVectorPartitionedDBProvider, collection_name: str,
+                             drop_old: bool = False) -> int:
+    match = COLLECTION_NAME_PATTERN.match(collection_name)
+    dimension, project_id = int(match.group(1)), int(match.group(2))
+
+    metadata = await provider.get_collection_metadata(collection_name)
+    if metadata is not None and metadata["row_count"] > 0:
+        logger.info("Skipping %s, already in the partitioned layout", collection_name)
+        moved_count = 0
+    else:
+        _ = await provider.create_collection(collection_name=collection_name, dimension=dimension)
+        columns = ", ".join([
+            PgVectorTableSchemaEnum.TEXT.value,
+            PgVectorTableSchemaEnum.VECTOR.value,
+            PgVectorTableSchemaEnum.METADATA.value,
+            PgVectorTableSchemaEnum.CHUNK_ID.value
+        ])
+        async with db_client() as session:
+            async with session.begin():
+                result = await session.execute(sql_text(f"""
+                    INSERT INTO {provider.get_table_name(dimension)} ({PgVectorTableSchemaEnum.PROJECT_ID.value}, {columns})
+                    SELECT :project_id, {columns} FROM {collection_name}
+                """), {"project_id": project_id})
+                moved_count = result.rowcount
+        provider.invalidate_collection_metadata(collection_name)
+        logger.info("Moved %d rows from %s", moved_count, collection_name)
+
+    if drop_old:
+        async with db_client() as session:
+            async with session.begin():
+                await session.execute(sql_text(f"DROP TABLE IF EXISTS {collection_name}"))
+        logger.info("Dropped %s", collection_name)
+
+    return moved_count
+
+
+async def run_migration(drop_old: bool = False, dry_run: bool = False):
+    settings = get_settings()
+    postgres_conn = f"postgresql+asyncpg://{settings.POSTGRESQL_USERNAME}:{settings.POSTGRESQL_PASSWORD}@/{settings.POSTGRESQL_MAIN_DB}{settings.ADDITIONAL_GCP}"
+    engine = create_async_engine(postgres_conn)
+    db_client = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    provider = PgVectorPartitionedDBProvider(
+        db_client=db_client,
+        default_distance_method=settings.VECTOR_DB_DISTANCE_METRIC,
+        default_vector_dimension=settings.EMBEDDING_SIZE,
+        index_threshold=settings.VECTOR_DB_PGVEC_INDEX_THRESHOLD,
+        partitions_count=settings.VECTOR_DB_PGVEC_PARTITIONS,
+        iterative_scan=settings.VECTOR_DB_PGVEC_ITERATIVE_SCAN
+    )
+
+    try:
+        collections = await list_table_collections(db_client)
+        logger.info("Found %d collections in the table-per-collection layout", len(collections))
+        if dry_run:
+            for collection_name in collections:
+                logger.info("Would move %s", collection_name)
+            return
+
+        total_count = 0
+        for collection_name in collections:
+            total_count += await migrate_collection(db_client, provider, collection_name, drop_old=drop_old)
+        logger.info("Done, moved %d rows from %d collections", total_count, len(collections))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move pgvector collections into the partitioned layout.")
+    parser.add_argument("--drop-old", action="store_true", help="drop each collection table once it is copied")
+    parser.add_argument("--dry-run", action="store_true", help="only list the collections to move")
+    args = parser.parse_args()
+    asyncio.run(run_migration(drop_old=args.drop_old, dry_run=args.dry_run))
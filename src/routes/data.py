@@ -1,15 +1,16 @@
-from fastapi import APIRouter, Depends, UploadFile, status, Request, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, status, Request, HTTPException, Response
 from fastapi.responses import JSONResponse
 from helpers import get_settings, Settings
-from controllers import DataController, ProcessController
-from models import ResponseSignals, AssetTypeEnum, ProjectModel, ChunkModel, AssetModel
+from controllers import ProcessController
+from models import ResponseSignals, AssetTypeEnum, JobTypeEnum
 import os
 import aiofiles
 import logging
+from typing import Union
 from .schemes import ProcessRequest
 from models.db_schemes import DataChunk, Asset
-from controllers import NLPCntroller
 from views.data import UploadDataResponse, ProcessDataResponse
+from views.job import JobResponse
 
 logger = logging.getLogger('uvicorn.error')
 
@@ -51,7 +52,7 @@ data_router = APIRouter(
 async def upload_data(request: Request, project_id: int, file: UploadFile, 
                       app_settings: Settings = Depends(get_settings)):
     
-    data_controller = DataController()
+    data_controller = request.app.data_controller
     
     # validate the file properties
     is_valid, result_signal = data_controller.validate_uploaded_file(file)
@@ -75,10 +76,10 @@ async def upload_data(request: Request, project_id: int, file: UploadFile,
             detail=ResponseSignals.FILE_UPLOAD_FAILED.value
         )
     
-    project_model = await ProjectModel.create_instance(request.app.db_client)
+    project_model = request.app.project_model
     project = await project_model.get_project_or_create_one(project_id)
     
-    asset_model = await AssetModel.create_instance(request.app.db_client)
+    asset_model = request.app.asset_model
     asset_resource = Asset(
         asset_project_id=project.project_id,
         asset_name=file_id,
@@ -96,9 +97,13 @@ async def upload_data(request: Request, project_id: int, file: UploadFile,
     
 @data_router.post(
     "/process/{project_id}",
-    response_model=ProcessDataResponse,
+    response_model=Union[ProcessDataResponse, JobResponse],
     status_code= status.HTTP_200_OK,
     responses= {
+        202: {
+            "description": "Accepted - Processing submitted as a background job (run_in_background=true)",
+            "model": JobResponse
+        },
         404: {
             "description": "Not Found - File not found or no files to process",
             "content": {
@@ -122,97 +127,75 @@ async def upload_data(request: Request, project_id: int, file: UploadFile,
         }
     },
     summary="Process uploaded files for a specific project",
-    description="""Process the uploaded files for a given project. This endpoint will read the content of the files, split them into chunks based on the specified chunk size and overlap, and store the chunks in the database. If a file_id is provided in the request body, only that file will be processed. If no file_id is provided, all files associated with the project will be processed. The endpoint also supports an optional reset flag that, when set to true, will clear all existing chunks for the project before processing the files."""
+    description="""Process the uploaded files for a given project. This endpoint will read the content of the files, split them into chunks based on the specified chunk size and overlap, and store the chunks in the database. If a file_id is provided in the request body, only that file will be processed. If no file_id is provided, all files associated with the project will be processed. Files whose content and chunking parameters did not change since their last processing are skipped, and for changed files only the chunks whose text changed are replaced (their vectors are dropped so the next index push re-indexes them). The endpoint also supports an optional reset flag that, when set to true, will clear all existing chunks for the project and process every file again. When run_in_background is true, the processing is submitted as a background job and the job record is returned immediately with status 202; poll /api/v1/jobs/{job_id} for progress."""
 )
-async def process_endpoint(request: Request, project_id: int, process_request: ProcessRequest):
+async def process_endpoint(request: Request, response: Response, project_id: int, process_request: ProcessRequest):
     
     file_id = process_request.file_id
     chunk_size = process_request.chunk_size
     overlap_size = process_request.overlap_size
     do_reset = process_request.do_reset
     
-    project_model = await ProjectModel.create_instance(request.app.db_client)
+    project_model = request.app.project_model
     project = await project_model.get_project_or_create_one(project_id)
     
-    nlp_controller = NLPCntroller(
-        vector_db_client=request.app.vector_db_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser
-    )
-    
-    process_controller = ProcessController(project_id)
-    
-    asset_model = await AssetModel.create_instance(request.app.db_client)
+    asset_model = request.app.asset_model
 
-    project_files_ids = {}
-    if file_id:
-        asset_record = await asset_model.get_asset_record(file_id, project.project_id)
-        if asset_record is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=ResponseSignals.FILE_NOT_FOUND.value + f": {file_id}"
-            )
-
-        project_files_ids[asset_record.asset_id] = asset_record.asset_name
-    else:
-        assets = await asset_model.get_all_assets_by_project_id(project.project_id, AssetTypeEnum.FILE.value)
-        project_files_ids = {asset.asset_id : asset.asset_name for asset in assets}
+    project_assets = await asset_model.get_project_file_assets(project.project_id, file_id)
+    
+    if file_id and len(project_assets) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ResponseSignals.FILE_NOT_FOUND.value + f": {file_id}"
+        )
 
-    if project_files_ids is None or len(project_files_ids) == 0:
+    if project_assets is None or len(project_assets) == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=ResponseSignals.NO_FILES_TO_PROCESS.value
         )
-        
-    no_records = 0
-    no_files_processed = 0
     
-    chunk_model = await ChunkModel.create_instance(request.app.db_client)
+    if process_request.run_in_background:
+        job = await request.app.job_controller.submit(
+            job_type=JobTypeEnum.PROCESS.value,
+            project_id=project.project_id,
+            params=process_request.model_dump(exclude={"run_in_background"})
+        )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return JobResponse.from_record(job)
+    
+    nlp_controller = request.app.nlp_controller
+    
+    process_controller = ProcessController(project_id, executor=request.app.process_pool)
+    
+    chunk_model = request.app.chunk_model
     
     if do_reset:
         # delete vector db collection
         collection_name = nlp_controller.create_collection_name(project_id=project.project_id)
         _ = await nlp_controller.vector_db_client.delete_collection(collection_name=collection_name)
+        await nlp_controller.invalidate_answer_cache(project.project_id)
         
         # delete chunks from db
         _ = await chunk_model.delete_chunks_by_project_id(project.project_id)
 
-
-    for asset_id, file_id in project_files_ids.items():
-        file_content = process_controller.get_file_content(file_id)
-        
-        if file_content is None:
-            logger.error(f"File content not found for file_id: {file_id}")
-            continue
-        
-            
-        file_chunks = process_controller.process_file_content(file_content, file_id,
-                                                            chunk_size=chunk_size,
-                                                            chunk_overlap=overlap_size)
-        if file_chunks is None or len(file_chunks) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=ResponseSignals.FILE_PROCESSING_FAILED.value
-            )
-        
-        
-        file_chunks_records = [
-            DataChunk(
-                chunk_text=chunk.page_content,
-                chunk_metadata=chunk.metadata,
-                chunk_order=index + 1,
-                chunk_project_id=project.project_id,
-                chunk_asset_id=asset_id
-            ) for index, chunk in enumerate(file_chunks)
-        ]
-        
-        
-        no_records += await chunk_model.insert_many_chunks(file_chunks_records)
-        no_files_processed += 1
-
-    return ProcessDataResponse(
-        added_chunks=no_records,
-        files_processed=no_files_processed
+    # files that did not change since their last processing are skipped, unless do_reset
+    is_processed, process_stats = await process_controller.process_assets(
+        chunk_model=chunk_model,
+        asset_model=asset_model,
+        project_id=project.project_id,
+        assets=project_assets,
+        chunk_size=chunk_size,
+        chunk_overlap=overlap_size,
+        force=do_reset,
+        nlp_controller=nlp_controller
     )
-     
\ No newline at end of file
+    
+    if not is_processed:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ResponseSignals.FILE_PROCESSING_FAILED.value
+        )
+
+    return ProcessDataResponse(**process_stats)
+    
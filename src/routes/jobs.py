@@ -0,0 +1,109 @@
+from fastapi import APIRouter, status, Request, HTTPException
+from models import ResponseSignals
+from views.job import JobResponse, JobListResponse
+import logging
+
+logger = logging.getLogger('uvicorn.error')
+
+jobs_router = APIRouter(
+    prefix='/api/v1/jobs',
+    tags=['jobs']
+)
+
+@jobs_router.get(
+    "/{job_id}",
+    response_model= JobResponse,
+    status_code= status.HTTP_200_OK,
+    responses= {
+        404: {
+            "description": "Not Found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "JobNotFound": ResponseSignals.JOB_NOT_FOUND.value + ": 12",
+                    }
+                }
+            }
+        }
+    },
+    summary="Get the status and progress of a background job",
+    description="This endpoint returns the status (pending, running, completed, failed, cancelled) of a background processing or indexing job, its progress counters (files processed, chunks parsed, embedded and indexed), and its result or error once finished."
+)
+async def get_job(request: Request, job_id: int):
+    
+    job_model = request.app.job_model
+    job = await job_model.get_job(job_id)
+    
+    if job is None:
+        raise HTTPException(
+            status_code= status.HTTP_404_NOT_FOUND,
+            detail= ResponseSignals.JOB_NOT_FOUND.value + f": {job_id}"
+        )
+    
+    return JobResponse.from_record(job)
+
+
+@jobs_router.get(
+    "/project/{project_id}",
+    response_model= JobListResponse,
+    status_code= status.HTTP_200_OK,
+    summary="List the background jobs of a project",
+    description="This endpoint returns the background jobs submitted for a specific project, newest first."
+)
+async def list_project_jobs(request: Request, project_id: int, page: int = 1, page_size: int = 20):
+    
+    job_model = request.app.job_model
+    jobs = await job_model.get_project_jobs(project_id, page=page, page_size=page_size)
+    
+    return JobListResponse(jobs=[JobResponse.from_record(job) for job in jobs])
+
+
+@jobs_router.post(
+    "/{job_id}/cancel",
+    response_model= JobResponse,
+    status_code= status.HTTP_200_OK,
+    responses= {
+        404: {
+            "description": "Not Found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "JobNotFound": ResponseSignals.JOB_NOT_FOUND.value + ": 12",
+                    }
+                }
+            }
+        },
+        409: {
+            "description": "Conflict - Job already finished",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "JobCannotBeCancelled": ResponseSignals.JOB_CANNOT_BE_CANCELLED.value,
+                    }
+                }
+            }
+        }
+    },
+    summary="Cancel a pending or running background job",
+    description="This endpoint cancels a background job. Pending jobs will never start, running jobs stop at their next progress update. Work already done (stored chunks or indexed vectors) is kept."
+)
+async def cancel_job(request: Request, job_id: int):
+    
+    job_model = request.app.job_model
+    job = await job_model.get_job(job_id)
+    
+    if job is None:
+        raise HTTPException(
+            status_code= status.HTTP_404_NOT_FOUND,
+            detail= ResponseSignals.JOB_NOT_FOUND.value + f": {job_id}"
+        )
+    
+    is_cancelled = await request.app.job_controller.cancel(job_id)
+    if not is_cancelled:
+        raise HTTPException(
+            status_code= status.HTTP_409_CONFLICT,
+            detail= ResponseSignals.JOB_CANNOT_BE_CANCELLED.value
+        )
+    
+    job = await job_model.get_job(job_id)
+    return JobResponse.from_record(job)
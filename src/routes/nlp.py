@@ -1,12 +1,17 @@
-from fastapi import APIRouter, status, Request, HTTPException
-from fastapi.responses import JSONResponse
-from .schemes import PushRequest, SearchRequest
-from models import ProjectModel, ChunkModel
-from controllers import NLPCntroller
+from fastapi import APIRouter, status, Request, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from .schemes import PushRequest, SearchRequest, BatchSearchRequest, BatchAnswerRequest
+from models import JobTypeEnum
 from models.enums.ResponseEnum import ResponseSignals
-from views.nlp import NLPPushResponse, NLPInfoResponse, NLPSearchResponse, NLPAnswerResponse
+from stores.vector_db.vector_db_filter import SearchFilterError
+from views.nlp import NLPPushResponse, NLPInfoResponse, NLPSearchResponse, NLPAnswerResponse, AnswerCacheStatsResponse, NLPIndexBuildResponse, NLPBatchSearchResponse, EmbeddingBatchStatsResponse, LLMSchedulerStatsResponse
+from views.job import JobResponse
+from typing import Union
+from contextlib import aclosing
 from tqdm.auto import tqdm
 import logging
+import json
+import time
 
 
 logger = logging.getLogger('uvicorn.error')
@@ -17,11 +22,41 @@ nlp_router = APIRouter(
     tags = ['nlp']
 )
 
+
+def validate_search_profile(nlp_controller, accuracy: str):
+    if not nlp_controller.is_valid_search_profile(accuracy):
+        raise HTTPException(
+            status_code= status.HTTP_400_BAD_REQUEST,
+            detail= ResponseSignals.SEARCH_PROFILE_NOT_FOUND.value + f": {accuracy}"
+        )
+
+
+def invalid_search_filter(error: SearchFilterError) -> HTTPException:
+    return HTTPException(
+        status_code= status.HTTP_400_BAD_REQUEST,
+        detail= ResponseSignals.INVALID_SEARCH_FILTER.value + f": {error}"
+    )
+
+
+def get_search_options(search_request: Union[SearchRequest, BatchSearchRequest]) -> dict:
+    return {
+        "accuracy": search_request.accuracy,
+        "filter": search_request.filter,
+        "mode": search_request.mode,
+        "vector_weight": search_request.vector_weight,
+        "lexical_weight": search_request.lexical_weight
+    }
+
+
 @nlp_router.post(
     "/index/push/{project_id}",
-    response_model= NLPPushResponse,
+    response_model= Union[NLPPushResponse, JobResponse],
     status_code= status.HTTP_200_OK,
     responses= {
+        202: {
+            "description": "Accepted - Indexing submitted as a background job (run_in_background=true)",
+            "model": JobResponse
+        },
         404: {
             "description": "Not Found",
             "content": {
@@ -44,13 +79,13 @@ nlp_router = APIRouter(
         }
     },
     summary="Index project chunks into vector database",
-    description="This endpoint retrieves chunks of a project and indexes them into a vector database (embeddings). It supports batching to efficiently handle large datasets. The endpoint returns the total number of chunks successfully indexed. If the specified project does not exist, it returns a 404 error. If there is an issue during the indexing process, it returns a 500 error."
+    description="This endpoint retrieves chunks of a project and indexes them into a vector database (embeddings). It supports batching to efficiently handle large datasets. The endpoint returns the total number of chunks successfully indexed. If the specified project does not exist, it returns a 404 error. If there is an issue during the indexing process, it returns a 500 error. When run_in_background is true, the indexing is submitted as a background job and the job record is returned immediately with status 202; poll /api/v1/jobs/{job_id} for progress."
 )
-async def index_project(request: Request, project_id: int, push_request: PushRequest):
+async def index_project(request: Request, response: Response, project_id: int, push_request: PushRequest):
 
-    project_model = await ProjectModel.create_instance(db_client=request.app.db_client)
+    project_model = request.app.project_model
 
-    chunk_model = ChunkModel(request.app.db_client)
+    chunk_model = request.app.chunk_model
     
     project = await project_model.get_project_or_create_one(project_id)
     if not project:
@@ -59,14 +94,16 @@ async def index_project(request: Request, project_id: int, push_request: PushReq
             detail= ResponseSignals.PROJECT_NOT_FOUND.value + f": {project_id}"
         )
     
-    nlp_controller = NLPCntroller(
-        vector_db_client=request.app.vector_db_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client)
+    if push_request.run_in_background:
+        job = await request.app.job_controller.submit(
+            job_type=JobTypeEnum.INDEX.value,
+            project_id=project.project_id,
+            params=push_request.model_dump(exclude={"run_in_background"})
+        )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return JobResponse.from_record(job)
     
-    has_records = True
-    page_no = 1
-    inserted_items_count = 0
+    nlp_controller = request.app.nlp_controller
     
     # create collection if not exists
     collection_name = nlp_controller.create_collection_name(project_id=project.project_id)
@@ -81,26 +118,21 @@ async def index_project(request: Request, project_id: int, push_request: PushReq
     total_chunks_count = await chunk_model.get_total_chunks_count(project.project_id)
     pbar = tqdm(total=total_chunks_count, desc="Indexing chunks into vector db", position=0)
     
-    while has_records:
-        
-        page_chunks = await chunk_model.get_project_chunks(project_id=project.project_id, page_no=page_no)
-        if len(page_chunks):
-            page_no += 1
-            
-        if not page_chunks or len(page_chunks) == 0:
-            has_records = False
-            break
-        
-        is_inserted = await nlp_controller.index_into_vector_db(project, page_chunks)
-        
-        if not is_inserted:
-            raise HTTPException(
-                status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail= ResponseSignals.INSERT_INTO_DB_ERROR.value
-            )
-        
-        pbar.update(len(page_chunks))
-        inserted_items_count += len(page_chunks)
+    is_inserted, inserted_items_count = await nlp_controller.index_project_chunks(
+        project=project,
+        chunk_model=chunk_model,
+        page_size=push_request.page_size,
+        batch_size=push_request.batch_size,
+        max_concurrent_batches=push_request.max_concurrent_batches,
+        on_progress=pbar.update
+    )
+    pbar.close()
+    
+    if not is_inserted:
+        raise HTTPException(
+            status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail= ResponseSignals.INSERT_INTO_DB_ERROR.value
+        )
         
     return NLPPushResponse(inserted_items_count=inserted_items_count)
     
@@ -114,18 +146,53 @@ async def index_project(request: Request, project_id: int, push_request: PushReq
 )
 async def get_project_index_info(request: Request, project_id: int):
     
-    project_model = await ProjectModel.create_instance(db_client=request.app.db_client)
+    project_model = request.app.project_model
 
     project = await project_model.get_project_or_create_one(project_id=project_id)
 
-    nlp_controller = NLPCntroller(
-        vector_db_client=request.app.vector_db_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client)
+    nlp_controller = request.app.nlp_controller
     
     collection_info = await nlp_controller.get_collection_info(project)
     
     return NLPInfoResponse(collection_info=collection_info)
+
+
+@nlp_router.get(
+    "/index/build/{project_id}",
+    response_model= NLPIndexBuildResponse,
+    status_code= status.HTTP_200_OK,
+    responses= {
+        404: {
+            "description": "Not Found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": ResponseSignals.VECTORDB_COLLECTION_NOT_FOUND.value
+                    }
+                }
+            }
+        }
+    },
+    summary="Get the vector index build progress of a project",
+    description="This endpoint reports the state of the vector index of the project collection. The index is built in the background (CREATE INDEX CONCURRENTLY on pgvector) once the collection holds index_threshold vectors, after a push finishes. The status is one of not_indexed, pending, building or ready; while building, the phase and the blocks/tuples counters come from pg_stat_progress_create_index (indexed vs total points on Qdrant). If the project has no collection yet, it returns a 404 error."
+)
+async def get_index_build_progress(request: Request, project_id: int):
+    
+    project_model = request.app.project_model
+
+    project = await project_model.get_project_or_create_one(project_id=project_id)
+
+    nlp_controller = request.app.nlp_controller
+    
+    progress = await nlp_controller.get_index_build_progress(project)
+    
+    if progress is None:
+        raise HTTPException(
+            status_code= status.HTTP_404_NOT_FOUND,
+            detail= ResponseSignals.VECTORDB_COLLECTION_NOT_FOUND.value
+        )
+    
+    return NLPIndexBuildResponse(**progress)
     
     
 @nlp_router.post(
@@ -133,6 +200,16 @@ async def get_project_index_info(request: Request, project_id: int):
     response_model= NLPSearchResponse,
     status_code= status.HTTP_200_OK,
     responses= {
+        404: {
+            "description": "Not Found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "signal": ResponseSignals.VECTORDB_SEARCH_ERROR_OR_NOT_FOUND.value
+                    }
+                }
+            }
+        },
         500: {
             "description": "Internal Server Error",
             "content": {
@@ -145,27 +222,36 @@ async def get_project_index_info(request: Request, project_id: int):
         }
     },
     summary="Search in vector database collection for chunks relevant to a query",
-    description= "This endpoint allows searching for relevant chunks in the vector database collection associated with a specific project based on a query text. It returns a list of relevant chunks along with their similarity scores. If there is an issue during the search process or if no relevant chunks are found, it returns a 500 error with an appropriate signal."
+    description= "This endpoint allows searching for relevant chunks in the vector database collection associated with a specific project based on a query text. It returns a list of relevant chunks along with their similarity scores. If no relevant chunks are found, it returns a 404 error; if the query embedding or the vector database fails, a 500 error; both with an appropriate signal. A filter the vector database can't apply returns a 400 error."
 )
 async def search_index(request: Request, project_id: int, search_request: SearchRequest):
     
-    project_model = await ProjectModel.create_instance(db_client=request.app.db_client)
+    project_model = request.app.project_model
 
     project = await project_model.get_project_or_create_one(project_id=project_id)
 
-    nlp_controller = NLPCntroller(
-        vector_db_client=request.app.vector_db_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client)
+    nlp_controller = request.app.nlp_controller
+    validate_search_profile(nlp_controller, search_request.accuracy)
     
-    search_result = await nlp_controller.search_vector_db_collection(project, search_request.query_text, top_k=search_request.top_k)
+    try:
+        search_result = await nlp_controller.search_vector_db_collection(project, search_request.query_text, top_k=search_request.top_k,
+                                                                         **get_search_options(search_request))
+    except SearchFilterError as e:
+        raise invalid_search_filter(e)
     
-    if not search_result:
+    # False: the query embedding failed, other errors of the vector db are raised as 500
+    if search_result is False:
         raise HTTPException(
             status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail= ResponseSignals.VECTORDB_SEARCH_ERROR_OR_NOT_FOUND.value
         )
     
+    if not search_result:
+        raise HTTPException(
+            status_code= status.HTTP_404_NOT_FOUND,
+            detail= ResponseSignals.VECTORDB_SEARCH_ERROR_OR_NOT_FOUND.value
+        )
+    
     return NLPSearchResponse(results=search_result)
     
     
@@ -191,17 +277,18 @@ async def search_index(request: Request, project_id: int, search_request: Search
 async def answer_rag(request: Request, project_id: int, search_request: SearchRequest):
     
     
-    project_model = await ProjectModel.create_instance(db_client=request.app.db_client)
+    project_model = request.app.project_model
 
     project = await project_model.get_project_or_create_one(project_id=project_id)
 
-    nlp_controller = NLPCntroller(
-        vector_db_client=request.app.vector_db_client,
-        generation_client=request.app.generation_client,
-        embedding_client=request.app.embedding_client,
-        template_parser=request.app.template_parser)
+    nlp_controller = request.app.nlp_controller
+    validate_search_profile(nlp_controller, search_request.accuracy)
     
-    answer, full_prompt, chat_history = await nlp_controller.answer_rag_question(project, search_request.query_text, top_k=search_request.top_k)
+    try:
+        answer, full_prompt, chat_history = await nlp_controller.answer_rag_question(project, search_request.query_text, top_k=search_request.top_k,
+                                                                                     **get_search_options(search_request))
+    except SearchFilterError as e:
+        raise invalid_search_filter(e)
 
     if not answer:
         raise HTTPException(
@@ -212,6 +299,249 @@ async def answer_rag(request: Request, project_id: int, search_request: SearchRe
     return NLPAnswerResponse(answer=answer)
 
 
+def format_sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@nlp_router.post(
+    "/index/answer/stream/{project_id}",
+    status_code= status.HTTP_200_OK,
+    responses= {
+        200: {
+            "description": "Server-sent events: one `documents` event, then `token` events, then `done` (or `error`)",
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        'event: documents\ndata: [{"text": "This is a sample chunk of text.", "score": 0.95}]\n\n'
+                        'event: token\ndata: {"text": "This is"}\n\n'
+                        'event: token\ndata: {"text": " a generated answer."}\n\n'
+                        'event: done\ndata: {}\n\n'
+                    )
+                }
+            }
+        },
+        500: {
+            "description": "Internal Server Error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "signal": ResponseSignals.RAG_ANSWER_ERROR.value
+                    }
+                }
+            }
+        }
+    },
+    summary="Stream the answer for a query based on retrieved chunks from vector database collection",
+    description= "Same as /index/answer but the response is a text/event-stream. The retrieved documents are sent first as a `documents` event, then the answer is sent piece by piece as `token` events while the generation model produces it, and a final `done` event closes the stream. If the generation fails after the stream started, an `error` event is sent instead of `done`. If no documents are retrieved, it returns a 500 error with an appropriate signal before any event is sent."
+)
+async def answer_rag_stream(request: Request, project_id: int, search_request: SearchRequest):
+    
+    project_model = request.app.project_model
+
+    project = await project_model.get_project_or_create_one(project_id=project_id)
+
+    nlp_controller = request.app.nlp_controller
+    validate_search_profile(nlp_controller, search_request.accuracy)
+    
+    start_time = time.perf_counter()
+    answer_events = nlp_controller.stream_rag_answer(project, search_request.query_text, top_k=search_request.top_k,
+                                                     **get_search_options(search_request))
+    
+    # retrieval happens before the first event, so a failure there is still a plain 500
+    try:
+        first_event = await anext(answer_events, None)
+    except SearchFilterError as e:
+        raise invalid_search_filter(e)
+    if first_event is None:
+        raise HTTPException(
+            status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail= ResponseSignals.RAG_ANSWER_ERROR.value
+        )
+    
+    async def event_stream():
+        _, retrieved_documents = first_event
+        yield format_sse_event("documents", [doc.model_dump() for doc in retrieved_documents])
+        
+        no_tokens = 0
+        is_completed = False
+        try:
+            async for event, token in answer_events:
+                if event == "error":
+                    break
+                if no_tokens == 0:
+                    logger.info("RAG answer time to first token for project %d: %.3fs", project_id, time.perf_counter() - start_time)
+                no_tokens += 1
+                yield format_sse_event("token", {"text": token})
+            else:
+                # an empty answer is a failed generation too
+                is_completed = no_tokens > 0
+        except Exception as e:
+            logger.error("RAG answer stream for project %d failed: %s", project_id, str(e))
+        finally:
+            # also when the client went away, so the generation stops and frees its slot
+            await answer_events.aclose()
+        
+        if not is_completed:
+            yield format_sse_event("error", {"signal": ResponseSignals.RAG_ANSWER_ERROR.value})
+            return
+        
+        yield format_sse_event("done", {})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@nlp_router.post(
+    "/index/search/batch/{project_id}",
+    response_model= NLPBatchSearchResponse,
+    status_code= status.HTTP_200_OK,
+    responses= {
+        500: {
+            "description": "Internal Server Error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "signal": ResponseSignals.VECTORDB_SEARCH_ERROR_OR_NOT_FOUND.value
+                    }
+                }
+            }
+        }
+    },
+    summary="Search in vector database collection for many queries at once",
+    description= "Same as /index/search for a list of queries. All the query texts are embedded in a single embedding call and searched in a single vector database round trip (a LATERAL join over the query vectors on pgvector, query_batch_points on Qdrant). The results are returned in the order of query_texts, one list per query (empty when nothing matched). If the embedding or the search fails, it returns a 500 error with an appropriate signal."
+)
+async def search_index_batch(request: Request, project_id: int, search_request: BatchSearchRequest):
     
+    project_model = request.app.project_model
 
+    project = await project_model.get_project_or_create_one(project_id=project_id)
 
+    nlp_controller = request.app.nlp_controller
+    validate_search_profile(nlp_controller, search_request.accuracy)
+    
+    try:
+        search_results = await nlp_controller.search_vector_db_collection_batch(project, search_request.query_texts,
+                                                                                top_k=search_request.top_k,
+                                                                                **get_search_options(search_request))
+    except SearchFilterError as e:
+        raise invalid_search_filter(e)
+    
+    if search_results is False:
+        raise HTTPException(
+            status_code= status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail= ResponseSignals.VECTORDB_SEARCH_ERROR_OR_NOT_FOUND.value
+        )
+    
+    return NLPBatchSearchResponse(results=search_results)
+
+
+@nlp_router.post(
+    "/index/answer/batch/{project_id}",
+    status_code= status.HTTP_200_OK,
+    responses= {
+        200: {
+            "description": "Server-sent events: one `answer` (or `error`) event per query as soon as it is ready, then `done`",
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        'event: answer\ndata: {"index": 1, "query_text": "When was the induction motor invented?", "answer": "In 1887."}\n\n'
+                        'event: answer\ndata: {"index": 0, "query_text": "Who is Nikola Tesla?", "answer": "An inventor and engineer."}\n\n'
+                        'event: done\ndata: {"answered": 2, "failed": 0}\n\n'
+                    )
+                }
+            }
+        }
+    },
+    summary="Generate answers for many queries at once",
+    description= "Same as /index/answer for a list of queries, streamed as a text/event-stream. Cached answers are sent first; the other queries are embedded in a single call and searched in a single vector database round trip, then their answers are generated with up to max_concurrency generations in flight. Each answer is sent as an `answer` event carrying its index in query_texts as soon as it is ready, so the events are not in query order. A query with no retrieved documents or a failed generation gets an `error` event. A final `done` event closes the stream."
+)
+async def answer_rag_batch(request: Request, project_id: int, answer_request: BatchAnswerRequest):
+    
+    project_model = request.app.project_model
+
+    project = await project_model.get_project_or_create_one(project_id=project_id)
+
+    nlp_controller = request.app.nlp_controller
+    validate_search_profile(nlp_controller, answer_request.accuracy)
+    
+    async def event_stream():
+        start_time = time.perf_counter()
+        answered_count, failed_count = 0, 0
+        answers = nlp_controller.answer_rag_questions(project, answer_request.query_texts, top_k=answer_request.top_k,
+                                                      max_concurrency=answer_request.max_concurrency,
+                                                      **get_search_options(answer_request))
+        # closed when the client goes away, which cancels the generations still running
+        async with aclosing(answers):
+            async for index, answer in answers:
+                query_text = answer_request.query_texts[index]
+                if not answer:
+                    failed_count += 1
+                    yield format_sse_event("error", {"index": index, "query_text": query_text, "signal": ResponseSignals.RAG_ANSWER_ERROR.value})
+                    continue
+                answered_count += 1
+                yield format_sse_event("answer", {"index": index, "query_text": query_text, "answer": answer})
+        
+        logger.info("RAG batch of %d questions for project %d answered in %.3fs", len(answer_request.query_texts),
+                    project_id, time.perf_counter() - start_time)
+        yield format_sse_event("done", {"answered": answered_count, "failed": failed_count})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@nlp_router.get(
+    "/answer_cache/stats",
+    response_model= AnswerCacheStatsResponse,
+    status_code= status.HTTP_200_OK,
+    summary="Get the RAG answer cache hit/miss counters",
+    description= "This endpoint returns the counters of the answer cache used by /index/answer and /index/answer/stream since the app started: exact and semantic hits, misses, invalidations (caused by re-indexing or resetting a project), the resulting hit rate, and the number of cached entries."
+)
+async def get_answer_cache_stats(request: Request):
+    
+    if request.app.answer_cache is None:
+        return AnswerCacheStatsResponse(enabled=False)
+    
+    return AnswerCacheStatsResponse(enabled=True, **request.app.answer_cache.get_stats())
+
+
+@nlp_router.get(
+    "/embedding_batch/stats",
+    response_model= EmbeddingBatchStatsResponse,
+    status_code= status.HTTP_200_OK,
+    summary="Get the query embedding batching histograms",
+    description= "This endpoint returns the counters of the query embedding batcher since the app started: the number of batched embedding calls and texts, the failed batches, and the histograms (cumulative counts per upper bound) of the batch sizes and of the time each query waited for its batch, in milliseconds."
+)
+async def get_embedding_batch_stats(request: Request):
+    
+    if request.app.embedding_batcher is None:
+        return EmbeddingBatchStatsResponse(enabled=False)
+    
+    return EmbeddingBatchStatsResponse(enabled=True, **request.app.embedding_batcher.get_stats())
+
+
+@nlp_router.get(
+    "/llm_scheduler/stats",
+    response_model= LLMSchedulerStatsResponse,
+    status_code= status.HTTP_200_OK,
+    summary="Get the provider call scheduler state",
+    description= "This endpoint returns, for each generation/embedding backend, the counters of its call scheduler since the app started (calls, retries, 429 responses, failures after the retries), its current adaptive concurrency limit, the calls in flight and waiting per priority lane (interactive, bulk), and the recent latency per call kind."
+)
+async def get_llm_scheduler_stats(request: Request):
+    
+    # the generation and embedding clients share the scheduler of a backend, a composite client has one per backend
+    schedulers = []
+    for client in (request.app.generation_client, request.app.embedding_client):
+        for scheduler in client.get_schedulers():
+            if scheduler not in schedulers:
+                schedulers.append(scheduler)
+    
+    if not schedulers:
+        return LLMSchedulerStatsResponse(enabled=False)
+    
+    return LLMSchedulerStatsResponse(enabled=True, schedulers=[scheduler.get_stats() for scheduler in schedulers])
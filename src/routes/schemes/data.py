@@ -7,6 +7,7 @@ class ProcessRequest(BaseModel):
     chunk_size: Optional[int] = Field(default=500, description="The size of each chunk in characters")
     overlap_size: Optional[int] = Field(default=30, description="The overlap size between chunks in characters")
     do_reset: Optional[bool] = Field(default=False, description="Whether to reset the existing chunks in the database before processing new data")
+    run_in_background: Optional[bool] = Field(default=False, description="Whether to run the processing as a background job and return the job id immediately")
     
 
     model_config = {
@@ -15,7 +16,8 @@ class ProcessRequest(BaseModel):
                 "file_id": 123,
                 "chunk_size": 500,
                 "overlap_size": 30,
-                "do_reset": False
+                "do_reset": False,
+                "run_in_background": False
             }
         }
     }
@@ -1,27 +1,91 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from stores.vector_db.vector_db_filter import parse_search_filter
+from stores.vector_db.vector_db_enums import SearchModeEnum
 
 
 class PushRequest(BaseModel):
     do_reset: Optional[bool] = Field(default=False, description="Whether to reset the existing collection in vector db before pushing new data")
+    page_size: Optional[int] = Field(default=200, gt=0, description="The number of chunks fetched from the db per page")
+    batch_size: Optional[int] = Field(default=50, gt=0, description="The number of chunks embedded and inserted into vector db per batch")
+    max_concurrent_batches: Optional[int] = Field(default=4, gt=0, description="The number of embedding batches kept in flight at the same time")
+    run_in_background: Optional[bool] = Field(default=False, description="Whether to run the indexing as a background job and return the job id immediately")
     
     model_config = {
         "json_schema_extra": {
             "example": {
-                "do_reset": False
+                "do_reset": False,
+                "page_size": 200,
+                "batch_size": 50,
+                "max_concurrent_batches": 4,
+                "run_in_background": False
             }
         }
     }
 
-class SearchRequest(BaseModel):
-    query_text: str = Field(..., description="The text query to search for relevant chunks in vector db collection")
+class SearchOptions(BaseModel):
     top_k: Optional[int] = Field(default=5, description="The number of top relevant chunks to return from the search results")
+    accuracy: Optional[str] = Field(default=None, description="The search accuracy profile (fast, balanced, exact), trades recall for latency. Defaults to VECTOR_DB_SEARCH_DEFAULT_PROFILE")
+    filter: Optional[dict] = Field(default=None, description="Only search the chunks matching all the conditions, on chunk metadata keys or chunk_asset_id: a value (equality), {\"in\": [...]}, or a range {\"gte\": 2, \"lt\": 10}")
+    mode: Optional[str] = Field(default=None, description="The retrieval mode: vector, or hybrid (vector + full-text search fused with reciprocal rank fusion). Defaults to VECTOR_DB_SEARCH_DEFAULT_MODE")
+    vector_weight: Optional[float] = Field(default=None, ge=0, description="Hybrid mode: weight of the vector ranking in the fusion")
+    lexical_weight: Optional[float] = Field(default=None, ge=0, description="Hybrid mode: weight of the full-text ranking in the fusion")
+    
+    @field_validator("mode")
+    @classmethod
+    def validate_mode(cls, value):
+        if value is not None and value not in [mode.value for mode in SearchModeEnum]:
+            raise ValueError(f"mode must be one of {[mode.value for mode in SearchModeEnum]}")
+        return value
+    
+    @field_validator("filter")
+    @classmethod
+    def validate_filter(cls, value):
+        # raises ValueError, returned as a 422 error
+        parse_search_filter(value)
+        return value
+
+
+class SearchRequest(SearchOptions):
+    query_text: str = Field(..., description="The text query to search for relevant chunks in vector db collection")
     
     model_config = {
         "json_schema_extra": {
             "example": {
                 "query_text": "Who is Nikola Tesla?",
+                "top_k": 5,
+                "accuracy": "balanced",
+                "filter": {"chunk_asset_id": {"in": [4, 7]}, "page": {"gte": 2, "lte": 10}},
+                "mode": "hybrid",
+                "vector_weight": 1.0,
+                "lexical_weight": 1.0
+            }
+        }
+    }
+
+
+class BatchSearchRequest(SearchOptions):
+    query_texts: List[str] = Field(..., min_length=1, max_length=1000, description="The text queries, all embedded in one call and searched in one vector db round trip")
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "query_texts": ["Who is Nikola Tesla?", "When was the induction motor invented?"],
                 "top_k": 5
             }
         }
-    }
\ No newline at end of file
+    }
+
+
+class BatchAnswerRequest(BatchSearchRequest):
+    max_concurrency: Optional[int] = Field(default=None, gt=0, description="The number of answers generated at the same time. Defaults to NLP_BATCH_MAX_CONCURRENT_GENERATIONS")
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "query_texts": ["Who is Nikola Tesla?", "When was the induction motor invented?"],
+                "top_k": 5,
+                "max_concurrency": 4
+            }
+        }
+    }
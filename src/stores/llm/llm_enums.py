@@ -5,6 +5,7 @@ class LLMEnums(Enum):
     GEMINI = "gemini"
     HUGGING_FACE = "huggingface" 
     OLLAMA = "ollama"
+    FAKE = "fake"  # local stand-in for benchmarks, see FakeProvider
 
 class OpenAIEnums(Enum):
     SYSTEM = "system"
@@ -33,6 +34,21 @@ class OllamaEnums(Enum):
     QUERY = "search_query"
     
 
+class FakeEnums(Enum):
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+
 class DocumentTypeEnums(Enum):
     DOCUMENT = "document"
     QUERY = "query"
+
+class CompositeEnums(Enum):
+    # neutral roles of the composite provider messages, mapped to each provider's roles
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+
+class CallPriorityEnum(Enum):
+    INTERACTIVE = "interactive"  # search / answer requests
+    BULK = "bulk"  # indexing
@@ -1,8 +1,37 @@
 from abc import ABC, abstractmethod
+from contextlib import aclosing
 
 
 class LLMInterface(ABC):
 
+    # shared LLMCallScheduler of the backend, set by the LLMProviderFactory
+    scheduler = None
+
+    def set_scheduler(self, scheduler) -> None:
+        self.scheduler = scheduler
+
+    def get_schedulers(self) -> list:
+        return [self.scheduler] if self.scheduler is not None else []
+
+    async def run_call(self, call, tokens: int = 0, kind: str = "generation"):
+        """Await the provider call `call()` through the scheduler (rate limits, concurrency, retries) when there is one."""
+        if self.scheduler is None:
+            return await call()
+        return await self.scheduler.run(call, tokens=tokens, kind=kind)
+
+    async def run_stream(self, open_stream, tokens: int = 0, kind: str = "generation"):
+        """
+        Iterate the provider stream `open_stream()` through the scheduler when there is one.
+        Iterate it in `aclosing`, so the scheduler slot is freed as soon as the stream is abandoned.
+        """
+        if self.scheduler is None:
+            stream = open_stream()
+        else:
+            stream = self.scheduler.run_stream(open_stream, tokens=tokens, kind=kind)
+        async with aclosing(stream) as items:
+            async for item in items:
+                yield item
+
     @abstractmethod
     def set_generation_model(self, model_name: str) -> None:
         """Set the language model to be used for text generation."""
@@ -23,6 +52,40 @@ class LLMInterface(ABC):
         """Generate an embedding for the given text."""
         pass
     
+    @abstractmethod
+    async def agenerate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+        """
+        Generate text based on the given prompt without blocking the event loop.
+        A failed provider call raises its error (after the scheduler retries), None means a configuration error.
+        """
+        pass
+    
+    @abstractmethod
+    async def astream_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None):
+        """
+        Generate text based on the given prompt, yielding the text pieces as the provider streams them.
+        A failing stream raises its error (after the pieces already yielded), so a cut answer is not taken for a complete one.
+        """
+        pass
+    
+    @abstractmethod
+    async def aembed_text(self, text: str, document_type: str = None) -> list[float]:
+        """
+        Generate an embedding for the given text without blocking the event loop.
+        Raises the error of a failed provider call like agenerate_text, so indexing fails with its real cause.
+        """
+        pass
+    
+    @abstractmethod
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of the text with the tokenizer of the generation model."""
+        pass
+    
+    @abstractmethod
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        """Keep the beginning of the text that fits in max_tokens tokens."""
+        pass
+    
     @abstractmethod
     def construct_prompt(self, prompt: str, role: str) -> str:
         """Construct a prompt by filling in the template with the provided variables."""
@@ -1,20 +1,115 @@
-from .providers import OpenAIProvider, GeminiProvider, HuggingFaceProvider, OllamaProvider
+from .providers import OpenAIProvider, GeminiProvider, HuggingFaceProvider, OllamaProvider, FakeProvider, CompositeProvider
 from .llm_enums import LLMEnums
+from .llm_scheduler import LLMCallScheduler
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class LLMProviderFactory:
-    
+
     def __init__(self, config: dict):
         self.config = config
-        
+        # backend -> LLMCallScheduler, shared by the generation and embedding clients of the same backend
+        self.schedulers = {}
+
+    def get_scheduler(self, provider_name: str):
+        if not self.config.LLM_SCHEDULER_ENABLED:
+            return None
+
+        if provider_name not in self.schedulers:
+            rate_limits = self.config.LLM_RATE_LIMITS.get(provider_name, {})
+            self.schedulers[provider_name] = LLMCallScheduler(
+                name= provider_name,
+                requests_per_minute= rate_limits.get("requests_per_minute", 0),
+                tokens_per_minute= rate_limits.get("tokens_per_minute", 0),
+                min_concurrency= self.config.LLM_MIN_CONCURRENCY,
+                max_concurrency= self.config.LLM_MAX_CONCURRENCY,
+                initial_concurrency= self.config.LLM_INITIAL_CONCURRENCY,
+                max_retries= self.config.LLM_MAX_RETRIES,
+                retry_base_delay= self.config.LLM_RETRY_BASE_DELAY_SECONDS,
+                retry_max_delay= self.config.LLM_RETRY_MAX_DELAY_SECONDS,
+                latency_tolerance= self.config.LLM_LATENCY_TOLERANCE
+            )
+        return self.schedulers[provider_name]
+
     def create(self, provider_name: str):
+        provider = self.create_provider(provider_name)
+        if provider is not None:
+            provider.set_scheduler(self.get_scheduler(provider_name))
+        return provider
+
+    def create_composite(self, providers: list, names: list):
+        if len(providers) == 1:
+            return providers[0]
+        return CompositeProvider(
+            providers= providers,
+            names= names,
+            hedge_enabled= self.config.LLM_HEDGE_ENABLED,
+            hedge_percentile= self.config.LLM_HEDGE_PERCENTILE,
+            hedge_min_samples= self.config.LLM_HEDGE_MIN_SAMPLES,
+            latency_window= self.config.LLM_LATENCY_WINDOW
+        )
+
+    def create_generation_client(self):
+        """GENERATION_BACKEND, followed by the GENERATION_FALLBACK_BACKENDS when there are some."""
+        primary = self.create(provider_name=self.config.GENERATION_BACKEND)
+        if primary is None:
+            return None
+        primary.set_generation_model(self.config.GENERATION_MODEL_ID)
+
+        providers, names = [primary], [self.config.GENERATION_BACKEND]
+        for entry in self.config.GENERATION_FALLBACK_BACKENDS:
+            provider = self.create(provider_name=entry["backend"])
+            if provider is None:
+                logger.warning("Unknown generation fallback backend: %s", entry["backend"])
+                continue
+            provider.set_generation_model(entry.get("model_id", self.config.GENERATION_MODEL_ID))
+            providers.append(provider)
+            names.append(entry["backend"])
+
+        return self.create_composite(providers, names)
+
+    def create_embedding_client(self):
+        """
+        EMBEDDING_BACKEND, followed by the EMBEDDING_FALLBACK_BACKENDS producing vectors of the same embedding space:
+        the stored vectors are only comparable with query vectors of the model that produced them.
+        """
+        primary = self.create(provider_name=self.config.EMBEDDING_BACKEND)
+        if primary is None:
+            return None
+        primary.set_embedding_model(self.config.EMBEDDING_MODEL_ID, self.config.EMBEDDING_SIZE)
+        embedding_space = self.config.EMBEDDING_SPACE or f"{self.config.EMBEDDING_MODEL_ID}:{self.config.EMBEDDING_SIZE}"
+
+        providers, names = [primary], [self.config.EMBEDDING_BACKEND]
+        for entry in self.config.EMBEDDING_FALLBACK_BACKENDS:
+            model_id = entry.get("model_id", self.config.EMBEDDING_MODEL_ID)
+            embedding_size = entry.get("embedding_size", self.config.EMBEDDING_SIZE)
+            fallback_space = entry.get("embedding_space") or f"{model_id}:{embedding_size}"
+            if fallback_space != embedding_space:
+                logger.warning("Skipping embedding fallback %s: embedding space %s is not %s",
+                               entry["backend"], fallback_space, embedding_space)
+                continue
+
+            provider = self.create(provider_name=entry["backend"])
+            if provider is None:
+                logger.warning("Unknown embedding fallback backend: %s", entry["backend"])
+                continue
+            provider.set_embedding_model(model_id, embedding_size)
+            providers.append(provider)
+            names.append(entry["backend"])
+
+        return self.create_composite(providers, names)
+
+    def create_provider(self, provider_name: str):
         if provider_name == LLMEnums.OPENAI.value:
             return OpenAIProvider(
                 api_key= self.config.OPENAI_API_KEY,
                 default_input_max_characters= self.config.INPUT_DEFAULT_MAX_CHARACTERS,
                 default_output_max_characters= self.config.GENERATION_DEFAULT_MAX_TOKENS,
-                default_temperature= self.config.GENERATION_DEFAULT_TEMPERATURE
-                
+                default_temperature= self.config.GENERATION_DEFAULT_TEMPERATURE,
+                # the scheduler retries the calls itself, the sdk retries would hide the 429s from it
+                max_retries= 0 if self.config.LLM_SCHEDULER_ENABLED else 2
             )
         if provider_name == LLMEnums.GEMINI.value:
             return GeminiProvider(
@@ -38,4 +133,18 @@ class LLMProviderFactory:
                 default_output_max_characters= self.config.GENERATION_DEFAULT_MAX_TOKENS,
                 default_temperature= self.config.GENERATION_DEFAULT_TEMPERATURE
             )
-        return None
\ No newline at end of file
+        if provider_name == LLMEnums.FAKE.value:
+            return FakeProvider(
+                default_input_max_characters= self.config.INPUT_DEFAULT_MAX_CHARACTERS,
+                default_output_max_characters= self.config.GENERATION_DEFAULT_MAX_TOKENS,
+                default_temperature= self.config.GENERATION_DEFAULT_TEMPERATURE,
+                latency_ms= self.config.FAKE_LATENCY_MS,
+                latency_sigma= self.config.FAKE_LATENCY_SIGMA,
+                tokens_per_second= self.config.FAKE_TOKENS_PER_SECOND,
+                output_tokens= self.config.FAKE_OUTPUT_TOKENS,
+                embedding_latency_ms= self.config.FAKE_EMBEDDING_LATENCY_MS,
+                error_rate= self.config.FAKE_ERROR_RATE,
+                fail_after_tokens= self.config.FAKE_FAIL_AFTER_TOKENS,
+                seed= self.config.FAKE_SEED
+            )
+        return None
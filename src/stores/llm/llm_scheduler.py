@@ -0,0 +1,311 @@
+from .llm_enums import CallPriorityEnum
+from contextlib import contextmanager, aclosing
+from contextvars import ContextVar
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# priority of the provider calls made by the current task, bulk work (indexing) sets it to CallPriorityEnum.BULK
+llm_call_priority = ContextVar("llm_call_priority", default=CallPriorityEnum.INTERACTIVE.value)
+
+PRIORITY_RANKS = {CallPriorityEnum.INTERACTIVE.value: 0, CallPriorityEnum.BULK.value: 1}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504, 529}
+
+
+@contextmanager
+def call_priority(priority: str):
+    token = llm_call_priority.set(priority)
+    try:
+        yield
+    finally:
+        llm_call_priority.reset(token)
+
+
+def get_status_code(error: Exception):
+    # openai / ollama: status_code, google-genai: code, huggingface (requests/httpx errors): response.status_code
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def get_retry_after(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers is not None and headers.get("retry-after") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # timeouts and connection errors of the different sdks (httpx, openai, aiohttp...)
+    return isinstance(error, (TimeoutError, ConnectionError)) or any(
+        name in type(error).__name__ for name in ("Timeout", "Connection", "Unavailable")
+    )
+
+
+class LLMRetriesExhaustedError(Exception):
+    """A retryable error that outlasted the retries, raised from it with the same status code."""
+
+    def __init__(self, backend: str, kind: str, retries: int, error: Exception):
+        status_code = get_status_code(error)
+        reason = "rate limited" if status_code == 429 else "failed"
+        super().__init__(f"{backend} {kind} call {reason} after {retries} retries: {error}")
+        self.status_code = status_code
+
+
+def get_final_error(backend: str, kind: str, attempt: int, error: Exception) -> Exception:
+    # the callers (a failed job) get the number of retries next to the provider error
+    return LLMRetriesExhaustedError(backend, kind, attempt, error) if attempt and is_retryable(error) else error
+
+
+class TokenBucket:
+    """Refills rate_per_minute units per minute, up to one minute worth of burst."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class LLMCallScheduler:
+    """
+    Admission control of the calls to one provider backend, shared by its generation and embedding clients.
+    - requests/min and tokens/min token buckets (0 means no limit)
+    - AIMD concurrency limit: +1 per limit successful calls, halved on a 429, x0.9 when the recent latency
+      of a call kind goes above latency_tolerance times its long term average
+    - retries of 429/5xx/timeouts with full jitter exponential backoff (or the Retry-After delay),
+      a 429 Retry-After also pauses all the calls of the backend
+    - waiting calls are admitted by priority lane (interactive before bulk), then in arrival order
+    """
+
+    def __init__(self, name: str, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 min_concurrency: int = 1, max_concurrency: int = 16, initial_concurrency: int = 4,
+                 max_retries: int = 4, retry_base_delay: float = 0.5, retry_max_delay: float = 30.0,
+                 latency_tolerance: float = 2.0, decrease_cooldown: float = 1.0):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.concurrency = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown = decrease_cooldown
+
+        self.in_flight = 0
+        # heap of [priority rank, arrival no, tokens, future]
+        self.waiters = []
+        self.arrivals = itertools.count()
+        self.dispatch_handle = None
+        self.dispatch_at = None
+        self.paused_until = 0.0
+        self.last_decrease_at = 0.0
+        # call kind -> [short term, long term] latency moving averages
+        self.latencies = {}
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(self.min_concurrency, int(self.concurrency))
+
+    def schedule_dispatch(self, delay: float):
+        dispatch_at = time.monotonic() + delay
+        if self.dispatch_handle is not None and self.dispatch_at <= dispatch_at:
+            return
+        if self.dispatch_handle is not None:
+            self.dispatch_handle.cancel()
+        self.dispatch_at = dispatch_at
+        self.dispatch_handle = asyncio.get_running_loop().call_later(delay, self.on_dispatch_timer)
+
+    def on_dispatch_timer(self):
+        self.dispatch_handle = None
+        self.dispatch()
+
+    def dispatch(self):
+        """Admit the waiting calls in priority order while there is a free slot and budget in the buckets."""
+        while self.waiters:
+            _, _, tokens, future = self.waiters[0]
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            if self.in_flight >= self.concurrency_limit:
+                return
+
+            now = time.monotonic()
+            wait = max(
+                self.paused_until - now,
+                self.request_bucket.wait_time(1, now) if self.request_bucket else 0.0,
+                self.token_bucket.wait_time(tokens, now) if self.token_bucket else 0.0
+            )
+            if wait > 0:
+                # the head of the queue keeps its turn, lower priority calls don't overtake it
+                self.schedule_dispatch(wait)
+                return
+
+            heapq.heappop(self.waiters)
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket:
+                self.token_bucket.consume(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: str):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, [PRIORITY_RANKS.get(priority, 0), next(self.arrivals), tokens, future])
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # cancelled right after being admitted: give the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+
+    def decrease(self, factor: float):
+        now = time.monotonic()
+        # one decrease per cooldown, the calls in flight report the same congestion
+        if now - self.last_decrease_at < self.decrease_cooldown:
+            return
+        self.last_decrease_at = now
+        self.concurrency = max(float(self.min_concurrency), self.concurrency * factor)
+
+    def on_success(self, kind: str, latency: float):
+        averages = self.latencies.get(kind)
+        if averages is None:
+            averages = self.latencies[kind] = [latency, latency]
+        averages[0] += 0.3 * (latency - averages[0])
+        averages[1] += 0.02 * (latency - averages[1])
+
+        if self.latency_tolerance and averages[0] > self.latency_tolerance * averages[1]:
+            self.decrease(0.9)
+        else:
+            self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+        self.dispatch()
+
+    def on_error(self, error: Exception, attempt: int):
+        """Returns the delay before retrying the call, or None when it must not be retried."""
+        if get_status_code(error) == 429:
+            self.stats["rate_limited"] += 1
+            self.decrease(0.5)
+
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.stats["failures"] += 1
+            return None
+
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+            if get_status_code(error) == 429:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.stats["retries"] += 1
+        logger.warning("%s call failed (%s), retry %d in %.2fs", self.name, str(error), attempt + 1, delay)
+        return delay
+
+    async def run(self, call, tokens: int = 0, kind: str = "generation"):
+        """
+        Await call() within the limits, retrying it on retryable errors. The last error is raised, as a
+        LLMRetriesExhaustedError when it was retried.
+        """
+        priority = llm_call_priority.get()
+        self.stats["calls"] += 1
+        for attempt in itertools.count():
+            await self.acquire(tokens, priority)
+            started_at = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self.release()
+
+            if error is None:
+                self.on_success(kind, time.monotonic() - started_at)
+                return result
+
+            delay = self.on_error(error, attempt)
+            if delay is None:
+                raise get_final_error(self.name, kind, attempt, error) from error
+            await asyncio.sleep(delay)
+
+    async def run_stream(self, open_stream, tokens: int = 0, kind: str = "generation"):
+        """
+        Iterate open_stream() (an async generator factory) within the limits, the slot is held until the stream
+        ends or is closed: the callers iterate it in `aclosing` so a stream abandoned by its consumer frees the slot
+        (and closes the provider stream) right away instead of when it is garbage collected.
+        It is retried only until its first item, after that an error is raised to the caller.
+        """
+        priority = llm_call_priority.get()
+        self.stats["calls"] += 1
+        for attempt in itertools.count():
+            await self.acquire(tokens, priority)
+            started_at = time.monotonic()
+            has_items = False
+            try:
+                async with aclosing(open_stream()) as items:
+                    async for item in items:
+                        has_items = True
+                        yield item
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self.release()
+
+            if error is None:
+                self.on_success(kind, time.monotonic() - started_at)
+                return
+
+            if has_items:
+                self.stats["failures"] += 1
+                raise error
+            delay = self.on_error(error, attempt)
+            if delay is None:
+                raise get_final_error(self.name, kind, attempt, error) from error
+            await asyncio.sleep(delay)
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": self.name,
+            **self.stats,
+            "concurrency_limit": self.concurrency_limit,
+            "in_flight": self.in_flight,
+            "waiting": {
+                priority: sum(1 for rank, _, _, future in self.waiters if rank == priority_rank and not future.done())
+                for priority, priority_rank in PRIORITY_RANKS.items()
+            },
+            "latency_seconds": {kind: round(averages[0], 4) for kind, averages in self.latencies.items()}
+        }
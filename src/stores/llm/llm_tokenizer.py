@@ -0,0 +1,64 @@
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+class ApproximateTokenizer:
+    """
+    Token counts estimated from the utf-8 size of the text, for the providers without a local tokenizer.
+    About 4 bytes per token holds for english with bpe/sentencepiece vocabularies, and stays
+    on the safe side for arabic (2 bytes per character, 2 to 3 characters per token).
+    """
+
+    def __init__(self, bytes_per_token: float = 4.0):
+        self.bytes_per_token = bytes_per_token
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        return math.ceil(len(text.encode("utf-8")) / self.bytes_per_token)
+
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        encoded = text.encode("utf-8")
+        max_bytes = int(max_tokens * self.bytes_per_token)
+        if len(encoded) <= max_bytes:
+            return text
+        return encoded[:max_bytes].decode("utf-8", errors="ignore")
+
+
+class TiktokenTokenizer:
+    """Exact token counts of the OpenAI models."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+
+def get_tiktoken_tokenizer(model_name: str, default_encoding: str = "o200k_base"):
+    """The tiktoken tokenizer of the model, or the approximate one when tiktoken or its encoding files are unavailable."""
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            # unknown (e.g. newer) model names use the encoding of the current models
+            encoding = tiktoken.get_encoding(default_encoding)
+    except Exception as e:
+        logger.warning("tiktoken is unavailable for %s, token counts are approximated: %s", model_name, str(e))
+        return ApproximateTokenizer()
+    return TiktokenTokenizer(encoding)
@@ -2,3 +2,5 @@ from .openai_provider import OpenAIProvider
 from .gemini_provider import GeminiProvider
 from .hugging_face_provider import HuggingFaceProvider
 from .ollama_provider import OllamaProvider
+from .fake_provider import FakeProvider
+from .composite_provider import CompositeProvider
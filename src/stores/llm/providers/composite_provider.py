@@ -0,0 +1,223 @@
+from ..llm_interface import LLMInterface
+from ..llm_enums import CompositeEnums, CallPriorityEnum
+from ..llm_scheduler import llm_call_priority
+from collections import deque
+from typing import Union, List
+import asyncio
+import logging
+import time
+
+
+class CompositeProvider(LLMInterface):
+    """
+    Client over an ordered list of providers, the first one being the primary.
+    - failover: a call failing on a provider (error or None) goes to the next one
+    - hedged requests: an interactive call still running after the hedge_percentile latency of its provider
+      (over the provider's last latency_window calls of the same kind) is also sent to the next provider,
+      the first result wins and the other call is cancelled. Bulk calls (indexing) only fail over.
+    Streams are hedged on the time to their first piece.
+    The providers of an embedding client must all produce vectors of the same embedding space
+    (checked by LLMProviderFactory).
+    """
+
+    def __init__(self, providers: list, names: list, hedge_enabled: bool = True, hedge_percentile: float = 0.95,
+                 hedge_min_samples: int = 20, latency_window: int = 200):
+
+        self.providers = providers
+        self.names = names
+        self.primary = providers[0]
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+
+        # (provider no, call kind) -> latencies of the last calls
+        self.latencies = {}
+        self.stats = {"hedged": 0, "failovers": 0, "backup_wins": 0}
+        # closing of the streams that lost a race, referenced until done so they are not garbage collected
+        self.close_tasks = set()
+        self.enums = CompositeEnums
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def generation_model_id(self):
+        return self.primary.generation_model_id
+
+    @property
+    def embedding_model_id(self):
+        return self.primary.embedding_model_id
+
+    @property
+    def embedding_size(self):
+        return self.primary.embedding_size
+
+    def set_generation_model(self, model_name: str) -> None:
+        self.primary.set_generation_model(model_name)
+
+    def set_embedding_model(self, model_name: str, embedding_size: int = None) -> None:
+        self.primary.set_embedding_model(model_name, embedding_size)
+
+    def get_schedulers(self) -> list:
+        schedulers = []
+        for provider in self.providers:
+            for scheduler in provider.get_schedulers():
+                if scheduler not in schedulers:
+                    schedulers.append(scheduler)
+        return schedulers
+
+    def record_latency(self, index: int, kind: str, latency: float):
+        samples = self.latencies.get((index, kind))
+        if samples is None:
+            samples = self.latencies[(index, kind)] = deque(maxlen=self.latency_window)
+        samples.append(latency)
+
+    def get_hedge_delay(self, index: int, kind: str):
+        samples = self.latencies.get((index, kind))
+        if not self.hedge_enabled or samples is None or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * self.hedge_percentile), len(ordered) - 1)]
+
+    async def race(self, kind: str, make_call, discard=None):
+        """
+        Run make_call(provider) on the primary, then on the next providers on failure or when hedging,
+        and return the first result that is not None (None when all of them failed).
+        discard(result) is called for the other successful results.
+        """
+        can_hedge = llm_call_priority.get() == CallPriorityEnum.INTERACTIVE.value
+        running = {}
+        next_index = 0
+        winner = None
+
+        def launch():
+            nonlocal next_index
+            running[asyncio.create_task(make_call(self.providers[next_index]))] = (next_index, time.monotonic())
+            next_index += 1
+
+        launch()
+        try:
+            while running and winner is None:
+                timeout = None
+                if can_hedge and next_index < len(self.providers):
+                    # hedge once the last started call is slower than usual for its provider
+                    index, started_at = running[next(reversed(running))]
+                    hedge_delay = self.get_hedge_delay(index, kind)
+                    if hedge_delay is not None:
+                        timeout = max(0.0, started_at + hedge_delay - time.monotonic())
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.stats["hedged"] += 1
+                    launch()
+                    continue
+
+                has_failed = False
+                for task in done:
+                    index, started_at = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.logger.error("%s %s call failed: %s", self.names[index], kind, str(e))
+                        result = None
+
+                    if result is None:
+                        has_failed = True
+                        continue
+                    # only the completed calls: the cancelled ones would pull the percentile down
+                    self.record_latency(index, kind, time.monotonic() - started_at)
+                    if winner is not None:
+                        if discard is not None:
+                            discard(result)
+                        continue
+                    if index > 0:
+                        self.stats["backup_wins"] += 1
+                    winner = result
+
+                if winner is None and has_failed and next_index < len(self.providers):
+                    self.stats["failovers"] += 1
+                    self.logger.warning("Failing over %s call to %s", kind, self.names[next_index])
+                    launch()
+            return winner
+        finally:
+            for task in running:
+                task.cancel()
+
+    def convert_chat_history(self, provider, chat_history: list) -> list:
+        # messages are kept in the neutral {"role", "content"} format, each provider gets its own format
+        roles = {getattr(self.enums, name).value: getattr(provider.enums, name).value for name in ("SYSTEM", "USER", "ASSISTANT")}
+        return [
+            provider.construct_prompt(prompt=message["content"], role=roles.get(message["role"], message["role"]))
+            for message in chat_history
+        ]
+
+    def generate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+        for index, provider in enumerate(self.providers):
+            answer = provider.generate_text(prompt, self.convert_chat_history(provider, chat_history),
+                                            max_output_tokens, temperature)
+            if answer is not None:
+                return answer
+            if index + 1 < len(self.providers):
+                self.stats["failovers"] += 1
+        return None
+
+    async def agenerate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+        return await self.race("generation", lambda provider: provider.agenerate_text(
+            prompt, self.convert_chat_history(provider, chat_history), max_output_tokens, temperature
+        ))
+
+    async def astream_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None):
+
+        async def first_piece(provider):
+            stream = provider.astream_text(prompt, self.convert_chat_history(provider, chat_history),
+                                           max_output_tokens, temperature)
+            try:
+                return await stream.__anext__(), stream
+            except StopAsyncIteration:
+                # empty stream (e.g. the model is not set), the errors are raised and fail over in race
+                return None
+            except asyncio.CancelledError:
+                # lost the race before its first piece
+                await stream.aclose()
+                raise
+
+        def discard(result):
+            task = asyncio.create_task(result[1].aclose())
+            self.close_tasks.add(task)
+            task.add_done_callback(self.close_tasks.discard)
+
+        result = await self.race("stream", first_piece, discard=discard)
+        if result is None:
+            return
+
+        piece, stream = result
+        try:
+            yield piece
+            async for piece in stream:
+                yield piece
+        finally:
+            await stream.aclose()
+
+    def embed_text(self, text: Union[str, List[str]], document_type: str = None):
+        for index, provider in enumerate(self.providers):
+            vectors = provider.embed_text(text, document_type)
+            if vectors is not None:
+                return vectors
+            if index + 1 < len(self.providers):
+                self.stats["failovers"] += 1
+        return None
+
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None):
+        return await self.race("embedding", lambda provider: provider.aembed_text(text, document_type))
+
+    def construct_prompt(self, prompt: str, role: str) -> dict:
+        return {"role": role, "content": prompt}
+
+    def process_text(self, text: str) -> str:
+        return self.primary.process_text(text)
+
+    def count_tokens(self, text: str) -> int:
+        return self.primary.count_tokens(text)
+
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.primary.truncate_text(text, max_tokens)
+
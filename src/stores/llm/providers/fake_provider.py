@@ -0,0 +1,244 @@
+from ..llm_interface import LLMInterface
+from ..llm_enums import FakeEnums
+from ..llm_tokenizer import ApproximateTokenizer
+from array import array
+from collections import Counter
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Union, List
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class FakeProviderError(Exception):
+    """Injected failure, looks like a 503 to the scheduler so it is retried like a real one."""
+
+    status_code = 503
+
+
+@lru_cache(maxsize=8192)
+def hash_vector(word: str, size: int, seed: int) -> array:
+    # gaussian components seeded by the word hash: the same word gets the same vector in every process
+    digest = hashlib.blake2b(f"{seed}:{word}".encode("utf-8"), digest_size=8).digest()
+    generator = random.Random(int.from_bytes(digest, "big"))
+    return array("d", (generator.gauss(0.0, 1.0) for _ in range(size)))
+
+
+class FakeProvider(LLMInterface):
+    """
+    Local stand-in backend for benchmarks and offline runs, no network calls.
+    - embeddings: normalized sum of hash-seeded random vectors of the words of the text, deterministic and
+      of the configured embedding size; texts sharing words are close, so the retrieval still makes sense
+    - generation: a deterministic answer made of the prompt words, after a time to first token drawn from a
+      log-normal distribution (median latency_ms, spread latency_sigma), then streamed at tokens_per_second
+    - error_rate of the calls fail with FakeProviderError; a failing stream fails before its first token, or
+      after fail_after_tokens tokens to reproduce a stream cut in the middle of the answer
+    The calls go through the backend scheduler like the real providers.
+    """
+
+    def __init__(self, default_input_max_characters: int = 1000,
+                 default_output_max_characters: int = 1000,
+                 default_temperature: float = 0.1,
+                 latency_ms: float = 300.0,
+                 latency_sigma: float = 0.5,
+                 tokens_per_second: float = 50.0,
+                 output_tokens: int = 200,
+                 embedding_latency_ms: float = 20.0,
+                 error_rate: float = 0.0,
+                 fail_after_tokens: int = 0,
+                 seed: int = 0
+        ):
+
+        self.default_input_max_characters = default_input_max_characters
+        self.default_output_max_characters = default_output_max_characters
+        self.default_temperature = default_temperature
+
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.embedding_latency_ms = embedding_latency_ms
+        self.error_rate = error_rate
+        self.fail_after_tokens = fail_after_tokens
+        self.seed = seed
+        # latencies and failures are random, but the same sequence for the same seed
+        self.random = random.Random(seed)
+
+        self.generation_model_id = None
+        self.embedding_model_id = None
+        self.embedding_size = None
+
+        self.enums = FakeEnums
+        self.tokenizer = ApproximateTokenizer()
+        self.logger = logging.getLogger(__name__)
+
+    def set_generation_model(self, model_name: str) -> None:
+        self.generation_model_id = model_name
+
+    def set_embedding_model(self, model_name: str, embedding_size: int = None) -> None:
+        self.embedding_model_id = model_name
+        self.embedding_size = embedding_size
+
+    def sample_latency(self, median_ms: float) -> float:
+        if median_ms <= 0:
+            return 0.0
+        return median_ms * math.exp(self.random.gauss(0.0, self.latency_sigma)) / 1000
+
+    def is_failing(self) -> bool:
+        return bool(self.error_rate) and self.random.random() < self.error_rate
+
+    def check_failure(self):
+        if self.is_failing():
+            raise FakeProviderError("Injected failure of the fake backend")
+
+    def build_answer(self, prompt: str, chat_history: list, max_output_tokens: int = None) -> list:
+        """The answer pieces, one per token: the prompt words in order, cycled up to the output size."""
+        if not self.generation_model_id:
+            self.logger.error("Generation model for Fake was not set")
+            return None
+
+        max_tokens = max_output_tokens if max_output_tokens is not None else self.default_output_max_characters
+        output_tokens = min(self.output_tokens, max_tokens)
+        words = WORD_PATTERN.findall(prompt) or ["answer"]
+        chat_history.append(self.construct_prompt(prompt, role=FakeEnums.USER.value))
+
+        return [("" if index == 0 else " ") + words[index % len(words)] for index in range(output_tokens)]
+
+    def generate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+
+        pieces = self.build_answer(prompt, chat_history, max_output_tokens)
+        if pieces is None:
+            return None
+
+        time.sleep(self.sample_latency(self.latency_ms) + self.get_decode_time(len(pieces)))
+        try:
+            self.check_failure()
+        except FakeProviderError as e:
+            self.logger.error(f"Error while generating text with Fake: {e}")
+            return None
+
+        return "".join(pieces)
+
+    async def agenerate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+
+        pieces = self.build_answer(prompt, chat_history, max_output_tokens)
+        if pieces is None:
+            return None
+
+        async def call():
+            await asyncio.sleep(self.sample_latency(self.latency_ms) + self.get_decode_time(len(pieces)))
+            self.check_failure()
+            return "".join(pieces)
+
+        try:
+            return await self.run_call(call, tokens=self.count_tokens(str(chat_history)) + len(pieces))
+        except Exception as e:
+            self.logger.error(f"Error while generating text with Fake: {e}")
+            raise
+
+    async def astream_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None):
+
+        pieces = self.build_answer(prompt, chat_history, max_output_tokens)
+        if pieces is None:
+            return
+
+        async def open_stream():
+            await asyncio.sleep(self.sample_latency(self.latency_ms))
+            # a stream shorter than fail_after_tokens completes
+            fails_at = self.fail_after_tokens if self.is_failing() else None
+            if fails_at == 0:
+                raise FakeProviderError("Injected failure of the fake backend")
+            token_time = self.get_decode_time(1)
+            for index, piece in enumerate(pieces):
+                if index == fails_at:
+                    raise FakeProviderError(f"Injected failure of the fake backend after {index} tokens")
+                if index and token_time:
+                    await asyncio.sleep(token_time)
+                yield piece
+
+        try:
+            async with aclosing(self.run_stream(open_stream, tokens=self.count_tokens(str(chat_history)) + len(pieces))) as stream:
+                async for piece in stream:
+                    yield piece
+        except Exception as e:
+            self.logger.error(f"Error while streaming text with Fake: {e}")
+            raise
+
+    def get_decode_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def embed_vector(self, text: str) -> list:
+        vector = [0.0] * self.embedding_size
+        for word, count in Counter(WORD_PATTERN.findall(self.process_text(text).lower())).items():
+            for index, value in enumerate(hash_vector(word, self.embedding_size, self.seed)):
+                vector[index] += count * value
+
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm == 0:
+            # no words: a fixed vector of the text itself, still deterministic
+            vector = hash_vector(text, self.embedding_size, self.seed + 1)
+            norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector]
+
+    def embed_vectors(self, texts: List[str]) -> list:
+        return [self.embed_vector(t) for t in texts]
+
+    def build_embedding_texts(self, text: Union[str, List[str]]) -> list:
+        if not self.embedding_model_id or not self.embedding_size:
+            self.logger.error("Embedding model or size for Fake was not set")
+            return None
+
+        return [text] if isinstance(text, str) else text
+
+    def embed_text(self, text: Union[str, List[str]], document_type: str = None):
+
+        texts = self.build_embedding_texts(text)
+        if texts is None:
+            return None
+
+        time.sleep(self.sample_latency(self.embedding_latency_ms))
+        try:
+            self.check_failure()
+        except FakeProviderError as e:
+            self.logger.error(f"Error while embedding text with Fake: {e}")
+            return None
+
+        return self.embed_vectors(texts)
+
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None):
+
+        texts = self.build_embedding_texts(text)
+        if texts is None:
+            return None
+
+        async def call():
+            await asyncio.sleep(self.sample_latency(self.embedding_latency_ms))
+            self.check_failure()
+            # pure python over embedding_size per word, kept off the event loop
+            return await asyncio.to_thread(self.embed_vectors, texts)
+
+        try:
+            return await self.run_call(call, tokens=sum(self.count_tokens(t) for t in texts), kind="embedding")
+        except Exception as e:
+            self.logger.error(f"Error while embedding text with Fake: {e}")
+            raise
+
+    def construct_prompt(self, prompt: str, role: str) -> dict:
+        return {"role": role,
+                "content": prompt}
+
+    def process_text(self, text: str) -> str:
+        return text[:self.default_input_max_characters].strip()
+
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.tokenizer.truncate_text(text, max_tokens)
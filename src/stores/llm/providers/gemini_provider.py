@@ -1,10 +1,12 @@
 import logging
 from ..llm_interface import LLMInterface
 from ..llm_enums import GeminiEnums, DocumentTypeEnums
+from ..llm_tokenizer import ApproximateTokenizer
 # import google.generativeai as genai
 from google import genai
 from google.genai import types
 from typing import Union, List
+from contextlib import aclosing
 
 class GeminiProvider(LLMInterface):
     
@@ -25,6 +27,7 @@ class GeminiProvider(LLMInterface):
         # Initialize the Google Generative AI client
         self.client = genai.Client(api_key=self.api_key)
         self.enums = GeminiEnums
+        self.tokenizer = ApproximateTokenizer()
         self.logger = logging.getLogger(__name__)
 
     def set_generation_model(self, model_name: str) -> None:
@@ -36,6 +39,55 @@ class GeminiProvider(LLMInterface):
 
     def generate_text(self, prompt: str, chat_history: list = [], 
                       max_output_tokens: int = None, temperature: float = None) -> str:
+        
+        request = self.build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+        if request is None:
+            return None
+        
+        response = self.client.models.generate_content(**request)
+        
+        return self.parse_generation_response(response)
+    
+    async def agenerate_text(self, prompt: str, chat_history: list = [], 
+                             max_output_tokens: int = None, temperature: float = None) -> str:
+        
+        request = self.build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+        if request is None:
+            return None
+        
+        try:
+            response = await self.run_call(
+                lambda: self.client.aio.models.generate_content(**request),
+                tokens=self.count_tokens(str(request["contents"])) + request["config"].max_output_tokens
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to get response from Gemini: {e}")
+            raise
+        
+        return self.parse_generation_response(response)
+    
+    async def astream_text(self, prompt: str, chat_history: list = [], 
+                           max_output_tokens: int = None, temperature: float = None):
+        
+        request = self.build_generation_request(prompt, chat_history, max_output_tokens, temperature)
+        if request is None:
+            return
+        
+        async def open_stream():
+            async for chunk in await self.client.aio.models.generate_content_stream(**request):
+                if chunk.text:
+                    yield chunk.text
+        
+        try:
+            async with aclosing(self.run_stream(open_stream, tokens=self.count_tokens(str(request["contents"])) + request["config"].max_output_tokens)) as pieces:
+                async for piece in pieces:
+                    yield piece
+        except Exception as e:
+            self.logger.error(f"Failed to stream response from Gemini: {e}")
+            raise
+    
+    def build_generation_request(self, prompt: str, chat_history: list, 
+                                 max_output_tokens: int = None, temperature: float = None) -> dict:
             
         if not self.generation_model_id:
             self.logger.error("Generation model for Gemini provider is not set.")
@@ -67,15 +119,17 @@ class GeminiProvider(LLMInterface):
         # print(f"Messages sent to Gemini: {messages}")
         max_output_tokens = max_output_tokens or self.default_output_max_characters
         
-        response = self.client.models.generate_content(
-            model=self.generation_model_id,
-            contents=messages,
-            config=types.GenerateContentConfig(
+        return {
+            "model": self.generation_model_id,
+            "contents": messages,
+            "config": types.GenerateContentConfig(
                 system_instruction=system_instruction,
                 max_output_tokens=max_output_tokens,
                 temperature=temperature if temperature is not None else self.default_temperature
             ),
-        )
+        }
+    
+    def parse_generation_response(self, response) -> str:
             
         if not response or not response.text:
             # Handle cases where finish_reason is MAX_TOKENS but text is partial
@@ -101,8 +155,46 @@ class GeminiProvider(LLMInterface):
 
     def process_text(self, text: str) -> str:
         return text[:self.default_input_max_characters].strip()
+    
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+    
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.tokenizer.truncate_text(text, max_tokens)
 
     def embed_text(self, text: Union[str, List[str]], document_type: str = None) -> list[float]:
+        
+        request = self.build_embedding_request(text, document_type)
+        if request is None:
+            return None
+        
+        try:
+            result = self.client.models.embed_content(**request)
+        except Exception as e:
+            self.logger.error(f"Gemini embedding error: {str(e)}")
+            return None
+        
+        return self.parse_embedding_response(result)
+    
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None) -> list[float]:
+        
+        request = self.build_embedding_request(text, document_type)
+        if request is None:
+            return None
+        
+        try:
+            result = await self.run_call(
+                lambda: self.client.aio.models.embed_content(**request),
+                tokens=sum(self.count_tokens(t) for t in request["contents"]),
+                kind="embedding"
+            )
+        except Exception as e:
+            self.logger.error(f"Gemini embedding error: {str(e)}")
+            raise
+        
+        return self.parse_embedding_response(result)
+    
+    def build_embedding_request(self, text: Union[str, List[str]], document_type: str = None) -> dict:
         if not self.embedding_model_id:
             self.logger.error("Embedding model is not set.")
             return None
@@ -115,33 +207,27 @@ class GeminiProvider(LLMInterface):
         if document_type == DocumentTypeEnums.QUERY.value:
             input_type = GeminiEnums.QUERY.value
         
-        try:
-            embed_config = {
-                "task_type": input_type,
-                "output_dimensionality": self.embedding_size
-            }
-            # We pass output_dimensionality to the API. 
-            # Note: This only works with newer models like 'text-embedding-004'
-            result = self.client.models.embed_content(
-                model=self.embedding_model_id,
-                contents=[self.process_text(t) for t in text],
-                config=embed_config
-            )
-            
-            # 1. Check for the attribute instead of the dictionary key
-            if not result or not hasattr(result, 'embeddings'):
-                self.logger.error("No embeddings attribute found in result")
-                return None
+        embed_config = {
+            "task_type": input_type,
+            "output_dimensionality": self.embedding_size
+        }
+        # We pass output_dimensionality to the API. 
+        # Note: This only works with newer models like 'text-embedding-004'
+        return {
+            "model": self.embedding_model_id,
+            "contents": [self.process_text(t) for t in text],
+            "config": embed_config
+        }
+    
+    def parse_embedding_response(self, result) -> list:
+        # 1. Check for the attribute instead of the dictionary key
+        if not result or not hasattr(result, 'embeddings'):
+            self.logger.error("No embeddings attribute found in result")
+            return None
 
-            # 2. Extract the values from each ContentEmbedding object
-            # Each 'ContentEmbedding' has a 'values' attribute which is the list of floats
-            embeddings_list = [item.values for item in result.embeddings]
+        # 2. Extract the values from each ContentEmbedding object
+        # Each 'ContentEmbedding' has a 'values' attribute which is the list of floats
+        embeddings_list = [item.values for item in result.embeddings]
 
-            # 3. Return the result
-            return embeddings_list
-                            
-        except Exception as e:
-            self.logger.error(f"Gemini embedding error: {str(e)}")
-            return None
-        
-    
\ No newline at end of file
+        # 3. Return the result
+        return embeddings_list
@@ -1,8 +1,10 @@
 import logging
-from huggingface_hub import InferenceClient
+from huggingface_hub import InferenceClient, AsyncInferenceClient
 from ..llm_interface import LLMInterface
 from ..llm_enums import HuggingFaceEnums
+from ..llm_tokenizer import ApproximateTokenizer
 from typing import Union, List
+from contextlib import aclosing
 class HuggingFaceProvider(LLMInterface):
     
     def __init__(self, api_key: str, 
@@ -21,7 +23,9 @@ class HuggingFaceProvider(LLMInterface):
         
         # The InferenceClient can be used for text, images, and embeddings
         self.client = InferenceClient(token=self.api_key)
+        self.async_client = AsyncInferenceClient(token=self.api_key)
         self.enums = HuggingFaceEnums
+        self.tokenizer = ApproximateTokenizer()
         self.logger = logging.getLogger(__name__)
 
     def set_generation_model(self, model_name: str) -> None:
@@ -36,28 +40,77 @@ class HuggingFaceProvider(LLMInterface):
     def generate_text(self, prompt: str, chat_history: list = [],
                       max_output_tokens: int = None, temperature: float = None) -> str:
         
-        if not self.generation_model_id:
-            self.logger.error("Hugging Face generation model ID is not set.")
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
             return None
 
-        # Use the OpenAI-compatible chat completion method
-        # This automatically handles the prompt formatting for most models
-        chat_history.append(self.construct_prompt(prompt, role= HuggingFaceEnums.USER.value))
+        try:
+            response = self.client.chat_completion(**params)
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            self.logger.error(f"Hugging Face API error: {e}")
+            return None
+    
+    async def agenerate_text(self, prompt: str, chat_history: list = [],
+                             max_output_tokens: int = None, temperature: float = None) -> str:
+        
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return None
 
         try:
-            response = self.client.chat_completion(
-                model=self.generation_model_id,
-                messages=chat_history,
-                max_tokens=max_output_tokens or self.default_output_max_characters,
-                temperature=temperature if temperature is not None else self.default_temperature
+            response = await self.run_call(
+                lambda: self.async_client.chat_completion(**params),
+                tokens=self.count_tokens(str(params["messages"])) + params["max_tokens"]
             )
             
             return response.choices[0].message.content
             
         except Exception as e:
             self.logger.error(f"Hugging Face API error: {e}")
+            raise
+    
+    async def astream_text(self, prompt: str, chat_history: list = [],
+                           max_output_tokens: int = None, temperature: float = None):
+        
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return
+
+        async def open_stream():
+            stream = await self.async_client.chat_completion(**params, stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        try:
+            async with aclosing(self.run_stream(open_stream, tokens=self.count_tokens(str(params["messages"])) + params["max_tokens"])) as pieces:
+                async for piece in pieces:
+                    yield piece
+        except Exception as e:
+            self.logger.error(f"Hugging Face API streaming error: {e}")
+            raise
+    
+    def build_generation_params(self, prompt: str, chat_history: list,
+                                max_output_tokens: int = None, temperature: float = None) -> dict:
+        
+        if not self.generation_model_id:
+            self.logger.error("Hugging Face generation model ID is not set.")
             return None
 
+        # Use the OpenAI-compatible chat completion method
+        # This automatically handles the prompt formatting for most models
+        chat_history.append(self.construct_prompt(prompt, role= HuggingFaceEnums.USER.value))
+        
+        return {
+            "model": self.generation_model_id,
+            "messages": chat_history,
+            "max_tokens": max_output_tokens or self.default_output_max_characters,
+            "temperature": temperature if temperature is not None else self.default_temperature
+        }
+
     def embed_text(self, text: Union[str, List[str]], document_type: str= None) -> list[float]:
         if not self.embedding_model_id:
             self.logger.error("Embedding model is not set.")
@@ -73,20 +126,43 @@ class HuggingFaceProvider(LLMInterface):
                 model=self.embedding_model_id)
             
             # Convert to list
-            embedding_list = vector.tolist()
-            
-            print(f"Raw vector from Hugging Face: {vector}")
-            print(f"Raw embedding from Hugging Face: {embedding_list}")
-            
-            return embedding_list
+            return vector.tolist()
         
         except Exception as e:
             self.logger.error(f"HF Embedding error: {e}")
             return None
+    
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str= None) -> list[float]:
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model is not set.")
+            return None
+
+        if isinstance(text, str):
+            text = [text]
+
+        texts = [self.process_text(t) for t in text]
+        try:
+            vector = await self.run_call(
+                lambda: self.async_client.feature_extraction(texts, model=self.embedding_model_id),
+                tokens=sum(self.count_tokens(t) for t in texts),
+                kind="embedding"
+            )
+            
+            return vector.tolist()
+        
+        except Exception as e:
+            self.logger.error(f"HF Embedding error: {e}")
+            raise
 
     def construct_prompt(self, prompt, role):
         return {"role": role, "content": prompt}
     
     def process_text(self, text: str) -> str:
         return text[:self.default_input_max_characters].strip()
+    
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+    
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.tokenizer.truncate_text(text, max_tokens)
     
\ No newline at end of file
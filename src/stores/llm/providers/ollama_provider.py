@@ -1,9 +1,11 @@
 from ..llm_interface import LLMInterface
 from ..llm_enums import OllamaEnums
+from ..llm_tokenizer import ApproximateTokenizer
 import ollama
 import logging
 import os
 from typing import Union, List
+from contextlib import aclosing
 
 class OllamaProvider(LLMInterface):
     
@@ -33,7 +35,12 @@ class OllamaProvider(LLMInterface):
             host=self.host,
             headers={'Authorization': 'Bearer ' + self.api_key}
         )
+        self.async_client = ollama.AsyncClient(
+            host=self.host,
+            headers={'Authorization': 'Bearer ' + self.api_key}
+        )
         self.enums = OllamaEnums
+        self.tokenizer = ApproximateTokenizer()
         self.logger = logging.getLogger(__name__)
         
     def set_generation_model(self, model_name: str) -> None:
@@ -45,28 +52,76 @@ class OllamaProvider(LLMInterface):
         
     def generate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
 
-        if not self.generation_model_id:
-            logging.error("Generation model from Ollama provider is not set.")
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
             return None
         
-        max_tokens = max_output_tokens if max_output_tokens is not None else self.default_output_max_characters
-        temp = temperature if temperature is not None else self.default_temperature
+        try:
+            response = self.client.chat(**params)
+        except Exception as e:
+            logging.error(f"Failed to get response from Ollama {self.generation_model_id} (host: {self.host}) model: {e}")
+            return None
+        
+        return self.parse_generation_response(response)
+    
+    async def agenerate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
 
-        chat_history.append(self.construct_prompt(prompt, role=OllamaEnums.USER.value))
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return None
         
         try:
-            response = self.client.chat(
-                model=self.generation_model_id,
-                messages=chat_history,
-                options={
-                    "num_predict":max_tokens,
-                    "temperature":temp
-                }
+            response = await self.run_call(
+                lambda: self.async_client.chat(**params),
+                tokens=self.count_tokens(str(params["messages"])) + params["options"]["num_predict"]
             )
         except Exception as e:
             logging.error(f"Failed to get response from Ollama {self.generation_model_id} (host: {self.host}) model: {e}")
+            raise
+        
+        return self.parse_generation_response(response)
+    
+    async def astream_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None):
+
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return
+        
+        async def open_stream():
+            async for part in await self.async_client.chat(**params, stream=True):
+                if part.message.content:
+                    yield part.message.content
+        
+        try:
+            async with aclosing(self.run_stream(open_stream, tokens=self.count_tokens(str(params["messages"])) + params["options"]["num_predict"])) as pieces:
+                async for piece in pieces:
+                    yield piece
+        except Exception as e:
+            logging.error(f"Failed to stream response from Ollama {self.generation_model_id} (host: {self.host}) model: {e}")
+            raise
+    
+    def build_generation_params(self, prompt: str, chat_history: list, max_output_tokens: int = None, temperature: float = None) -> dict:
+
+        if not self.generation_model_id:
+            logging.error("Generation model from Ollama provider is not set.")
             return None
         
+        max_tokens = max_output_tokens if max_output_tokens is not None else self.default_output_max_characters
+        temp = temperature if temperature is not None else self.default_temperature
+
+        chat_history.append(self.construct_prompt(prompt, role=OllamaEnums.USER.value))
+        
+        return {
+            "model": self.generation_model_id,
+            "messages": chat_history,
+            "options": {
+                "num_predict":max_tokens,
+                "temperature":temp
+            }
+        }
+    
+    def parse_generation_response(self, response) -> str:
+        
         if response is None:
             logging.error(f"Failed to get response from Ollama {self.generation_model_id} model.")
             return None 
@@ -80,7 +135,45 @@ class OllamaProvider(LLMInterface):
     def process_text(self, text: str) -> str:
         return text[:self.default_input_max_characters].strip()
     
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+    
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.tokenizer.truncate_text(text, max_tokens)
+    
     def embed_text(self, text: Union[str, List[str]], document_type: str = None) -> list[float]:
+        
+        params = self.build_embedding_params(text)
+        if params is None:
+            return None
+
+        try:
+            response = self.client.embed(**params)
+        except Exception as e:
+            self.logger.error(f"Ollama embedding error (host: {self.host}): {e}")
+            return None
+        
+        return self.parse_embedding_response(response)
+    
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None) -> list[float]:
+        
+        params = self.build_embedding_params(text)
+        if params is None:
+            return None
+
+        try:
+            response = await self.run_call(
+                lambda: self.async_client.embed(**params),
+                tokens=sum(self.count_tokens(t) for t in params["input"]),
+                kind="embedding"
+            )
+        except Exception as e:
+            self.logger.error(f"Ollama embedding error (host: {self.host}): {e}")
+            raise
+        
+        return self.parse_embedding_response(response)
+    
+    def build_embedding_params(self, text: Union[str, List[str]]) -> dict:
         if not self.embedding_model_id:
             self.logger.error("Embedding model is not set.")
             return None
@@ -97,19 +190,11 @@ class OllamaProvider(LLMInterface):
         # If self.embedding_size is set, we pass it to shorten the vector.
         if self.embedding_size:
             params["dimensions"] = self.embedding_size
-
-        try:
-            response = self.client.embed(**params)
-            
-            if not response or 'embeddings' not in response or not response['embeddings']:
-                return None
-            
-            print(f"Raw embedding result from Ollama: {response}")
-            vectors = [response['embeddings'][i]['embedding'] for i in range(len(response['embeddings']))]
-            
-            return vectors
         
-        except Exception as e:
-            self.logger.error(f"Ollama embedding error (host: {self.host}): {e}")
-            return None
+        return params
     
+    def parse_embedding_response(self, response) -> list:
+        if not response or 'embeddings' not in response or not response['embeddings']:
+            return None
+        
+        return list(response['embeddings'])
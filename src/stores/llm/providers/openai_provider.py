@@ -1,15 +1,18 @@
 from ..llm_interface import LLMInterface
 from ..llm_enums import OpenAIEnums
-from openai import OpenAI
+from ..llm_tokenizer import get_tiktoken_tokenizer, ApproximateTokenizer
+from openai import OpenAI, AsyncOpenAI
 import logging
 from typing import Union, List
+from contextlib import aclosing
 
 class OpenAIProvider(LLMInterface):
     
     def __init__(self, api_key: str, api_url: str = None,
                  default_input_max_characters: int= 1000,
                  default_output_max_characters: int= 1000,
-                 default_temperature: float = 0.1):
+                 default_temperature: float = 0.1,
+                 max_retries: int = 2):
         
         self.api_key = api_key
         self.api_url = api_url
@@ -22,13 +25,17 @@ class OpenAIProvider(LLMInterface):
         self.embedding_model_id = None
         self.embedding_size = None
 
-        self.client = OpenAI(api_key=self.api_key)
+        # max_retries=0 when the calls go through the scheduler, it retries them itself
+        self.client = OpenAI(api_key=self.api_key, max_retries=max_retries)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, max_retries=max_retries)
         self.enums = OpenAIEnums
+        self.tokenizer = ApproximateTokenizer()
         self.logger = logging.getLogger(__name__)
         
     
     def set_generation_model(self, model_name: str) -> None:
         self.generation_model_id = model_name
+        self.tokenizer = get_tiktoken_tokenizer(model_name)
 
     def set_embedding_model(self, model_name: str, embedding_size: int = None) -> None:
         self.embedding_model_id = model_name
@@ -37,6 +44,56 @@ class OpenAIProvider(LLMInterface):
 
     def generate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
 
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return None
+        
+        try:
+            response = self.client.chat.completions.create(**params)
+        except Exception as e:
+            logging.error(f"Failed to get response from OpenAI: {e}")
+            return None
+        
+        return self.parse_generation_response(response)
+    
+    async def agenerate_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None) -> str:
+
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return None
+        
+        try:
+            response = await self.run_call(
+                lambda: self.async_client.chat.completions.create(**params),
+                tokens=self.count_tokens(str(params["messages"])) + params["max_tokens"]
+            )
+        except Exception as e:
+            logging.error(f"Failed to get response from OpenAI: {e}")
+            raise
+        
+        return self.parse_generation_response(response)
+    
+    async def astream_text(self, prompt: str, chat_history: list = [], max_output_tokens: int = None, temperature: float = None):
+
+        params = self.build_generation_params(prompt, chat_history, max_output_tokens, temperature)
+        if params is None:
+            return
+        
+        async def open_stream():
+            stream = await self.async_client.chat.completions.create(**params, stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        try:
+            async with aclosing(self.run_stream(open_stream, tokens=self.count_tokens(str(params["messages"])) + params["max_tokens"])) as pieces:
+                async for piece in pieces:
+                    yield piece
+        except Exception as e:
+            logging.error(f"Failed to stream response from OpenAI: {e}")
+            raise
+    
+    def build_generation_params(self, prompt: str, chat_history: list, max_output_tokens: int = None, temperature: float = None):
         
         if not self.client:
             logging.error("OpenAI client is not initialized.")
@@ -51,27 +108,55 @@ class OpenAIProvider(LLMInterface):
 
         chat_history.append(self.construct_prompt(prompt, role=OpenAIEnums.USER.value))
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.generation_model_id,
-                messages=chat_history,
-                max_tokens=max_tokens,
-                temperature=temp
-            )
-        except Exception as e:
-            logging.error(f"Failed to get response from OpenAI: {e}")
-            return None
-        
+        return {
+            "model": self.generation_model_id,
+            "messages": chat_history,
+            "max_tokens": max_tokens,
+            "temperature": temp
+        }
+    
+    def parse_generation_response(self, response) -> str:
         
         if response is None:
             logging.error("Failed to get response from OpenAI.")
             return None
         
-        
         return response.choices[0].message.content  
 
     
     def embed_text(self, text: Union[str, List[str]], document_type: str = None):
+        
+        params = self.build_embedding_params(text)
+        if params is None:
+            return None
+
+        try:
+            response = self.client.embeddings.create(**params)
+        except Exception as e:
+            self.logger.error(f"OpenAI embedding error: {e}")
+            return None
+        
+        return self.parse_embedding_response(response)
+    
+    async def aembed_text(self, text: Union[str, List[str]], document_type: str = None):
+        
+        params = self.build_embedding_params(text)
+        if params is None:
+            return None
+
+        try:
+            response = await self.run_call(
+                lambda: self.async_client.embeddings.create(**params),
+                tokens=sum(self.count_tokens(t) for t in params["input"]),
+                kind="embedding"
+            )
+        except Exception as e:
+            self.logger.error(f"OpenAI embedding error: {e}")
+            raise
+        
+        return self.parse_embedding_response(response)
+    
+    def build_embedding_params(self, text: Union[str, List[str]]):
         if not self.embedding_model_id:
             self.logger.error("Embedding model is not set.")
             return None
@@ -89,19 +174,14 @@ class OpenAIProvider(LLMInterface):
         # If self.embedding_size is set, we pass it to shorten the vector.
         if self.embedding_size:
             params["dimensions"] = self.embedding_size
-
-        try:
-            response = self.client.embeddings.create(**params)
-            
-            if not response or not response.data:
-                return None
-                
-            
-            return [rec.embedding for rec in response.data]
-
-        except Exception as e:
-            self.logger.error(f"OpenAI embedding error: {e}")
+        
+        return params
+    
+    def parse_embedding_response(self, response):
+        if not response or not response.data:
             return None
+        
+        return [rec.embedding for rec in response.data]
 
 
     def construct_prompt(self, prompt: str, role: str) -> dict:
@@ -109,4 +189,10 @@ class OpenAIProvider(LLMInterface):
                 "content": prompt}
 
     def process_text(self, text: str) -> str:
-        return text[:self.default_input_max_characters].strip()
\ No newline at end of file
+        return text[:self.default_input_max_characters].strip()
+    
+    def count_tokens(self, text: str) -> int:
+        return self.tokenizer.count_tokens(text)
+    
+    def truncate_text(self, text: str, max_tokens: int) -> str:
+        return self.tokenizer.truncate_text(text, max_tokens)
\ No newline at end of file
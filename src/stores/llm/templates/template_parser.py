@@ -1,48 +1,172 @@
+from string import Template
+from types import MappingProxyType
+import importlib.util
+import logging
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledTemplate:
+    """A string.Template split once into its literal parts and placeholder names, rendered with a single join."""
+
+    def __init__(self, template: Template):
+        self.template = template
+        literals, names = [], []
+        text, last_end, literal = template.template, 0, ""
+        for match in template.pattern.finditer(text):
+            literal += text[last_end:match.start()]
+            last_end = match.end()
+            if match.group("escaped") is not None:
+                literal += template.delimiter
+            elif match.group("invalid") is not None:
+                # keep string.Template's error, raised when it is rendered
+                literals, names = None, None
+                break
+            else:
+                literals.append(literal)
+                names.append(match.group("named") or match.group("braced"))
+                literal = ""
+        if literals is not None:
+            literals.append(literal + text[last_end:])
+        self.literals = tuple(literals) if literals is not None else None
+        self.names = tuple(names) if names is not None else None
+
+    def substitute(self, vars: dict) -> str:
+        if self.literals is None:
+            return self.template.substitute(vars)
+        if not self.names:
+            return self.literals[0]
+        pieces = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            pieces.append(str(vars[name]))
+            pieces.append(literal)
+        return "".join(pieces)
 
 
 class TemplateParser:
+    """
+    Prompt templates of the locales/<language>/<group>.py modules, all loaded and compiled at startup.
+    Lookups go through an immutable (group, key) -> template mapping of the current language, falling back
+    to the default language. With hot_reload, the template files are checked for changes at most every
+    reload_interval_seconds and the registry is swapped when one changed.
+    """
+
+    def __init__(self, language: str=None, default_language="en", hot_reload: bool=False,
+                 reload_interval_seconds: float=2.0):
 
-    def __init__(self, language: str=None, default_language="en"):
-        
         self.current_path = os.path.dirname(os.path.abspath(__file__))
+        self.locales_path = os.path.join(self.current_path, "locales")
         self.default_language = default_language
         self.language = language
-        
+        self.hot_reload = hot_reload
+        self.reload_interval_seconds = reload_interval_seconds
+        self.reload_lock = threading.Lock()
+        self.next_reload_check = 0.0
+
+        self.files_state = None
+        # language -> group -> key -> CompiledTemplate
+        self.registry = MappingProxyType({})
+        # (group, key) -> CompiledTemplate of the current language
+        self.templates = MappingProxyType({})
+        self.reload()
+
+    def get_files_state(self) -> dict:
+        """(language, group) -> (mtime, size) of the template files."""
+        files_state = {}
+        if not os.path.isdir(self.locales_path):
+            return files_state
+        for language_entry in os.scandir(self.locales_path):
+            if not language_entry.is_dir() or language_entry.name.startswith(("_", ".")):
+                continue
+            for group_entry in os.scandir(language_entry.path):
+                if group_entry.is_file() and group_entry.name.endswith(".py") and not group_entry.name.startswith("_"):
+                    stat = group_entry.stat()
+                    files_state[(language_entry.name, group_entry.name[:-3])] = (stat.st_mtime_ns, stat.st_size)
+        return files_state
+
+    def load_group(self, language: str, group: str) -> dict:
+        # executed from the file each time (not through the import cache) so edited templates are picked up
+        group_path = os.path.join(self.locales_path, language, group + ".py")
+        spec = importlib.util.spec_from_file_location(f"stores.llm.templates.locales.{language}.{group}", group_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return {
+            key: CompiledTemplate(value)
+            for key, value in vars(module).items()
+            if isinstance(value, Template)
+        }
+
+    def reload(self) -> bool:
+        """Load all the template files into a new registry. The current one is kept if a file fails to load."""
+        files_state = self.get_files_state()
+        registry = {}
+        try:
+            for language, group in sorted(files_state):
+                registry.setdefault(language, {})[group] = MappingProxyType(self.load_group(language, group))
+        except Exception as e:
+            logger.error("Error loading the prompt templates, keeping the previous ones: %s", str(e))
+            self.files_state = files_state
+            return False
+
+        self.registry = MappingProxyType({language: MappingProxyType(groups) for language, groups in registry.items()})
+        self.files_state = files_state
+        self.set_language(self.language)
+        return True
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now < self.next_reload_check or not self.reload_lock.acquire(blocking=False):
+            return
+        try:
+            self.next_reload_check = now + self.reload_interval_seconds
+            if self.get_files_state() != self.files_state:
+                logger.info("Prompt template files changed, reloading them")
+                self.reload()
+        finally:
+            self.reload_lock.release()
+
     def set_language(self, language: str):
         if not language:
             language = self.default_language
-            
-        language_path = os.path.join(self.current_path, "locales", language)
-        if language and os.path.exists(language_path):
+
+        if language and language in self.registry:
             self.language = language
         else:
             self.language = self.default_language
-            
-    
+
+        templates = {}
+        for language in (self.default_language, self.language):
+            for group, group_templates in self.registry.get(language, {}).items():
+                templates.update({(group, key): template for key, template in group_templates.items()})
+        self.templates = MappingProxyType(templates)
+
+    def get_template(self, group: str, key: str):
+        if self.hot_reload:
+            self.reload_if_changed()
+        return self.templates.get((group, key))
+
     def get(self, group: str, key: str, vars: dict={}):
-        
+
         if not group or not key:
             return None
-        
-        group_path = os.path.join(self.current_path, "locales", self.language, group + ".py")
-        targeted_language = self.language
-        if not os.path.exists(group_path):
-            group_path = os.path.join(self.current_path, "locales", self.default_language, group + ".py")
-            targeted_language = self.default_language
-        
-        if not os.path.exists(group_path):
+
+        template = self.get_template(group, key)
+        if template is None:
             return None
-        
-        # import group module
-        module = __import__(f"stores.llm.templates.locales.{targeted_language}.{group}", fromlist=[group])
-        
-        if not module:
+
+        return template.substitute(vars)
+
+    def render_many(self, group: str, key: str, vars_list: list, separator: str="\n"):
+        """Render the same template for each vars of vars_list and join them, e.g. the documents block of a prompt."""
+
+        if not group or not key:
             return None
-        
-        # get function
-        key_attribute = getattr(module, key)
-        
-        # call function
-        return key_attribute.substitute(vars)
-    
\ No newline at end of file
+
+        template = self.get_template(group, key)
+        if template is None:
+            return None
+
+        return separator.join([template.substitute(vars) for vars in vars_list])
@@ -1,3 +1,4 @@
 from .qdrant_db_provider import QdrantDBProvider
 from .pgvector_db_provider import PgVectorDBProvider
+from .pgvector_partitioned_db_provider import PgVectorPartitionedDBProvider
 
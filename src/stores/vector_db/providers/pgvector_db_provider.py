@@ -1,29 +1,83 @@
 from ..vector_db_interface import VectorDBInterface
-from ..vector_db_enums import PgVectorTableSchemaEnum, PgVectorDistanceMethodEnum, PgVectorIndexTypeEnum, DistanceMetric
+from ..vector_db_enums import PgVectorTableSchemaEnum, PgVectorDistanceMethodEnum, PgVectorDistanceOperatorEnum, PgVectorIndexTypeEnum, DistanceMetric, SearchFilterOperatorEnum
+from ..vector_db_filter import parse_search_filter, FILTER_KEY_PATTERN, ASSET_FILTER_KEY
 from models.db_schemes import RetrievedDocument
 import logging
 from typing import List
 from sqlalchemy.sql import text as sql_text
+import asyncio
 import json
+import math
+import struct
+
+
+def encode_vector(value) -> bytes:
+    """pgvector binary format: dim (int16), unused (int16), dim x float32, big endian."""
+    if isinstance(value, str):
+        # keep accepting the '[1.0,2.0,...]' text literals
+        value = [float(v) for v in value.strip("[]").split(",")]
+    return struct.pack(f">HH{len(value)}f", len(value), 0, *value)
+
+
+def decode_vector(data: bytes) -> list:
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
 
 class PgVectorDBProvider(VectorDBInterface):
     def __init__(self, db_client, default_vector_dimension: int = 768,
-                 default_distance_method: str = None, index_threshold: int = 1000):
+                 default_distance_method: str = None, index_threshold: int = 1000,
+                 index_type: str = PgVectorIndexTypeEnum.HNSW.value, hnsw_m: int = 16,
+                 hnsw_ef_construction: int = 64, ivfflat_lists: int = 0,
+                 search_profiles: dict = None, default_search_profile: str = None,
+                 filter_indexed_keys: dict = None, iterative_scan: str = None,
+                 text_search_config: str = "simple", hybrid_candidates: int = 50, rrf_k: int = 60,
+                 vector_weight: float = 1.0, lexical_weight: float = 1.0):
         self.db_client = db_client
         self.default_vector_dimension = default_vector_dimension
         
-        if default_distance_method == DistanceMetric.COSINE.value:
-            default_distance_method = PgVectorDistanceMethodEnum.COSINE.value
+        # the index opclass and the ORDER BY operator must match, otherwise postgres can't use the index
+        if default_distance_method == DistanceMetric.EUCLIDEAN.value:
+            distance_metric = DistanceMetric.EUCLIDEAN
         elif default_distance_method == DistanceMetric.DOT_PRODUCT.value:
-            default_distance_method = PgVectorDistanceMethodEnum.DOT_PRODUCT.value
+            distance_metric = DistanceMetric.DOT_PRODUCT
+        else:
+            distance_metric = DistanceMetric.COSINE
             
-        self.default_distance_method = default_distance_method
+        self.distance_metric = distance_metric
+        self.default_distance_method = PgVectorDistanceMethodEnum[distance_metric.name].value
+        self.distance_operator = PgVectorDistanceOperatorEnum[distance_metric.name].value
         self.index_threshold = index_threshold
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.ivfflat_lists = ivfflat_lists
+        # accuracy profile name -> {"hnsw_ef_search", "ivfflat_probes", "exact"}
+        self.search_profiles = search_profiles or {}
+        self.default_search_profile = default_search_profile
+        # metadata keys filtered on often, each gets a btree expression index (the GIN index covers equality on any key)
+        self.filter_indexed_keys = [key for key in (filter_indexed_keys or {}) if FILTER_KEY_PATTERN.match(key)]
+        # hnsw.iterative_scan mode (pgvector >= 0.8), keeps scanning the index until top_k rows pass the filter
+        self.iterative_scan = iterative_scan if iterative_scan in ("strict_order", "relaxed_order") else None
+        # hybrid search: postgres text search configuration of the tsvector column, candidates taken from
+        # each of the vector and full-text rankings, and the reciprocal rank fusion constant and default weights
+        self.text_search_config = text_search_config if FILTER_KEY_PATTERN.match(text_search_config or "") else "simple"
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        # background index builds (collection_name -> task) and collections being bulk loaded (-> nesting count)
+        self.index_tasks = {}
+        self.bulk_loads = {}
         
         self.pgvector_table_prefix = PgVectorTableSchemaEnum._PREFIX.value
         self.logger = logging.getLogger("uvicorn")
         self.default_index_name = lambda collection_name: f"{collection_name}_vector_idx"
         
+        # collection_name -> {"dimension", "row_count", "has_index"} for the collections known to exist,
+        # kept up to date by create/drop/insert/delete so the hot paths skip the catalog queries
+        self.collections_cache = {}
+        
     async def connect(self):
         async with self.db_client() as session:
             async with session.begin():
@@ -38,16 +92,79 @@ class PgVectorDBProvider(VectorDBInterface):
         self.logger.info("Ensured vector extension is available.")
     
     async def disconnect(self):
-        pass
+        for task in self.index_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.index_tasks.values(), return_exceptions=True)
+        self.index_tasks = {}
     
-    async def is_collection_exists(self, collection_name: str) -> bool:
-        record = None
+    async def get_copy_connection(self, session):
+        """Return the asyncpg connection of the session, with the binary vector codec registered."""
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        if not raw_connection.info.get("pgvector_binary_codec"):
+            await raw_connection.driver_connection.set_type_codec(
+                "vector", schema="public", encoder=encode_vector, decoder=decode_vector, format="binary"
+            )
+            raw_connection.info["pgvector_binary_codec"] = True
+        return raw_connection.driver_connection
+    
+    async def get_collection_metadata(self, collection_name: str) -> dict:
+        """Cached metadata of an existing collection, loaded from the catalog on first use. None if it doesn't exist."""
+        metadata = self.collections_cache.get(collection_name)
+        if metadata is not None:
+            return metadata
+        
         async with self.db_client() as session:
-            async with session.begin():
-                list_tables = sql_text("SELECT * FROM pg_tables WHERE tablename = :collection_name")
-                results = await session.execute(list_tables, {"collection_name": collection_name})
-                record = results.scalar_one_or_none()
-            return record
+            metadata_sql = sql_text(f"""
+                SELECT c.reltuples::BIGINT AS row_estimate,
+                       a.atttypmod AS dimension,
+                       EXISTS (
+                           -- an interrupted CREATE INDEX CONCURRENTLY leaves an invalid index behind
+                           SELECT 1 FROM pg_index i JOIN pg_class ic ON ic.oid = i.indexrelid
+                           WHERE ic.relname = :index_name AND i.indisvalid
+                       ) AS has_index,
+                       EXISTS (
+                           SELECT 1 FROM pg_attribute ta
+                           WHERE ta.attrelid = c.oid AND ta.attname = '{PgVectorTableSchemaEnum.TEXT_SEARCH.value}'
+                       ) AS has_text_search
+                FROM pg_class c
+                LEFT JOIN pg_attribute a
+                    ON a.attrelid = c.oid AND a.attname = '{PgVectorTableSchemaEnum.VECTOR.value}'
+                WHERE c.relname = :collection_name AND c.relkind IN ('r', 'p')
+            """)
+            result = await session.execute(metadata_sql, {
+                "collection_name": collection_name,
+                "index_name": self.default_index_name(collection_name)
+            })
+            record = result.first()
+            if record is None:
+                return None
+            
+            row_count = record.row_estimate
+            if row_count < 0:
+                # never analyzed, count it once
+                count_sql = sql_text(f"SELECT COUNT(*) FROM {collection_name}")
+                row_count = (await session.execute(count_sql)).scalar_one()
+        
+        metadata = {
+            "dimension": record.dimension,
+            "row_count": row_count,
+            "has_index": record.has_index,
+            "has_text_search": record.has_text_search
+        }
+        self.collections_cache[collection_name] = metadata
+        return metadata
+    
+    def invalidate_collection_metadata(self, collection_name: str):
+        self.collections_cache.pop(collection_name, None)
+    
+    def update_row_count(self, collection_name: str, delta: int):
+        metadata = self.collections_cache.get(collection_name)
+        if metadata is not None:
+            metadata["row_count"] = max(metadata["row_count"] + delta, 0)
+    
+    async def is_collection_exists(self, collection_name: str) -> bool:
+        return await self.get_collection_metadata(collection_name) is not None
     
     async def list_all_collections(self) -> List:
         records = []
@@ -86,11 +203,15 @@ class PgVectorDBProvider(VectorDBInterface):
         if not await self.is_collection_exists(collection_name):
             self.logger.warning("Collection %s does not exist. Cannot delete.", collection_name)
             return False 
+        task = self.index_tasks.pop(collection_name, None)
+        if task is not None:
+            task.cancel()
         async with self.db_client() as session:
             async with session.begin():
                 delete_sql = sql_text(f"DROP TABLE IF EXISTS {collection_name}")
                 await session.execute(delete_sql)
                 await session.commit()
+        self.invalidate_collection_metadata(collection_name)
         return True
     
     async def create_collection(self, collection_name: str, dimension: int, do_reset: bool = False) -> bool:
@@ -109,73 +230,184 @@ class PgVectorDBProvider(VectorDBInterface):
                             {PgVectorTableSchemaEnum.VECTOR.value} VECTOR({dimension}),
                             {PgVectorTableSchemaEnum.METADATA.value} JSONB DEFAULT '{{}}',
                             {PgVectorTableSchemaEnum.CHUNK_ID.value} INTEGER,
+                            {self.get_text_search_column_sql()},
                             FOREIGN KEY ({PgVectorTableSchemaEnum.CHUNK_ID.value}) REFERENCES chunks(chunk_id) ON DELETE CASCADE
                         )
                     """)
                     await session.execute(create_table_sql)
+                    for create_index_sql in self.get_filter_indexes_sql(collection_name) + [self.get_text_search_index_sql(collection_name)]:
+                        await session.execute(sql_text(create_index_sql))
                     await session.commit()
+            self.collections_cache[collection_name] = {"dimension": dimension, "row_count": 0, "has_index": False,
+                                                       "has_text_search": True}
             return True
         return False
 
+    def get_filter_indexes_sql(self, table_name: str) -> List[str]:
+        """Indexes serving the search filters: GIN for metadata @> (equality, in), btree per indexed key for ranges."""
+        metadata_column = PgVectorTableSchemaEnum.METADATA.value
+        return [
+            f"CREATE INDEX IF NOT EXISTS {table_name}_metadata_idx ON {table_name} USING gin ({metadata_column} jsonb_path_ops)"
+        ] + [
+            f"CREATE INDEX IF NOT EXISTS {table_name}_{key}_idx ON {table_name} (({metadata_column} -> '{key}'))"
+            for key in self.filter_indexed_keys
+        ]
+    
+    def get_text_search_column_sql(self) -> str:
+        # stored generated column, filled by postgres on every insert (COPY included)
+        return (
+            f"{PgVectorTableSchemaEnum.TEXT_SEARCH.value} tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector('{self.text_search_config}', coalesce({PgVectorTableSchemaEnum.TEXT.value}, ''))) STORED"
+        )
+    
+    def get_text_search_index_sql(self, table_name: str) -> str:
+        return (
+            f"CREATE INDEX IF NOT EXISTS {table_name}_text_search_idx ON {table_name} "
+            f"USING gin ({PgVectorTableSchemaEnum.TEXT_SEARCH.value})"
+        )
+    
     async def is_index_exists(self, collection_name: str) -> bool:
         index_name = self.default_index_name(collection_name)
         async with self.db_client() as session:
             async with session.begin():
                 index_info_sql = sql_text("""
                     SELECT 1
-                    FROM pg_indexes
-                    WHERE tablename = :collection_name 
-                    AND indexname = :index_name
+                    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = :index_name AND i.indisvalid
                 """)
-                result = await session.execute(index_info_sql, {"collection_name": collection_name, "index_name": index_name})
+                result = await session.execute(index_info_sql, {"index_name": index_name})
                 index_info = result.scalar_one_or_none()
                 return bool(index_info)
         
+    def get_index_options_sql(self, index_type: str, row_count: int) -> str:
+        if index_type == PgVectorIndexTypeEnum.IVFFLAT.value:
+            # pgvector guideline: rows / 1000 lists up to 1M rows, sqrt(rows) above
+            lists = self.ivfflat_lists or (max(row_count // 1000, 1) if row_count <= 1_000_000 else int(math.sqrt(row_count)))
+            return f"WITH (lists = {lists})"
+        return f"WITH (m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction})"
+    
     async def create_vector_index(self, collection_name: str, 
-                                  index_type: str = PgVectorIndexTypeEnum.HNSW.value) -> bool:
+                                  index_type: str = None) -> bool:
+        """
+        Start building the vector index in the background once the collection crosses index_threshold.
+        Nothing is started while a bulk load is running on the collection (see begin_bulk_load).
+        Returns True if a build was started.
+        """
+        # decided from the cached metadata, no catalog query or full count per insert
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None or metadata["has_index"] or metadata["row_count"] < self.index_threshold:
+            return False
         
-        is_index_exists = await self.is_index_exists(collection_name)
-        if is_index_exists:
+        if self.bulk_loads.get(collection_name) or collection_name in self.index_tasks:
             return False
         
-        async with self.db_client() as session:
-            async with session.begin():
-                count_sql = sql_text(f"SELECT COUNT(*) FROM {collection_name}")
-                result = await session.execute(count_sql)
-                count = result.scalar_one()
-                if count < self.index_threshold:
-                    return False
-                
-                self.logger.info("Creating vector index for collection %s with index type %s", collection_name, index_type)
+        task = asyncio.create_task(self.build_vector_index(collection_name, index_type or self.index_type))
+        self.index_tasks[collection_name] = task
+        task.add_done_callback(
+            lambda done_task: self.index_tasks.pop(collection_name, None) if self.index_tasks.get(collection_name) is done_task else None
+        )
+        return True
+    
+    async def build_vector_index(self, collection_name: str, index_type: str = None) -> bool:
+        """Build the vector index with CREATE INDEX CONCURRENTLY, so inserts and searches keep running meanwhile."""
+        index_type = index_type or self.index_type
+        index_name = self.default_index_name(collection_name)
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            return False
+        
+        try:
+            async with self.db_client() as session:
+                # CONCURRENTLY can't run inside a transaction block
+                connection = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
                 
-                index_name = self.default_index_name(collection_name)
-                create_index_sql = sql_text(f"""
-                    CREATE INDEX {index_name} ON {collection_name}
-                    USING {index_type} ({PgVectorTableSchemaEnum.VECTOR.value} {self.default_distance_method});
+                index_valid_sql = sql_text("""
+                    SELECT i.indisvalid
+                    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = :index_name
                 """)
-                await session.execute(create_index_sql)
-                await session.commit()
+                is_valid = (await connection.execute(index_valid_sql, {"index_name": index_name})).scalar_one_or_none()
+                if is_valid is False:
+                    # left behind by an interrupted concurrent build
+                    await connection.execute(sql_text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
                 
-                self.logger.info("End creating vector index for collection %s with index type %s", collection_name, index_type)
+                if is_valid is not True:
+                    self.logger.info("Creating vector index for collection %s with index type %s", collection_name, index_type)
+                    create_index_sql = sql_text(f"""
+                        CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {collection_name}
+                        USING {index_type} ({PgVectorTableSchemaEnum.VECTOR.value} {self.default_distance_method})
+                        {self.get_index_options_sql(index_type, metadata["row_count"])}
+                    """)
+                    await connection.execute(create_index_sql)
+                    self.logger.info("End creating vector index for collection %s with index type %s", collection_name, index_type)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error("Error creating vector index for collection %s: %s", collection_name, str(e))
+            return False
+        
+        metadata["has_index"] = True
         return True
     
     async def reset_vector_index(self, collection_name: str, 
-                                 index_type: str = PgVectorIndexTypeEnum.HNSW.value) -> bool:
-        is_index_exists = await self.is_index_exists(collection_name)
-        if is_index_exists:
-            async with self.db_client() as session:
-                async with session.begin():
-                    index_name = self.default_index_name(collection_name)
-                    drop_index_sql = sql_text("""
-                        DROP INDEX IF EXISTS :index_name
-                    """)
-                    await session.execute(drop_index_sql, {"index_name": index_name})
-                    await session.commit()
-            self.logger.info("Dropped existing index %s for collection %s", index_name, collection_name)
+                                 index_type: str = None) -> bool:
+        """Drop the vector index and rebuild it in the background (e.g. after changing the index parameters)."""
+        task = self.index_tasks.pop(collection_name, None)
+        if task is not None:
+            task.cancel()
+        
+        index_name = self.default_index_name(collection_name)
+        async with self.db_client() as session:
+            connection = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            # identifiers can't be bound as parameters, the index name is built from the collection name
+            await connection.execute(sql_text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+        self.logger.info("Dropped existing index %s for collection %s", index_name, collection_name)
+        
+        self.invalidate_collection_metadata(collection_name)
+        return await self.create_vector_index(collection_name, index_type)
+    
+    async def begin_bulk_load(self, collection_name: str):
+        """Defer the index build of the collection until the matching end_bulk_load."""
+        self.bulk_loads[collection_name] = self.bulk_loads.get(collection_name, 0) + 1
+    
+    async def end_bulk_load(self, collection_name: str) -> bool:
+        remaining = self.bulk_loads.get(collection_name, 0) - 1
+        if remaining > 0:
+            self.bulk_loads[collection_name] = remaining
+            return False
+        self.bulk_loads.pop(collection_name, None)
+        return await self.create_vector_index(collection_name)
+    
+    async def get_index_build_progress(self, collection_name: str) -> dict:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            return None
+        
+        async with self.db_client() as session:
+            progress_sql = sql_text("""
+                SELECT p.phase, p.blocks_total, p.blocks_done, p.tuples_total, p.tuples_done
+                FROM pg_stat_progress_create_index p JOIN pg_class c ON c.oid = p.relid
+                WHERE c.relname = :collection_name
+            """)
+            record = (await session.execute(progress_sql, {"collection_name": collection_name})).first()
         
-        created = await self.create_vector_index(collection_name, index_type)
-        return created
+        if record is not None:
+            status = "building"
+        elif metadata["has_index"] or await self.is_index_exists(collection_name):
+            metadata["has_index"] = True
+            status = "ready"
+        elif collection_name in self.index_tasks:
+            status = "pending"
+        else:
+            status = "not_indexed"
         
+        return {
+            "status": status,
+            "row_count": metadata["row_count"],
+            "index_threshold": self.index_threshold,
+            **(dict(record._mapping) if record is not None else {})
+        }
+    
     async def insert_one(self, collection_name: str,
                          text: str,
                          vector: List[float],
@@ -203,6 +435,7 @@ class PgVectorDBProvider(VectorDBInterface):
                     "chunk_id": record_id
                 })
                 await session.commit()
+        self.update_row_count(collection_name, 1)
         await self.create_vector_index(collection_name)
         return True
     
@@ -225,66 +458,373 @@ class PgVectorDBProvider(VectorDBInterface):
         if not metadatas or len(metadatas) == 0:
             metadatas = [None] * len(texts)
         
+        try:
+            async with self.db_client() as session:
+                async with session.begin():
+                    copy_connection = await self.get_copy_connection(session)
+                    for i in range(0, len(texts), batch_size):
+                        records = [
+                            (_text, _vector, json.dumps(_metadata) if _metadata else None, _chunk_id)
+                            for _text, _vector, _metadata, _chunk_id in zip(
+                                texts[i:i+batch_size], vectors[i:i+batch_size],
+                                metadatas[i:i+batch_size], record_ids[i:i+batch_size]
+                            )
+                        ]
+                        await copy_connection.copy_records_to_table(
+                            collection_name,
+                            records=records,
+                            columns=[
+                                PgVectorTableSchemaEnum.TEXT.value,
+                                PgVectorTableSchemaEnum.VECTOR.value,
+                                PgVectorTableSchemaEnum.METADATA.value,
+                                PgVectorTableSchemaEnum.CHUNK_ID.value
+                            ]
+                        )
+        except Exception as e:
+            # the table may have been dropped by another process, reload its metadata next time
+            self.invalidate_collection_metadata(collection_name)
+            self.logger.error("Error inserting into collection %s: %s", collection_name, str(e))
+            raise
+        
+        self.update_row_count(collection_name, len(texts))
+        await self.create_vector_index(collection_name)
+        
+        return True
+    
+    async def get_existing_record_ids(self, collection_name: str, record_ids: List) -> set:
+        if not record_ids or not await self.is_collection_exists(collection_name):
+            return set()
+        
+        async with self.db_client() as session:
+            select_sql = sql_text(f"""
+                SELECT {PgVectorTableSchemaEnum.CHUNK_ID.value} FROM {collection_name}
+                WHERE {PgVectorTableSchemaEnum.CHUNK_ID.value} = ANY(:record_ids)
+            """)
+            result = await session.execute(select_sql, {"record_ids": list(record_ids)})
+            return set(result.scalars().all())
+    
+    async def delete_by_record_ids(self, collection_name: str, record_ids: List) -> bool:
+        if not record_ids or not await self.is_collection_exists(collection_name):
+            return False
+        
         async with self.db_client() as session:
             async with session.begin():
-                batch_insert_sql = sql_text(f"""
-                    INSERT INTO "{collection_name}" (
-                        {PgVectorTableSchemaEnum.TEXT.value},
-                        {PgVectorTableSchemaEnum.VECTOR.value}, 
-                        {PgVectorTableSchemaEnum.METADATA.value}, 
-                        {PgVectorTableSchemaEnum.CHUNK_ID.value})
-                    VALUES (:text, :vector, :metadata, :chunk_id)
+                delete_sql = sql_text(f"""
+                    DELETE FROM {collection_name}
+                    WHERE {PgVectorTableSchemaEnum.CHUNK_ID.value} = ANY(:record_ids)
                 """)
-                for i in range(0, len(texts), batch_size):
-                    batch_texts = texts[i:i+batch_size]
-                    batch_vectors = vectors[i:i+batch_size]
-                    batch_metadatas = metadatas[i:i+batch_size] if metadatas else [None]*len(batch_texts)
-                    batch_record_ids = record_ids[i:i+batch_size]
-
-                    values = []
-                    for _text, _vector, _metadata, _chunk_id in zip(batch_texts, batch_vectors, batch_metadatas, batch_record_ids):
-                        values.append({
-                            "text": _text,
-                            "vector": "[" + ",".join(map(str, _vector)) + "]",
-                            "metadata": json.dumps(_metadata) if _metadata else None, # Ensure JSON string,
-                            "chunk_id": _chunk_id
-                        })
-                    
-                    await session.execute(batch_insert_sql, values)
-                    
-        await self.create_vector_index(collection_name)
-        
+                result = await session.execute(delete_sql, {"record_ids": list(record_ids)})
+        self.update_row_count(collection_name, -result.rowcount)
         return True
     
     async def search_by_vector(self, collection_name: str,
                          query_vector: List[float],
                          top_k: int= 10,
-                         filter: dict= None) -> List[RetrievedDocument]:
+                         filter: dict= None,
+                         accuracy: str= None) -> List[RetrievedDocument]:
         
-        is_collection_exists = await self.is_collection_exists(collection_name)
-        if not is_collection_exists:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
             self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
             return False
-                
-        async with self.db_client() as session:
-            async with session.begin():
-                search_sql = sql_text(f"""
-                    SELECT {PgVectorTableSchemaEnum.TEXT.value} as text, 1 - ({PgVectorTableSchemaEnum.VECTOR.value} <=> :vector) as score
-                    FROM "{collection_name}"
-                    ORDER BY score DESC
-                    LIMIT :top_k
-                """)
-                results = await session.execute(search_sql, {
-                    "vector": "[" + ",".join(map(str, query_vector)) + "]",
-                    "top_k": top_k
-                })
-                records = results.fetchall()
+        
+        try:
+            async with self.db_client() as session:
+                async with session.begin():
+                    search_sql, params = await self.prepare_search(session, collection_name, metadata, query_vector,
+                                                                   top_k, filter, accuracy)
+                    results = await session.execute(sql_text(search_sql), params)
+                    records = results.fetchall()
+        except Exception as e:
+            # the table may have been dropped by another process, reload its metadata next time
+            self.invalidate_collection_metadata(collection_name)
+            self.logger.error("Error searching collection %s: %s", collection_name, str(e))
+            raise
             
         return [
             RetrievedDocument(**{
+                "chunk_id": record.chunk_id,
+                "text": record.text,
+                "score": record.score
+            })
+            for record in records
+        ]
+    
+    async def prepare_search(self, session, collection_name: str, metadata: dict, query_vector: List[float],
+                             top_k: int, filter: dict = None, accuracy: str = None) -> tuple:
+        """
+        SET LOCAL the search parameters in the session transaction and return (sql, params) of the ann query.
+        Also used by benchmarks/pgvector_explain.py to check its plan.
+        """
+        await self.apply_search_params(session, accuracy, top_k)
+        table_sql, predicates, params = self.get_search_scope(collection_name, metadata)
+        filter_sql, filter_params = self.get_filter_sql(filter)
+        if filter_sql:
+            predicates = predicates + [filter_sql]
+        if predicates and self.iterative_scan:
+            # without it the index returns ef_search candidates and the filter can leave fewer than top_k
+            await session.execute(sql_text(f"SET LOCAL hnsw.iterative_scan = {self.iterative_scan}"))
+        
+        distance_sql = f"{PgVectorTableSchemaEnum.VECTOR.value} {self.distance_operator} :vector"
+        # order by the raw distance operator (ascending) so the hnsw/ivfflat index is used
+        search_sql = f"""
+            SELECT {PgVectorTableSchemaEnum.CHUNK_ID.value} as chunk_id, {PgVectorTableSchemaEnum.TEXT.value} as text,
+                   {self.get_score_sql(distance_sql)} as score
+            FROM {table_sql}
+            {("WHERE " + " AND ".join(predicates)) if predicates else ""}
+            ORDER BY {distance_sql}
+            LIMIT :top_k
+        """
+        return search_sql, {
+            "vector": "[" + ",".join(map(str, query_vector)) + "]",
+            "top_k": top_k,
+            **params,
+            **filter_params
+        }
+    
+    def get_search_scope(self, collection_name: str, metadata: dict) -> tuple:
+        """(table, predicates, params) selecting the rows of a collection."""
+        return f'"{collection_name}"', [], {}
+    
+    async def search_by_vectors(self, collection_name: str,
+                                query_vectors: List[List[float]],
+                                top_k: int= 10,
+                                filter: dict= None,
+                                accuracy: str= None) -> List[List[RetrievedDocument]]:
+        """All the queries in one statement: a LATERAL top_k index scan for each row of a VALUES list of vectors."""
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
+            return False
+        
+        if not query_vectors:
+            return []
+        
+        distance_sql = f"{PgVectorTableSchemaEnum.VECTOR.value} {self.distance_operator} queries.query_vector"
+        
+        try:
+            async with self.db_client() as session:
+                async with session.begin():
+                    await self.apply_search_params(session, accuracy, top_k)
+                    table_sql, predicates, params = self.get_search_scope(collection_name, metadata)
+                    filter_sql, filter_params = self.get_filter_sql(filter)
+                    if filter_sql:
+                        predicates = predicates + [filter_sql]
+                    if predicates and self.iterative_scan:
+                        await session.execute(sql_text(f"SET LOCAL hnsw.iterative_scan = {self.iterative_scan}"))
+                    
+                    values_sql = ", ".join(
+                        f"({query_no}, CAST(:query_vector_{query_no} AS vector))" for query_no in range(len(query_vectors))
+                    )
+                    search_sql = sql_text(f"""
+                        SELECT queries.query_no AS query_no, hits.chunk_id AS chunk_id, hits.text AS text, hits.score AS score
+                        FROM (VALUES {values_sql}) AS queries (query_no, query_vector)
+                        CROSS JOIN LATERAL (
+                            SELECT {PgVectorTableSchemaEnum.CHUNK_ID.value} AS chunk_id, {PgVectorTableSchemaEnum.TEXT.value} AS text,
+                                   {self.get_score_sql(distance_sql)} AS score
+                            FROM {table_sql}
+                            {("WHERE " + " AND ".join(predicates)) if predicates else ""}
+                            ORDER BY {distance_sql}
+                            LIMIT :top_k
+                        ) AS hits
+                        ORDER BY queries.query_no, hits.score DESC
+                    """)
+                    results = await session.execute(search_sql, {
+                        **{
+                            f"query_vector_{query_no}": "[" + ",".join(map(str, query_vector)) + "]"
+                            for query_no, query_vector in enumerate(query_vectors)
+                        },
+                        "top_k": top_k,
+                        **params,
+                        **filter_params
+                    })
+                    records = results.fetchall()
+        except Exception as e:
+            self.invalidate_collection_metadata(collection_name)
+            self.logger.error("Error in batch search of collection %s: %s", collection_name, str(e))
+            raise
+        
+        results = [[] for _ in query_vectors]
+        for record in records:
+            results[record.query_no].append(RetrievedDocument(**{
+                "chunk_id": record.chunk_id,
+                "text": record.text,
+                "score": record.score
+            }))
+        return results
+    
+    async def hybrid_search(self, collection_name: str,
+                            query_text: str,
+                            query_vector: List[float],
+                            top_k: int= 10,
+                            filter: dict= None,
+                            accuracy: str= None,
+                            vector_weight: float= None,
+                            lexical_weight: float= None) -> List[RetrievedDocument]:
+        """
+        Vector and full-text search fused with weighted reciprocal rank fusion, in a single query:
+        each side ranks its best hybrid_candidates rows (hnsw/ivfflat index and GIN tsvector index),
+        and a row scores sum(weight / (rrf_k + rank)) over the rankings it appears in.
+        """
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
+            return False
+        
+        if not metadata.get("has_text_search"):
+            # created before hybrid search, the add_collection_text_search migration adds its tsvector column
+            self.logger.warning("Collection %s has no full-text search column, falling back to vector search", collection_name)
+            return await self.search_by_vector(collection_name=collection_name, query_vector=query_vector, top_k=top_k,
+                                               filter=filter, accuracy=accuracy)
+        
+        id_column = PgVectorTableSchemaEnum.ID.value
+        chunk_id_column = PgVectorTableSchemaEnum.CHUNK_ID.value
+        text_column = PgVectorTableSchemaEnum.TEXT.value
+        text_search_column = PgVectorTableSchemaEnum.TEXT_SEARCH.value
+        distance_sql = f"{PgVectorTableSchemaEnum.VECTOR.value} {self.distance_operator} :vector"
+        candidates = max(self.hybrid_candidates, top_k)
+        
+        try:
+            async with self.db_client() as session:
+                async with session.begin():
+                    # the vector side needs candidates rows from the index, not top_k
+                    await self.apply_search_params(session, accuracy, candidates)
+                    table_sql, predicates, params = self.get_search_scope(collection_name, metadata)
+                    filter_sql, filter_params = self.get_filter_sql(filter)
+                    if filter_sql:
+                        predicates = predicates + [filter_sql]
+                    if predicates and self.iterative_scan:
+                        await session.execute(sql_text(f"SET LOCAL hnsw.iterative_scan = {self.iterative_scan}"))
+                    
+                    vector_where_sql = ("WHERE " + " AND ".join(predicates)) if predicates else ""
+                    lexical_where_sql = "WHERE " + " AND ".join([f"{text_search_column} @@ text_query"] + predicates)
+                    
+                    # ts_rank_cd normalization 1 divides by 1 + log(document length), closer to bm25 than the raw rank
+                    hybrid_sql = sql_text(f"""
+                        WITH vector_hits AS (
+                            SELECT {id_column}, {chunk_id_column}, {text_column}, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+                            FROM (
+                                SELECT {id_column}, {chunk_id_column}, {text_column}, {distance_sql} AS distance
+                                FROM {table_sql}
+                                {vector_where_sql}
+                                ORDER BY {distance_sql}
+                                LIMIT :candidates
+                            ) AS vector_candidates
+                        ),
+                        lexical_hits AS (
+                            SELECT {id_column}, {chunk_id_column}, {text_column}, ROW_NUMBER() OVER (ORDER BY lexical_score DESC) AS rank
+                            FROM (
+                                SELECT {id_column}, {chunk_id_column}, {text_column}, ts_rank_cd({text_search_column}, text_query, 1) AS lexical_score
+                                FROM {table_sql}, websearch_to_tsquery('{self.text_search_config}', :query_text) AS text_query
+                                {lexical_where_sql}
+                                ORDER BY lexical_score DESC
+                                LIMIT :candidates
+                            ) AS lexical_candidates
+                        )
+                        SELECT COALESCE(v.{chunk_id_column}, l.{chunk_id_column}) AS chunk_id,
+                               COALESCE(v.{text_column}, l.{text_column}) AS text,
+                               COALESCE(CAST(:vector_weight AS float8) / (CAST(:rrf_k AS integer) + v.rank), 0)
+                               + COALESCE(CAST(:lexical_weight AS float8) / (CAST(:rrf_k AS integer) + l.rank), 0) AS score
+                        FROM vector_hits v FULL OUTER JOIN lexical_hits l ON v.{id_column} = l.{id_column}
+                        ORDER BY score DESC
+                        LIMIT :top_k
+                    """)
+                    results = await session.execute(hybrid_sql, {
+                        "vector": "[" + ",".join(map(str, query_vector)) + "]",
+                        "query_text": query_text,
+                        "candidates": candidates,
+                        "rrf_k": self.rrf_k,
+                        "vector_weight": self.vector_weight if vector_weight is None else vector_weight,
+                        "lexical_weight": self.lexical_weight if lexical_weight is None else lexical_weight,
+                        "top_k": top_k,
+                        **params,
+                        **filter_params
+                    })
+                    records = results.fetchall()
+        except Exception as e:
+            self.invalidate_collection_metadata(collection_name)
+            self.logger.error("Error in hybrid search of collection %s: %s", collection_name, str(e))
+            raise
+        
+        return [
+            RetrievedDocument(**{
+                "chunk_id": record.chunk_id,
                 "text": record.text,
                 "score": record.score
             })
             for record in records
         ]
-                
\ No newline at end of file
+    
+    def get_filter_sql(self, filter: dict) -> tuple:
+        """Translate a search filter (see parse_search_filter) into an sql predicate and its bound parameters."""
+        metadata_column = PgVectorTableSchemaEnum.METADATA.value
+        chunk_id_column = PgVectorTableSchemaEnum.CHUNK_ID.value
+        comparison_operators = {
+            SearchFilterOperatorEnum.GT.value: ">",
+            SearchFilterOperatorEnum.GTE.value: ">=",
+            SearchFilterOperatorEnum.LT.value: "<",
+            SearchFilterOperatorEnum.LTE.value: "<="
+        }
+        
+        predicates, params = [], {}
+        for i, (key, operator, value) in enumerate(parse_search_filter(filter)):
+            param = f"filter_{i}"
+            
+            if key == ASSET_FILTER_KEY:
+                # the asset isn't stored with the vectors, the chunks table (indexed on chunk_asset_id) has it
+                if operator == SearchFilterOperatorEnum.EQ.value:
+                    asset_sql = f"chunk_asset_id = :{param}"
+                elif operator == SearchFilterOperatorEnum.IN.value:
+                    asset_sql = f"chunk_asset_id = ANY(:{param})"
+                else:
+                    asset_sql = f"chunk_asset_id {comparison_operators[operator]} :{param}"
+                predicates.append(f"{chunk_id_column} IN (SELECT chunk_id FROM chunks WHERE {asset_sql})")
+                params[param] = value
+            
+            elif operator == SearchFilterOperatorEnum.EQ.value:
+                predicates.append(f"{metadata_column} @> CAST(:{param} AS jsonb)")
+                params[param] = json.dumps({key: value})
+            
+            elif operator == SearchFilterOperatorEnum.IN.value:
+                in_sql = []
+                for j, item in enumerate(value):
+                    in_sql.append(f"{metadata_column} @> CAST(:{param}_{j} AS jsonb)")
+                    params[f"{param}_{j}"] = json.dumps({key: item})
+                predicates.append("(" + " OR ".join(in_sql) + ")")
+            
+            else:
+                # jsonb compares numbers numerically, the type check keeps strings/objects out of the range
+                predicates.append(
+                    f"(jsonb_typeof({metadata_column} -> '{key}') = 'number' "
+                    f"AND {metadata_column} -> '{key}' {comparison_operators[operator]} CAST(:{param} AS jsonb))"
+                )
+                params[param] = json.dumps(value)
+        
+        return " AND ".join(predicates), params
+    
+    async def apply_search_params(self, session, accuracy: str, top_k: int):
+        """
+        SET LOCAL the index scan parameters of the accuracy profile, they only last for the search transaction.
+        top_k is the number of rows the index scan must return.
+        """
+        search_params = self.get_search_params(accuracy)
+        if search_params.get("exact"):
+            # without index scans the ORDER BY distance is an exact (sequential) nearest neighbour search
+            await session.execute(sql_text("SET LOCAL enable_indexscan = off"))
+            return
+        
+        if search_params.get("hnsw_ef_search"):
+            # hnsw returns at most ef_search rows
+            ef_search = max(int(search_params["hnsw_ef_search"]), top_k)
+            await session.execute(sql_text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+        if search_params.get("ivfflat_probes"):
+            await session.execute(sql_text(f"SET LOCAL ivfflat.probes = {int(search_params['ivfflat_probes'])}"))
+    
+    def get_score_sql(self, distance_sql: str) -> str:
+        """Turn the distance expression into a similarity score (higher is better)."""
+        if self.distance_metric == DistanceMetric.DOT_PRODUCT:
+            # <#> returns the negative inner product
+            return f"(({distance_sql}) * -1)"
+        if self.distance_metric == DistanceMetric.EUCLIDEAN:
+            return f"(1 / (1 + ({distance_sql})))"
+        return f"(1 - ({distance_sql}))"
@@ -0,0 +1,424 @@
+from .pgvector_db_provider import PgVectorDBProvider
+from ..vector_db_enums import PgVectorTableSchemaEnum, PgVectorIndexTypeEnum
+from typing import List
+from sqlalchemy.sql import text as sql_text
+import json
+import re
+
+
+# collection names are built by NLPCntroller.create_collection_name
+COLLECTION_NAME_PATTERN = re.compile(r"^collection_(\d+)_(\d+)$")
+
+
+class PgVectorPartitionedDBProvider(PgVectorDBProvider):
+    """
+    pgvector storage using one table per vector dimension (pgvector_{dim}), hash-partitioned by project_id,
+    instead of one table per collection. A collection (collection_{dim}_{project_id}) is the set of rows of
+    its project, registered in the pgvector_collections table. Each partition has its own vector index,
+    created with the table, so the number of tables and indexes doesn't grow with the number of projects.
+    """
+
+    def __init__(self, db_client, default_vector_dimension: int = 768,
+                 default_distance_method: str = None, index_threshold: int = 1000,
+                 index_type: str = PgVectorIndexTypeEnum.HNSW.value, hnsw_m: int = 16,
+                 hnsw_ef_construction: int = 64, ivfflat_lists: int = 0,
+                 search_profiles: dict = None, default_search_profile: str = None,
+                 filter_indexed_keys: dict = None, text_search_config: str = "simple", hybrid_candidates: int = 50,
+                 rrf_k: int = 60, vector_weight: float = 1.0, lexical_weight: float = 1.0,
+                 partitions_count: int = 64, iterative_scan: str = None):
+        super().__init__(
+            db_client=db_client,
+            default_vector_dimension=default_vector_dimension,
+            default_distance_method=default_distance_method,
+            index_threshold=index_threshold,
+            index_type=index_type,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            ivfflat_lists=ivfflat_lists,
+            search_profiles=search_profiles,
+            default_search_profile=default_search_profile,
+            filter_indexed_keys=filter_indexed_keys,
+            iterative_scan=iterative_scan,
+            text_search_config=text_search_config,
+            hybrid_candidates=hybrid_candidates,
+            rrf_k=rrf_k,
+            vector_weight=vector_weight,
+            lexical_weight=lexical_weight
+        )
+        self.partitions_count = partitions_count
+        self.registry_table = f"{self.pgvector_table_prefix}_collections"
+        # dimensions whose partitioned table is known to exist
+        self.tables_ready = set()
+        # dimensions whose table has the tsvector column (tables created before hybrid search get it from the
+        # add_collection_text_search migration)
+        self.text_search_tables = set()
+
+    def get_table_name(self, dimension: int) -> str:
+        return f"{self.pgvector_table_prefix}_{dimension}"
+
+    def get_project_id(self, collection_name: str) -> int:
+        match = COLLECTION_NAME_PATTERN.match(collection_name)
+        if not match:
+            return None
+        return int(match.group(2))
+
+    async def ensure_table(self, dimension: int, index_type: str = None):
+        if dimension in self.tables_ready:
+            return
+
+        index_type = index_type or self.index_type
+        table_name = self.get_table_name(dimension)
+        async with self.db_client() as session:
+            async with session.begin():
+                await session.execute(sql_text(f"""
+                    CREATE TABLE IF NOT EXISTS {self.registry_table} (
+                        collection_name TEXT PRIMARY KEY,
+                        {PgVectorTableSchemaEnum.PROJECT_ID.value} INTEGER NOT NULL,
+                        dimension INTEGER NOT NULL,
+                        created_at TIMESTAMPTZ DEFAULT now()
+                    )
+                """))
+                await session.execute(sql_text(f"""
+                    CREATE TABLE IF NOT EXISTS {table_name} (
+                        {PgVectorTableSchemaEnum.ID.value} BIGSERIAL,
+                        {PgVectorTableSchemaEnum.PROJECT_ID.value} INTEGER NOT NULL,
+                        {PgVectorTableSchemaEnum.TEXT.value} TEXT,
+                        {PgVectorTableSchemaEnum.VECTOR.value} VECTOR({dimension}),
+                        {PgVectorTableSchemaEnum.METADATA.value} JSONB DEFAULT '{{}}',
+                        {PgVectorTableSchemaEnum.CHUNK_ID.value} INTEGER,
+                        {self.get_text_search_column_sql()},
+                        PRIMARY KEY ({PgVectorTableSchemaEnum.ID.value}, {PgVectorTableSchemaEnum.PROJECT_ID.value}),
+                        FOREIGN KEY ({PgVectorTableSchemaEnum.CHUNK_ID.value}) REFERENCES chunks(chunk_id) ON DELETE CASCADE
+                    ) PARTITION BY HASH ({PgVectorTableSchemaEnum.PROJECT_ID.value})
+                """))
+                for remainder in range(self.partitions_count):
+                    await session.execute(sql_text(f"""
+                        CREATE TABLE IF NOT EXISTS {table_name}_p{remainder} PARTITION OF {table_name}
+                        FOR VALUES WITH (MODULUS {self.partitions_count}, REMAINDER {remainder})
+                    """))
+                # indexes on the parent are created on (and attached from) every partition
+                await session.execute(sql_text(f"""
+                    CREATE INDEX IF NOT EXISTS {table_name}_vector_idx ON {table_name}
+                    USING {index_type} ({PgVectorTableSchemaEnum.VECTOR.value} {self.default_distance_method})
+                    {self.get_index_options_sql(index_type, 0)}
+                """))
+                await session.execute(sql_text(f"""
+                    CREATE INDEX IF NOT EXISTS {table_name}_chunk_id_idx ON {table_name}
+                    ({PgVectorTableSchemaEnum.PROJECT_ID.value}, {PgVectorTableSchemaEnum.CHUNK_ID.value})
+                """))
+                for create_index_sql in self.get_filter_indexes_sql(table_name):
+                    await session.execute(sql_text(create_index_sql))
+                # an existing table may predate the column, altering it here would rewrite it under an exclusive lock
+                has_text_search = await self.has_text_search_column(session, table_name)
+                if has_text_search:
+                    await session.execute(sql_text(self.get_text_search_index_sql(table_name)))
+
+        self.tables_ready.add(dimension)
+        if has_text_search:
+            self.text_search_tables.add(dimension)
+
+    async def has_text_search_column(self, session, table_name: str) -> bool:
+        result = await session.execute(sql_text(f"""
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = to_regclass(:table_name) AND attname = '{PgVectorTableSchemaEnum.TEXT_SEARCH.value}'
+        """), {"table_name": table_name})
+        return result.scalar_one_or_none() is not None
+
+    async def get_collection_metadata(self, collection_name: str) -> dict:
+        metadata = self.collections_cache.get(collection_name)
+        if metadata is not None:
+            return metadata
+
+        project_id = self.get_project_id(collection_name)
+        if project_id is None:
+            return None
+
+        async with self.db_client() as session:
+            registry_exists = (await session.execute(
+                sql_text("SELECT to_regclass(:registry_table)"), {"registry_table": self.registry_table}
+            )).scalar_one_or_none()
+            if registry_exists is None:
+                return None
+
+            dimension = (await session.execute(
+                sql_text(f"SELECT dimension FROM {self.registry_table} WHERE collection_name = :collection_name"),
+                {"collection_name": collection_name}
+            )).scalar_one_or_none()
+            if dimension is None:
+                return None
+
+            table_name = self.get_table_name(dimension)
+            row_count = (await session.execute(
+                sql_text(f"SELECT COUNT(*) FROM {table_name} WHERE {PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id"),
+                {"project_id": project_id}
+            )).scalar_one()
+            has_text_search = await self.has_text_search_column(session, table_name)
+
+        self.tables_ready.add(dimension)
+        if has_text_search:
+            self.text_search_tables.add(dimension)
+        metadata = {
+            "dimension": dimension,
+            "row_count": row_count,
+            "has_index": True,
+            "has_text_search": has_text_search,
+            "project_id": project_id,
+            "table_name": table_name
+        }
+        self.collections_cache[collection_name] = metadata
+        return metadata
+
+    async def list_all_collections(self) -> List:
+        async with self.db_client() as session:
+            registry_exists = (await session.execute(
+                sql_text("SELECT to_regclass(:registry_table)"), {"registry_table": self.registry_table}
+            )).scalar_one_or_none()
+            if registry_exists is None:
+                return []
+
+            results = await session.execute(sql_text(
+                f"SELECT collection_name FROM {self.registry_table} ORDER BY collection_name"
+            ))
+            return results.scalars().all()
+
+    async def get_collection_info(self, collection_name: str) -> dict:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            return None
+
+        async with self.db_client() as session:
+            count_sql = sql_text(f"""
+                SELECT COUNT(*) FROM {metadata['table_name']}
+                WHERE {PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id
+            """)
+            count = (await session.execute(count_sql, {"project_id": metadata["project_id"]})).scalar_one()
+
+        return {
+            "table_info": {
+                "collection_name": collection_name,
+                "tablename": metadata["table_name"],
+                "project_id": metadata["project_id"],
+                "dimension": metadata["dimension"],
+                "partitions": self.partitions_count
+            },
+            "count": count
+        }
+
+    async def delete_collection(self, collection_name: str) -> bool:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            self.logger.warning("Collection %s does not exist. Cannot delete.", collection_name)
+            return False
+
+        async with self.db_client() as session:
+            async with session.begin():
+                await session.execute(sql_text(f"""
+                    DELETE FROM {metadata['table_name']}
+                    WHERE {PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id
+                """), {"project_id": metadata["project_id"]})
+                await session.execute(sql_text(
+                    f"DELETE FROM {self.registry_table} WHERE collection_name = :collection_name"
+                ), {"collection_name": collection_name})
+        self.invalidate_collection_metadata(collection_name)
+        return True
+
+    async def create_collection(self, collection_name: str, dimension: int, do_reset: bool = False) -> bool:
+        if do_reset:
+            _ = await self.delete_collection(collection_name)
+
+        if await self.is_collection_exists(collection_name):
+            return False
+
+        project_id = self.get_project_id(collection_name)
+        if project_id is None:
+            self.logger.error("Collection name %s doesn't match collection_{dimension}_{project_id}.", collection_name)
+            return False
+
+        self.logger.info("Creating collection %s with dimension %d in the partitioned table", collection_name, dimension)
+        await self.ensure_table(dimension)
+        async with self.db_client() as session:
+            async with session.begin():
+                await session.execute(sql_text(f"""
+                    INSERT INTO {self.registry_table} (collection_name, {PgVectorTableSchemaEnum.PROJECT_ID.value}, dimension)
+                    VALUES (:collection_name, :project_id, :dimension)
+                    ON CONFLICT (collection_name) DO NOTHING
+                """), {"collection_name": collection_name, "project_id": project_id, "dimension": dimension})
+
+        self.collections_cache[collection_name] = {
+            "dimension": dimension,
+            "row_count": 0,
+            "has_index": True,
+            "has_text_search": dimension in self.text_search_tables,
+            "project_id": project_id,
+            "table_name": self.get_table_name(dimension)
+        }
+        return True
+
+    def get_search_scope(self, collection_name: str, metadata: dict) -> tuple:
+        # the project_id filter prunes the scan to one partition
+        return (
+            metadata["table_name"],
+            [f"{PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id"],
+            {"project_id": metadata["project_id"]}
+        )
+
+    async def is_index_exists(self, collection_name: str) -> bool:
+        # every partition is indexed from the start
+        return await self.is_collection_exists(collection_name)
+
+    async def create_vector_index(self, collection_name: str, index_type: str = None) -> bool:
+        return False
+
+    async def reset_vector_index(self, collection_name: str, index_type: str = None) -> bool:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            return False
+
+        # the index is shared by all the projects of the partition, rebuild it instead of dropping it,
+        # CONCURRENTLY (outside a transaction) so the other projects keep reading and writing meanwhile
+        async with self.db_client() as session:
+            connection = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            await connection.execute(sql_text(f"REINDEX INDEX CONCURRENTLY {metadata['table_name']}_vector_idx"))
+        return True
+
+    async def get_index_build_progress(self, collection_name: str) -> dict:
+        metadata = await self.get_collection_metadata(collection_name)
+        if metadata is None:
+            return None
+
+        # only a reset (REINDEX) builds the index of the partitions after they are created
+        async with self.db_client() as session:
+            progress_sql = sql_text("""
+                SELECT p.phase, p.blocks_total, p.blocks_done, p.tuples_total, p.tuples_done
+                FROM pg_stat_progress_create_index p
+                JOIN pg_inherits i ON i.inhrelid = p.relid
+                JOIN pg_class c ON c.oid = i.inhparent
+                WHERE c.relname = :table_name
+                LIMIT 1
+            """)
+            record = (await session.execute(progress_sql, {"table_name": metadata["table_name"]})).first()
+
+        return {
+            "status": "building" if record is not None else "ready",
+            "row_count": metadata["row_count"],
+            "index_threshold": self.index_threshold,
+            **(dict(record._mapping) if record is not None else {})
+        }
+
+    async def insert_one(self, collection_name: str,
+                         text: str,
+                         vector: List[float],
+                         metadata: dict= None,
+                         record_id: str= None) -> bool:
+
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if collection_metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot insert data.", collection_name)
+            return False
+        if not record_id:
+            self.logger.error("Can not insert new record (vector and text) without record_id (chunk_id) %s.", collection_name)
+            return False
+
+        async with self.db_client() as session:
+            async with session.begin():
+                insert_sql = sql_text(f"""
+                    INSERT INTO {collection_metadata['table_name']} ({PgVectorTableSchemaEnum.PROJECT_ID.value}, {PgVectorTableSchemaEnum.TEXT.value}, {PgVectorTableSchemaEnum.VECTOR.value}, {PgVectorTableSchemaEnum.METADATA.value}, {PgVectorTableSchemaEnum.CHUNK_ID.value})
+                    VALUES (:project_id, :text, :vector, :metadata, :chunk_id)
+                """)
+                await session.execute(insert_sql, {
+                    "project_id": collection_metadata["project_id"],
+                    "text": text,
+                    "vector": "[" + ",".join(map(str, vector)) + "]",
+                    "metadata": json.dumps(metadata) if metadata else None,
+                    "chunk_id": record_id
+                })
+        self.update_row_count(collection_name, 1)
+        return True
+
+    async def insert_many(self, collection_name: str,
+                          texts: List[str],
+                          vectors: List[List[float]],
+                          metadatas: List[dict]= None,
+                          record_ids: List[str]= None,
+                          batch_size: int= 50) -> bool:
+
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if collection_metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot insert data.", collection_name)
+            return False
+
+        if len(vectors) != len(record_ids) or len(texts) != len(record_ids):
+            self.logger.error("Invalid Length the vectors, texts and record_ids must be the same in collection: %s. Cannot insert data.", collection_name)
+            return False
+
+        if not metadatas or len(metadatas) == 0:
+            metadatas = [None] * len(texts)
+
+        project_id = collection_metadata["project_id"]
+        try:
+            async with self.db_client() as session:
+                async with session.begin():
+                    copy_connection = await self.get_copy_connection(session)
+                    for i in range(0, len(texts), batch_size):
+                        records = [
+                            (project_id, _text, _vector, json.dumps(_metadata) if _metadata else None, _chunk_id)
+                            for _text, _vector, _metadata, _chunk_id in zip(
+                                texts[i:i+batch_size], vectors[i:i+batch_size],
+                                metadatas[i:i+batch_size], record_ids[i:i+batch_size]
+                            )
+                        ]
+                        # rows are routed to the project's partition by postgres
+                        await copy_connection.copy_records_to_table(
+                            collection_metadata["table_name"],
+                            records=records,
+                            columns=[
+                                PgVectorTableSchemaEnum.PROJECT_ID.value,
+                                PgVectorTableSchemaEnum.TEXT.value,
+                                PgVectorTableSchemaEnum.VECTOR.value,
+                                PgVectorTableSchemaEnum.METADATA.value,
+                                PgVectorTableSchemaEnum.CHUNK_ID.value
+                            ]
+                        )
+        except Exception as e:
+            self.invalidate_collection_metadata(collection_name)
+            self.logger.error("Error inserting into collection %s: %s", collection_name, str(e))
+            raise
+
+        self.update_row_count(collection_name, len(texts))
+        return True
+
+    async def get_existing_record_ids(self, collection_name: str, record_ids: List) -> set:
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if not record_ids or collection_metadata is None:
+            return set()
+
+        async with self.db_client() as session:
+            select_sql = sql_text(f"""
+                SELECT {PgVectorTableSchemaEnum.CHUNK_ID.value} FROM {collection_metadata['table_name']}
+                WHERE {PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id
+                AND {PgVectorTableSchemaEnum.CHUNK_ID.value} = ANY(:record_ids)
+            """)
+            result = await session.execute(select_sql, {
+                "project_id": collection_metadata["project_id"],
+                "record_ids": list(record_ids)
+            })
+            return set(result.scalars().all())
+
+    async def delete_by_record_ids(self, collection_name: str, record_ids: List) -> bool:
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if not record_ids or collection_metadata is None:
+            return False
+
+        async with self.db_client() as session:
+            async with session.begin():
+                delete_sql = sql_text(f"""
+                    DELETE FROM {collection_metadata['table_name']}
+                    WHERE {PgVectorTableSchemaEnum.PROJECT_ID.value} = :project_id
+                    AND {PgVectorTableSchemaEnum.CHUNK_ID.value} = ANY(:record_ids)
+                """)
+                result = await session.execute(delete_sql, {
+                    "project_id": collection_metadata["project_id"],
+                    "record_ids": list(record_ids)
+                })
+        self.update_row_count(collection_name, -result.rowcount)
+        return True
@@ -1,23 +1,62 @@
 from ..vector_db_interface import VectorDBInterface
-from ..vector_db_enums import DistanceMetric
+from ..vector_db_enums import DistanceMetric, SearchFilterOperatorEnum
+from ..vector_db_filter import parse_search_filter, SearchFilterError, FILTER_KEY_PATTERN, ASSET_FILTER_KEY
 import logging
 from qdrant_client import models, QdrantClient
 from qdrant_client.models import PointStruct
 from typing import List
+from collections import Counter
 import json
+import re
+import zlib
 from models.db_schemes import RetrievedDocument
 
 
+# named sparse vector holding the term weights of the chunk text, for hybrid search
+SPARSE_VECTOR_NAME = "text"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# qdrant's default indexing_threshold (kB), restored after a bulk load of a collection that didn't set its own
+DEFAULT_INDEXING_THRESHOLD = 10000
+
+
+def encode_sparse_text(text: str, is_query: bool = False, k1: float = 1.2) -> models.SparseVector:
+    """
+    Hashed bag of words: one dimension per token (crc32), weighted by bm25's saturated term frequency
+    for documents and 1 for queries. The collection applies the IDF modifier, which completes bm25.
+    """
+    counts = Counter(token.casefold() for token in TOKEN_PATTERN.findall(text or ""))
+    weights = {}
+    for token, count in counts.items():
+        index = zlib.crc32(token.encode("utf-8"))
+        weights[index] = weights.get(index, 0.0) + (1.0 if is_query else count * (k1 + 1) / (count + k1))
+    return models.SparseVector(indices=list(weights.keys()), values=list(weights.values()))
+
+
 class QdrantDBProvider(VectorDBInterface):
     
     def __init__(self, db_client: str, default_distance_method: str, 
                  default_vector_dimension: int = 768,
-                 index_threshold: int = 1000):
+                 index_threshold: int = 1000,
+                 search_profiles: dict = None, default_search_profile: str = None,
+                 filter_indexed_keys: dict = None, hybrid_candidates: int = 50, rrf_k: int = 60,
+                 vector_weight: float = 1.0, lexical_weight: float = 1.0):
         
         self.client = None
         self.db_client = db_client
         self.default_vector_dimension = default_vector_dimension
         self.index_threshold = index_threshold
+        # accuracy profile name -> {"hnsw_ef_search", "exact"} (ivfflat_probes doesn't apply to qdrant)
+        self.search_profiles = search_profiles or {}
+        self.default_search_profile = default_search_profile
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        # metadata key -> payload index type (integer, float, keyword), the asset id is always indexed
+        self.filter_indexed_keys = {
+            ASSET_FILTER_KEY: models.PayloadSchemaType.INTEGER.value,
+            **{key: value for key, value in (filter_indexed_keys or {}).items() if FILTER_KEY_PATTERN.match(key)}
+        }
         self.distance_metric = None
         if default_distance_method == DistanceMetric.COSINE.value:
             self.distance_metric = models.Distance.COSINE
@@ -27,6 +66,12 @@ class QdrantDBProvider(VectorDBInterface):
             self.distance_metric = models.Distance.EUCLIDEAN
         self.logger = logging.getLogger("uvicorn")
         
+        # collection_name -> {"dimension", "row_count"} for the collections known to exist,
+        # kept up to date by create/delete/insert so the hot paths skip the collection_exists calls
+        self.collections_cache = {}
+        # collection_name -> [nesting count, indexing_threshold to restore] for the collections being bulk loaded
+        self.bulk_loads = {}
+        
         
     async def connect(self):
         self.client = QdrantClient(path=self.db_client)
@@ -34,10 +79,37 @@ class QdrantDBProvider(VectorDBInterface):
     
     async def disconnect(self):
         self.client = None
+        self.collections_cache = {}
         self.logger.info("Disconnected from Qdrant database")
     
+    async def get_collection_metadata(self, collection_name: str) -> dict:
+        """Cached metadata of an existing collection, loaded on first use. None if it doesn't exist."""
+        metadata = self.collections_cache.get(collection_name)
+        if metadata is not None:
+            return metadata
+        
+        if not self.client.collection_exists(collection_name=collection_name):
+            return None
+        
+        collection_info = self.client.get_collection(collection_name=collection_name)
+        metadata = {
+            "dimension": collection_info.config.params.vectors.size,
+            "row_count": collection_info.points_count or 0,
+            "has_sparse": SPARSE_VECTOR_NAME in (collection_info.config.params.sparse_vectors or {})
+        }
+        self.collections_cache[collection_name] = metadata
+        return metadata
+    
+    def invalidate_collection_metadata(self, collection_name: str):
+        self.collections_cache.pop(collection_name, None)
+    
+    def update_row_count(self, collection_name: str, delta: int):
+        metadata = self.collections_cache.get(collection_name)
+        if metadata is not None:
+            metadata["row_count"] = max(metadata["row_count"] + delta, 0)
+    
     async def is_collection_exists(self, collection_name: str) -> bool:
-        return self.client.collection_exists(collection_name=collection_name)
+        return await self.get_collection_metadata(collection_name) is not None
     
     async def list_all_collections(self) -> List:
         return self.client.get_collections()
@@ -49,6 +121,7 @@ class QdrantDBProvider(VectorDBInterface):
         if not await self.is_collection_exists(collection_name):
             self.logger.warning("Collection %s does not exist. Cannot delete.", collection_name)
             return
+        self.invalidate_collection_metadata(collection_name)
         return self.client.delete_collection(collection_name=collection_name)
     
     async def create_collection(self, collection_name: str, dimension: int, do_reset: bool = False):
@@ -63,18 +136,56 @@ class QdrantDBProvider(VectorDBInterface):
                 vectors_config = models.VectorParams(
                     size= dimension,
                     distance= self.distance_metric
-                )
+                ),
+                sparse_vectors_config = {
+                    SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+                }
             )
+            for key, schema_type in self.filter_indexed_keys.items():
+                try:
+                    self.client.create_payload_index(
+                        collection_name=collection_name,
+                        field_name=f"metadata.{key}",
+                        field_schema=models.PayloadSchemaType(schema_type)
+                    )
+                except Exception as e:
+                    self.logger.warning("Could not create payload index on %s for collection %s: %s", key, collection_name, str(e))
+            self.collections_cache[collection_name] = {"dimension": dimension, "row_count": 0, "has_sparse": True}
             return True
         return False
     
+    def get_qdrant_filter(self, filter: dict):
+        """Translate a search filter (see parse_search_filter) into a qdrant Filter, None when there is no condition."""
+        conditions = []
+        for key, operator, value in parse_search_filter(filter):
+            # the chunk metadata (asset id included) is stored under the "metadata" payload key
+            field_name = f"metadata.{key}"
+            if operator == SearchFilterOperatorEnum.IN.value:
+                conditions.append(models.FieldCondition(key=field_name, match=models.MatchAny(any=value)))
+            elif operator == SearchFilterOperatorEnum.EQ.value and isinstance(value, float):
+                # MatchValue only takes strings, integers and booleans
+                conditions.append(models.FieldCondition(key=field_name, range=models.Range(gte=value, lte=value)))
+            elif operator == SearchFilterOperatorEnum.EQ.value:
+                conditions.append(models.FieldCondition(key=field_name, match=models.MatchValue(value=value)))
+            else:
+                conditions.append(models.FieldCondition(key=field_name, range=models.Range(**{operator: value})))
+        
+        return models.Filter(must=conditions) if conditions else None
+    
+    def get_point_vector(self, collection_metadata: dict, text: str, vector: List[float]):
+        # collections created before hybrid search have no sparse vector
+        if not collection_metadata.get("has_sparse"):
+            return vector
+        return {"": vector, SPARSE_VECTOR_NAME: encode_sparse_text(text)}
+    
     async def insert_one(self, collection_name: str,
                    text: str,
                    vector: List[float],
                    record_id: str,
                    metadata: dict= None):
         
-        if not await self.is_collection_exists(collection_name):
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if collection_metadata is None:
             self.logger.error("Collection %s does not exist. Cannot insert data.", collection_name)
             return False
         
@@ -85,7 +196,7 @@ class QdrantDBProvider(VectorDBInterface):
                 points= [
                     PointStruct(
                         id=record_id,
-                        vector=vector,
+                        vector=self.get_point_vector(collection_metadata, text, vector),
                         payload= {
                             "text": text,
                             "metadata": metadata
@@ -96,6 +207,7 @@ class QdrantDBProvider(VectorDBInterface):
         except Exception as e:
             self.logger.error("Error inserting record: %s", str(e))
             return False
+        self.update_row_count(collection_name, 1)
         return True
         
     async def insert_many(self, collection_name: str,
@@ -105,6 +217,11 @@ class QdrantDBProvider(VectorDBInterface):
                     metadatas: List[dict]= None,
                     batch_size: int= 50) -> bool:
                         
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if collection_metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot insert data.", collection_name)
+            return False
+        
         if metadatas is None:
             metadatas = [None] * len(texts)
 
@@ -122,7 +239,7 @@ class QdrantDBProvider(VectorDBInterface):
             for text, vector, record_id, metadata in zip(batch_texts, batch_vectors, batch_record_ids, batch_metadatas):
                 point = PointStruct(
                     id= record_id,
-                    vector= vector,
+                    vector= self.get_point_vector(collection_metadata, text, vector),
                     payload= {
                         "text": text,
                         "metadata": metadata
@@ -138,18 +255,65 @@ class QdrantDBProvider(VectorDBInterface):
             except Exception as e:
                 self.logger.error("Error inserting batch starting at index %d: %s", i, str(e))
                 return False
+        self.update_row_count(collection_name, len(texts))
         return True
     
 
+    async def get_existing_record_ids(self, collection_name: str, record_ids: List) -> set:
+        if not record_ids or not await self.is_collection_exists(collection_name):
+            return set()
+        
+        points = self.client.retrieve(
+            collection_name= collection_name,
+            ids= record_ids,
+            with_payload= False,
+            with_vectors= False
+        )
+        return {point.id for point in points}
+    
+    async def delete_by_record_ids(self, collection_name: str, record_ids: List) -> bool:
+        if not record_ids or not await self.is_collection_exists(collection_name):
+            return False
+        
+        try:
+            _ = self.client.delete(
+                collection_name= collection_name,
+                points_selector= models.PointIdsList(points=record_ids),
+                wait= True
+            )
+        except Exception as e:
+            self.logger.error("Error deleting records from %s: %s", collection_name, str(e))
+            return False
+        self.update_row_count(collection_name, -len(record_ids))
+        return True
+    
     async def search_by_vector(self, collection_name: str,
                          query_vector: List[float],
-                         top_k: int= 5) -> List[dict]:
+                         top_k: int= 5,
+                         filter: dict= None,
+                         accuracy: str= None) -> List[dict]:
+        
+        # served from the metadata cache, no round trip
+        if not await self.is_collection_exists(collection_name):
+            self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
+            return False
         
+        search_params = self.get_search_params(accuracy)
+        try:
+            query_filter = self.get_qdrant_filter(filter)
+        except SearchFilterError as e:
+            self.logger.error("Invalid search filter for collection %s: %s", collection_name, str(e))
+            raise
         
         results = self.client.query_points(
             collection_name= collection_name,
             query= query_vector,
-            limit= top_k
+            query_filter= query_filter,
+            limit= top_k,
+            search_params= models.SearchParams(
+                hnsw_ef= max(int(search_params["hnsw_ef_search"]), top_k) if search_params.get("hnsw_ef_search") else None,
+                exact= bool(search_params.get("exact"))
+            )
         )
         
         if not results.points:
@@ -157,18 +321,194 @@ class QdrantDBProvider(VectorDBInterface):
         
         return [
             RetrievedDocument(**{
+                "chunk_id": result.id,
                 "score": result.score,
                 "text": result.payload['text']
             })
             for result in results.points
         ]
+    
+    async def search_by_vectors(self, collection_name: str,
+                                query_vectors: List[List[float]],
+                                top_k: int= 5,
+                                filter: dict= None,
+                                accuracy: str= None) -> List[List[dict]]:
         
+        if not await self.is_collection_exists(collection_name):
+            self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
+            return False
         
+        search_params = self.get_search_params(accuracy)
+        try:
+            query_filter = self.get_qdrant_filter(filter)
+        except SearchFilterError as e:
+            self.logger.error("Invalid search filter for collection %s: %s", collection_name, str(e))
+            raise
         
+        if not query_vectors:
+            return []
         
+        batch_results = self.client.query_batch_points(
+            collection_name= collection_name,
+            requests= [
+                models.QueryRequest(
+                    query= query_vector,
+                    filter= query_filter,
+                    limit= top_k,
+                    params= models.SearchParams(
+                        hnsw_ef= max(int(search_params["hnsw_ef_search"]), top_k) if search_params.get("hnsw_ef_search") else None,
+                        exact= bool(search_params.get("exact"))
+                    ),
+                    with_payload= True
+                )
+                for query_vector in query_vectors
+            ]
+        )
         
-            
-
-                    
+        return [
+            [
+                RetrievedDocument(**{
+                    "chunk_id": result.id,
+                    "score": result.score,
+                    "text": result.payload['text']
+                })
+                for result in results.points
+            ]
+            for results in batch_results
+        ]
+    
+    async def hybrid_search(self, collection_name: str,
+                            query_text: str,
+                            query_vector: List[float],
+                            top_k: int= 5,
+                            filter: dict= None,
+                            accuracy: str= None,
+                            vector_weight: float= None,
+                            lexical_weight: float= None) -> List[dict]:
+        """
+        Dense and sparse (bm25) searches sent in one query_batch_points call,
+        fused with weighted reciprocal rank fusion: sum(weight / (rrf_k + rank)).
+        """
+        collection_metadata = await self.get_collection_metadata(collection_name)
+        if collection_metadata is None:
+            self.logger.error("Collection %s does not exist. Cannot search data.", collection_name)
+            return False
+        
+        if not collection_metadata.get("has_sparse"):
+            self.logger.warning("Collection %s has no sparse vectors (re-index it with do_reset), using vector search", collection_name)
+            return await self.search_by_vector(collection_name, query_vector, top_k=top_k, filter=filter, accuracy=accuracy)
+        
+        search_params = self.get_search_params(accuracy)
+        try:
+            query_filter = self.get_qdrant_filter(filter)
+        except SearchFilterError as e:
+            self.logger.error("Invalid search filter for collection %s: %s", collection_name, str(e))
+            raise
+        
+        candidates = max(self.hybrid_candidates, top_k)
+        vector_results, lexical_results = self.client.query_batch_points(
+            collection_name= collection_name,
+            requests= [
+                models.QueryRequest(
+                    query= query_vector,
+                    filter= query_filter,
+                    limit= candidates,
+                    params= models.SearchParams(
+                        hnsw_ef= max(int(search_params["hnsw_ef_search"]), candidates) if search_params.get("hnsw_ef_search") else None,
+                        exact= bool(search_params.get("exact"))
+                    ),
+                    with_payload= True
+                ),
+                models.QueryRequest(
+                    query= encode_sparse_text(query_text, is_query=True),
+                    using= SPARSE_VECTOR_NAME,
+                    filter= query_filter,
+                    limit= candidates,
+                    with_payload= True
+                )
+            ]
+        )
+        
+        scores, texts = {}, {}
+        for weight, results in (
+            (self.vector_weight if vector_weight is None else vector_weight, vector_results),
+            (self.lexical_weight if lexical_weight is None else lexical_weight, lexical_results)
+        ):
+            for rank, point in enumerate(results.points, start=1):
+                scores[point.id] = scores.get(point.id, 0.0) + weight / (self.rrf_k + rank)
+                texts[point.id] = point.payload["text"]
+        
+        return [
+            RetrievedDocument(**{
+                "chunk_id": point_id,
+                "score": score,
+                "text": texts[point_id]
+            })
+            for point_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        ]
+    
+    async def begin_bulk_load(self, collection_name: str):
+        """Turn off HNSW indexing (indexing_threshold=0) until end_bulk_load, Qdrant then indexes the segments once."""
+        if collection_name in self.bulk_loads:
+            self.bulk_loads[collection_name][0] += 1
+            return
+        
+        if not await self.is_collection_exists(collection_name):
+            return
+        
+        try:
+            collection_info = self.client.get_collection(collection_name=collection_name)
+            indexing_threshold = collection_info.config.optimizer_config.indexing_threshold
+            if indexing_threshold is None:
+                # None in the diff of end_bulk_load would mean "no change" and leave the indexing off
+                indexing_threshold = DEFAULT_INDEXING_THRESHOLD
+            self.client.update_collection(
+                collection_name=collection_name,
+                optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
+            )
+        except Exception as e:
+            self.logger.warning("Could not defer indexing of collection %s: %s", collection_name, str(e))
+            return
+        self.bulk_loads[collection_name] = [1, indexing_threshold]
+    
+    async def end_bulk_load(self, collection_name: str) -> bool:
+        bulk_load = self.bulk_loads.get(collection_name)
+        if bulk_load is None:
+            return False
+        
+        bulk_load[0] -= 1
+        if bulk_load[0] > 0:
+            return False
+        self.bulk_loads.pop(collection_name)
+        
+        try:
+            self.client.update_collection(
+                collection_name=collection_name,
+                optimizers_config=models.OptimizersConfigDiff(indexing_threshold=bulk_load[1])
+            )
+        except Exception as e:
+            self.logger.error("Could not restore indexing of collection %s: %s", collection_name, str(e))
+            return False
+        return True
+    
+    async def get_index_build_progress(self, collection_name: str) -> dict:
+        if not await self.is_collection_exists(collection_name):
+            return None
+        
+        collection_info = self.client.get_collection(collection_name=collection_name)
+        points_count = collection_info.points_count or 0
+        indexed_count = collection_info.indexed_vectors_count or 0
+        if collection_name in self.bulk_loads:
+            status = "pending"
+        elif collection_info.status == models.CollectionStatus.GREEN:
+            status = "ready" if indexed_count > 0 else "not_indexed"
+        else:
+            status = "building"
         
-        
\ No newline at end of file
+        return {
+            "status": status,
+            "row_count": points_count,
+            "index_threshold": self.index_threshold,
+            "tuples_total": points_count,
+            "tuples_done": indexed_count
+        }
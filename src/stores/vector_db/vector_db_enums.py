@@ -19,15 +19,46 @@ class PgVectorTableSchemaEnum(Enum):
     VECTOR = "vector"
     CHUNK_ID = "chunk_id"
     METADATA = "metadata"
+    PROJECT_ID = "project_id"
+    TEXT_SEARCH = "text_search"
     _PREFIX = "pgvector"
     
 class PgVectorDistanceMethodEnum(Enum):
     COSINE = "vector_cosine_ops"
-    EUCLIDEAN = "vector_euclidean_ops"
-    DOT_PRODUCT = "vector_l2_ops"
+    EUCLIDEAN = "vector_l2_ops"
+    DOT_PRODUCT = "vector_ip_ops"
+
+
+class PgVectorDistanceOperatorEnum(Enum):
+    # operator served by the index built with the matching PgVectorDistanceMethodEnum opclass
+    COSINE = "<=>"
+    EUCLIDEAN = "<->"
+    DOT_PRODUCT = "<#>"
+
+
+class PgVectorLayoutEnum(Enum):
+    # one table (and one vector index) per collection
+    TABLE_PER_COLLECTION = "table_per_collection"
+    # one hash-partitioned table per dimension, collections are rows keyed by project_id
+    PARTITIONED = "partitioned"
 
 
 class PgVectorIndexTypeEnum(Enum):
     IVFFLAT = "ivfflat"
     HNSW = "hnsw"
-    
\ No newline at end of file
+    
+
+
+class SearchFilterOperatorEnum(Enum):
+    EQ = "eq"
+    IN = "in"
+    GT = "gt"
+    GTE = "gte"
+    LT = "lt"
+    LTE = "lte"
+
+
+class SearchModeEnum(Enum):
+    VECTOR = "vector"
+    # vector and full-text search results fused with reciprocal rank fusion
+    HYBRID = "hybrid"
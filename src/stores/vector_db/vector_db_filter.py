@@ -0,0 +1,87 @@
+from .vector_db_enums import SearchFilterOperatorEnum
+from typing import List, Tuple
+import re
+
+
+# keys end up in the pgvector sql (metadata -> 'key'), only plain identifiers are accepted
+FILTER_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# not a metadata key, filters on the asset the chunk was parsed from
+ASSET_FILTER_KEY = "chunk_asset_id"
+
+RANGE_OPERATORS = (
+    SearchFilterOperatorEnum.GT.value,
+    SearchFilterOperatorEnum.GTE.value,
+    SearchFilterOperatorEnum.LT.value,
+    SearchFilterOperatorEnum.LTE.value
+)
+
+
+class SearchFilterError(ValueError):
+    """Invalid search filter, an error of the request rather than of the vector db."""
+
+
+def is_scalar(value) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_in_list(value) -> bool:
+    # qdrant MatchAny only takes a list of strings or a list of integers
+    return isinstance(value, list) and bool(value) and (
+        all(isinstance(v, str) for v in value) or all(is_integer(v) for v in value)
+    )
+
+
+def parse_search_filter(filter: dict) -> List[Tuple[str, str, object]]:
+    """
+    Turn a search filter into (key, operator, value) conditions, all of them must match:
+
+        {"page": 3}                              equality
+        {"source": {"in": ["a.pdf", "b.pdf"]}}   any of the values, all strings or all integers
+        {"page": {"gte": 2, "lt": 10}}           range (gt, gte, lt, lte), numbers only
+        {"chunk_asset_id": {"in": [4, 7]}}       chunks of the given assets, integer ids only
+
+    Keys are chunk metadata keys, or chunk_asset_id. Raises SearchFilterError if the filter is invalid.
+    """
+    if not filter:
+        return []
+    if not isinstance(filter, dict):
+        raise SearchFilterError("filter must be an object")
+
+    conditions = []
+    for key, condition in filter.items():
+        if not FILTER_KEY_PATTERN.match(key):
+            raise SearchFilterError(f"invalid filter key: {key}")
+
+        if is_scalar(condition):
+            condition = {SearchFilterOperatorEnum.EQ.value: condition}
+        if not isinstance(condition, dict) or not condition:
+            raise SearchFilterError(f"invalid filter condition for {key}")
+
+        for operator, value in condition.items():
+            if operator == SearchFilterOperatorEnum.EQ.value:
+                if not is_scalar(value):
+                    raise SearchFilterError(f"{key}: eq expects a string, number or boolean")
+            elif operator == SearchFilterOperatorEnum.IN.value:
+                if not is_in_list(value):
+                    raise SearchFilterError(f"{key}: in expects a non-empty list of strings or a non-empty list of integers")
+            elif operator in RANGE_OPERATORS:
+                if not is_number(value):
+                    raise SearchFilterError(f"{key}: {operator} expects a number")
+            else:
+                raise SearchFilterError(f"{key}: unsupported operator {operator}")
+
+            # compared with the integer chunk_asset_id column, a string or float would only fail in the db
+            if key == ASSET_FILTER_KEY and not all(is_integer(v) for v in (value if isinstance(value, list) else [value])):
+                raise SearchFilterError(f"{key} expects integer asset ids")
+            conditions.append((key, operator, value))
+
+    return conditions
@@ -58,15 +58,69 @@ class VectorDBInterface(ABC):
                     metadatas: List[dict]= None,
                     record_ids: List[str]= None,
                     batch_size: int= 50) -> bool:
-        """Insert multiple vectors or pieces of text into a specific collection."""
+        """Insert multiple vectors or pieces of text into a specific collection, database errors are raised."""
         pass
     
     @abstractmethod
     def search_by_vector(self, collection_name: str,
                          query_vector: List[float],
                          top_k: int= 10,
-                         filter: dict= None) -> List[RetrievedDocument]:
-        """Search for similar vectors in a specific collection using a query vector."""
+                         filter: dict= None,
+                         accuracy: str= None) -> List[RetrievedDocument]:
+        """
+        Search for similar vectors in a specific collection using a query vector, with the given accuracy profile.
+        Returns False if the collection doesn't exist; an invalid filter raises SearchFilterError and database
+        errors are raised too, so they are not taken for an empty result.
+        """
         pass
     
-    
\ No newline at end of file
+    @abstractmethod
+    def search_by_vectors(self, collection_name: str,
+                          query_vectors: List[List[float]],
+                          top_k: int= 10,
+                          filter: dict= None,
+                          accuracy: str= None) -> List[List[RetrievedDocument]]:
+        """Search a specific collection with many query vectors in one round trip, one result list per query vector."""
+        pass
+    
+    @abstractmethod
+    def hybrid_search(self, collection_name: str,
+                      query_text: str,
+                      query_vector: List[float],
+                      top_k: int= 10,
+                      filter: dict= None,
+                      accuracy: str= None,
+                      vector_weight: float= None,
+                      lexical_weight: float= None) -> List[RetrievedDocument]:
+        """Search a specific collection with both the query vector and the query text, ranks fused with weighted RRF."""
+        pass
+    
+    @abstractmethod
+    def get_existing_record_ids(self, collection_name: str, record_ids: List) -> set:
+        """Return the subset of record_ids that are already stored in a specific collection."""
+        pass
+    
+    @abstractmethod
+    def delete_by_record_ids(self, collection_name: str, record_ids: List) -> bool:
+        """Delete the records with the given record_ids from a specific collection."""
+        pass
+    
+    @abstractmethod
+    def begin_bulk_load(self, collection_name: str):
+        """Defer the vector index build of a specific collection while a large batch is being inserted."""
+        pass
+    
+    @abstractmethod
+    def end_bulk_load(self, collection_name: str) -> bool:
+        """End a bulk load started with begin_bulk_load, and build the deferred vector index if needed."""
+        pass
+    
+    @abstractmethod
+    def get_index_build_progress(self, collection_name: str) -> dict:
+        """Return the status and progress of the vector index build of a specific collection."""
+        pass
+    
+    def get_search_params(self, accuracy: str = None) -> dict:
+        """Parameters of the named search profile (the default one when accuracy is None), {} if unknown."""
+        profiles = getattr(self, "search_profiles", None) or {}
+        return profiles.get(accuracy or getattr(self, "default_search_profile", None)) or {}
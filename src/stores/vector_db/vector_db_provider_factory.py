@@ -1,5 +1,5 @@
-from .providers import QdrantDBProvider, PgVectorDBProvider
-from .vector_db_enums import VectorDBType
+from .providers import QdrantDBProvider, PgVectorDBProvider, PgVectorPartitionedDBProvider
+from .vector_db_enums import VectorDBType, PgVectorLayoutEnum
 from controllers import BaseController
 from sqlalchemy.orm import sessionmaker
 
@@ -17,7 +17,36 @@ class VectorDBProviderFactory:
                 db_client=qdrant_db_client, 
                 default_distance_method=self.config.VECTOR_DB_DISTANCE_METRIC,
                 default_vector_dimension=self.config.EMBEDDING_SIZE,
-                index_threshold=self.config.VECTOR_DB_PGVEC_INDEX_THRESHOLD
+                index_threshold=self.config.VECTOR_DB_PGVEC_INDEX_THRESHOLD,
+                search_profiles=self.config.VECTOR_DB_SEARCH_PROFILES,
+                default_search_profile=self.config.VECTOR_DB_SEARCH_DEFAULT_PROFILE,
+                filter_indexed_keys=self.config.VECTOR_DB_FILTER_INDEXED_KEYS,
+                hybrid_candidates=self.config.VECTOR_DB_HYBRID_CANDIDATES,
+                rrf_k=self.config.VECTOR_DB_HYBRID_RRF_K,
+                vector_weight=self.config.VECTOR_DB_HYBRID_VECTOR_WEIGHT,
+                lexical_weight=self.config.VECTOR_DB_HYBRID_LEXICAL_WEIGHT
+            )
+            
+        if provider == VectorDBType.PGVECTOR.value and self.config.VECTOR_DB_PGVEC_LAYOUT == PgVectorLayoutEnum.PARTITIONED.value:
+            return PgVectorPartitionedDBProvider(
+                db_client=self.db_client, 
+                default_distance_method=self.config.VECTOR_DB_DISTANCE_METRIC,
+                default_vector_dimension=self.config.EMBEDDING_SIZE,
+                index_threshold=self.config.VECTOR_DB_PGVEC_INDEX_THRESHOLD,
+                index_type=self.config.VECTOR_DB_PGVEC_INDEX_TYPE,
+                hnsw_m=self.config.VECTOR_DB_PGVEC_HNSW_M,
+                hnsw_ef_construction=self.config.VECTOR_DB_PGVEC_HNSW_EF_CONSTRUCTION,
+                ivfflat_lists=self.config.VECTOR_DB_PGVEC_IVFFLAT_LISTS,
+                search_profiles=self.config.VECTOR_DB_SEARCH_PROFILES,
+                default_search_profile=self.config.VECTOR_DB_SEARCH_DEFAULT_PROFILE,
+                filter_indexed_keys=self.config.VECTOR_DB_FILTER_INDEXED_KEYS,
+                text_search_config=self.config.VECTOR_DB_PGVEC_TEXT_SEARCH_CONFIG,
+                hybrid_candidates=self.config.VECTOR_DB_HYBRID_CANDIDATES,
+                rrf_k=self.config.VECTOR_DB_HYBRID_RRF_K,
+                vector_weight=self.config.VECTOR_DB_HYBRID_VECTOR_WEIGHT,
+                lexical_weight=self.config.VECTOR_DB_HYBRID_LEXICAL_WEIGHT,
+                partitions_count=self.config.VECTOR_DB_PGVEC_PARTITIONS,
+                iterative_scan=self.config.VECTOR_DB_PGVEC_ITERATIVE_SCAN
             )
             
         if provider == VectorDBType.PGVECTOR.value:
@@ -25,7 +54,20 @@ class VectorDBProviderFactory:
                 db_client=self.db_client, 
                 default_distance_method=self.config.VECTOR_DB_DISTANCE_METRIC,
                 default_vector_dimension=self.config.EMBEDDING_SIZE,
-                index_threshold=self.config.VECTOR_DB_PGVEC_INDEX_THRESHOLD
+                index_threshold=self.config.VECTOR_DB_PGVEC_INDEX_THRESHOLD,
+                index_type=self.config.VECTOR_DB_PGVEC_INDEX_TYPE,
+                hnsw_m=self.config.VECTOR_DB_PGVEC_HNSW_M,
+                hnsw_ef_construction=self.config.VECTOR_DB_PGVEC_HNSW_EF_CONSTRUCTION,
+                ivfflat_lists=self.config.VECTOR_DB_PGVEC_IVFFLAT_LISTS,
+                search_profiles=self.config.VECTOR_DB_SEARCH_PROFILES,
+                default_search_profile=self.config.VECTOR_DB_SEARCH_DEFAULT_PROFILE,
+                filter_indexed_keys=self.config.VECTOR_DB_FILTER_INDEXED_KEYS,
+                iterative_scan=self.config.VECTOR_DB_PGVEC_ITERATIVE_SCAN,
+                text_search_config=self.config.VECTOR_DB_PGVEC_TEXT_SEARCH_CONFIG,
+                hybrid_candidates=self.config.VECTOR_DB_HYBRID_CANDIDATES,
+                rrf_k=self.config.VECTOR_DB_HYBRID_RRF_K,
+                vector_weight=self.config.VECTOR_DB_HYBRID_VECTOR_WEIGHT,
+                lexical_weight=self.config.VECTOR_DB_HYBRID_LEXICAL_WEIGHT
             )
             
         else:
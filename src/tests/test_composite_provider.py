@@ -0,0 +1,107 @@
+"""CompositeProvider (stores/llm/providers/composite_provider.py) over fake backends: failover and hedged calls."""
+from stores.llm.providers.composite_provider import CompositeProvider
+from stores.llm.providers.fake_provider import FakeProvider
+from stores.llm.llm_scheduler import LLMCallScheduler, call_priority
+from stores.llm.llm_enums import CallPriorityEnum
+from contextlib import aclosing
+import asyncio
+
+
+def get_fake_provider(name: str, **kwargs) -> FakeProvider:
+    provider = FakeProvider(**{"latency_ms": 10, "latency_sigma": 0.0, "embedding_latency_ms": 0,
+                               "tokens_per_second": 0, "output_tokens": 4, **kwargs})
+    provider.set_generation_model("fake-generation")
+    provider.set_embedding_model("fake-embedding", embedding_size=16)
+    provider.set_scheduler(LLMCallScheduler(name=name, max_retries=0))
+    return provider
+
+
+def get_composite_provider(primary: FakeProvider, backup: FakeProvider, **kwargs) -> CompositeProvider:
+    return CompositeProvider([primary, backup], ["primary", "backup"], **{"hedge_min_samples": 3, **kwargs})
+
+
+async def warm_up(composite: CompositeProvider, calls: int = 3):
+    # the hedge delay is a percentile of the primary latencies, it needs hedge_min_samples of them
+    for _ in range(calls):
+        await composite.agenerate_text("warm up", chat_history=[])
+
+
+def test_failover_to_the_backup():
+    primary, backup = get_fake_provider("primary", error_rate=1.0), get_fake_provider("backup")
+    composite = get_composite_provider(primary, backup)
+
+    answer = asyncio.run(composite.agenerate_text("what do cats eat", chat_history=[]))
+    vectors = asyncio.run(composite.aembed_text(["cats"]))
+
+    assert answer == "what do cats eat"
+    assert vectors == asyncio.run(backup.aembed_text(["cats"]))
+    assert composite.stats["failovers"] == 2
+    assert composite.stats["backup_wins"] == 2
+    assert composite.stats["hedged"] == 0
+
+
+def test_all_providers_failing_return_none():
+    composite = get_composite_provider(get_fake_provider("primary", error_rate=1.0),
+                                       get_fake_provider("backup", error_rate=1.0))
+
+    assert asyncio.run(composite.agenerate_text("hello", chat_history=[])) is None
+    assert composite.stats["failovers"] == 1
+
+
+def test_slow_call_is_hedged_to_the_backup():
+    primary, backup = get_fake_provider("primary"), get_fake_provider("backup")
+    composite = get_composite_provider(primary, backup)
+
+    async def run():
+        await warm_up(composite)
+        primary.latency_ms = 2000
+        answer = await composite.agenerate_text("what do cats eat", chat_history=[])
+        # the losing call is cancelled, let it give its slot back
+        await asyncio.sleep(0.01)
+        return answer
+
+    answer = asyncio.run(run())
+
+    assert answer == "what do cats eat"
+    assert composite.stats["hedged"] == 1
+    assert composite.stats["backup_wins"] == 1
+    assert primary.scheduler.in_flight == 0
+    assert backup.scheduler.in_flight == 0
+
+
+def test_bulk_calls_are_not_hedged():
+    primary, backup = get_fake_provider("primary"), get_fake_provider("backup")
+    composite = get_composite_provider(primary, backup)
+
+    async def run():
+        await warm_up(composite)
+        primary.latency_ms = 100
+        with call_priority(CallPriorityEnum.BULK.value):
+            return await composite.agenerate_text("what do cats eat", chat_history=[])
+
+    assert asyncio.run(run()) == "what do cats eat"
+    assert composite.stats["hedged"] == 0
+    assert composite.stats["backup_wins"] == 0
+
+
+def test_slow_stream_is_hedged_and_the_loser_closed():
+    primary, backup = get_fake_provider("primary"), get_fake_provider("backup")
+    composite = get_composite_provider(primary, backup)
+
+    async def run():
+        for _ in range(3):
+            async with aclosing(composite.astream_text("warm up", chat_history=[])) as stream:
+                _ = [piece async for piece in stream]
+        primary.latency_ms = 2000
+        async with aclosing(composite.astream_text("what do cats eat", chat_history=[])) as stream:
+            pieces = [piece async for piece in stream]
+        await asyncio.sleep(0.01)
+        return pieces
+
+    pieces = asyncio.run(run())
+
+    assert "".join(pieces) == "what do cats eat"
+    assert composite.stats["hedged"] == 1
+    assert composite.stats["backup_wins"] == 1
+    assert primary.scheduler.in_flight == 0
+    assert backup.scheduler.in_flight == 0
@@ -0,0 +1,71 @@
+"""The fake backend (stores/llm/providers/fake_provider.py): deterministic embeddings and answers, injected failures."""
+from stores.llm.providers.fake_provider import FakeProvider, FakeProviderError
+import asyncio
+import math
+import pytest
+
+
+def get_fake_provider(**kwargs) -> FakeProvider:
+    provider = FakeProvider(**{"latency_ms": 0, "embedding_latency_ms": 0, "tokens_per_second": 0, **kwargs})
+    provider.set_generation_model("fake-generation")
+    provider.set_embedding_model("fake-embedding", embedding_size=64)
+    return provider
+
+
+def dot(a: list, b: list) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_embeddings_are_deterministic():
+    texts = ["cats are small furry pets", "the stock market fell today"]
+    vectors = asyncio.run(get_fake_provider().aembed_text(texts))
+    same_seed_vectors = asyncio.run(get_fake_provider().aembed_text(texts))
+    other_seed_vectors = asyncio.run(get_fake_provider(seed=1).aembed_text(texts))
+
+    assert vectors == same_seed_vectors
+    assert vectors != other_seed_vectors
+    # the sync and async calls embed the same way
+    assert get_fake_provider().embed_text(texts) == vectors
+
+
+def test_embeddings_are_normalized_to_the_embedding_size():
+    vectors = asyncio.run(get_fake_provider().aembed_text(["cats are small furry pets", "", "?!"]))
+
+    assert len(vectors) == 3
+    for vector in vectors:
+        assert len(vector) == 64
+        assert math.isclose(math.sqrt(dot(vector, vector)), 1.0)
+
+
+def test_texts_sharing_words_are_closer():
+    query, related, unrelated = asyncio.run(get_fake_provider().aembed_text(
+        ["furry cats", "cats are small furry pets", "the stock market fell today"]
+    ))
+
+    assert dot(query, related) > dot(query, unrelated)
+
+
+def test_answer_is_made_of_the_prompt_words():
+    provider = get_fake_provider(output_tokens=6)
+    answer = asyncio.run(provider.agenerate_text("what do cats eat", chat_history=[]))
+
+    assert answer == "what do cats eat what do"
+    assert answer == asyncio.run(get_fake_provider(output_tokens=6).agenerate_text("what do cats eat", chat_history=[]))
+
+
+def test_unset_models_are_a_configuration_error():
+    provider = FakeProvider()
+
+    assert asyncio.run(provider.agenerate_text("hello", chat_history=[])) is None
+    assert asyncio.run(provider.aembed_text("hello")) is None
+
+
+def test_failing_calls_raise():
+    provider = get_fake_provider(error_rate=1.0)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(provider.agenerate_text("hello", chat_history=[]))
+    with pytest.raises(FakeProviderError):
+        asyncio.run(provider.aembed_text("hello"))
+    # the sync calls keep returning None
+    assert provider.generate_text("hello", chat_history=[]) is None
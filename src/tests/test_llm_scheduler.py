@@ -0,0 +1,153 @@
+"""
+LLMCallScheduler (stores/llm/llm_scheduler.py) with the fake backend: retries, slot release of the calls
+and of the streams, the final error once the retries are exhausted.
+"""
+from stores.llm.llm_scheduler import LLMCallScheduler, LLMRetriesExhaustedError
+from stores.llm.providers.fake_provider import FakeProvider, FakeProviderError
+from contextlib import aclosing
+import asyncio
+import pytest
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+def get_scheduler(**kwargs) -> LLMCallScheduler:
+    return LLMCallScheduler(**{"name": "fake", "max_retries": 3, "retry_base_delay": 0.001, **kwargs})
+
+
+def get_fake_provider(scheduler: LLMCallScheduler, **kwargs) -> FakeProvider:
+    provider = FakeProvider(**{"latency_ms": 0, "embedding_latency_ms": 0, "tokens_per_second": 0, **kwargs})
+    provider.set_generation_model("fake-generation")
+    provider.set_embedding_model("fake-embedding", embedding_size=16)
+    provider.set_scheduler(scheduler)
+    return provider
+
+
+def test_retryable_error_is_retried():
+    scheduler = get_scheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(scheduler.in_flight)
+        if len(attempts) < 3:
+            raise FakeProviderError("unavailable")
+        return "ok"
+
+    assert asyncio.run(scheduler.run(call)) == "ok"
+    # each attempt holds one slot, given back after it
+    assert attempts == [1, 1, 1]
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["retries"] == 2
+    assert scheduler.stats["failures"] == 0
+
+
+def test_retries_exhausted_raise_the_final_error():
+    scheduler = get_scheduler()
+    provider = get_fake_provider(scheduler, error_rate=1.0)
+
+    with pytest.raises(LLMRetriesExhaustedError) as error:
+        asyncio.run(provider.agenerate_text("hello", chat_history=[]))
+
+    assert error.value.status_code == 503
+    assert isinstance(error.value.__cause__, FakeProviderError)
+    assert "after 3 retries" in str(error.value)
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["retries"] == 3
+    assert scheduler.stats["failures"] == 1
+
+
+def test_client_error_is_not_retried():
+    scheduler = get_scheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(True)
+        raise BadRequestError("bad request")
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(scheduler.run(call))
+
+    assert len(attempts) == 1
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["retries"] == 0
+
+
+def test_concurrency_limit_and_slot_release():
+    scheduler = get_scheduler(min_concurrency=1, max_concurrency=2, initial_concurrency=2, latency_tolerance=0)
+    provider = get_fake_provider(scheduler, embedding_latency_ms=5, latency_sigma=0.0, error_rate=0.3)
+    max_in_flight = 0
+
+    async def watch():
+        nonlocal max_in_flight
+        while True:
+            max_in_flight = max(max_in_flight, scheduler.in_flight)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        watcher = asyncio.create_task(watch())
+        try:
+            return await asyncio.gather(*[provider.aembed_text(f"text {i}") for i in range(20)],
+                                        return_exceptions=True)
+        finally:
+            watcher.cancel()
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, (list, LLMRetriesExhaustedError)) for result in results)
+    assert 1 <= max_in_flight <= 2
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["calls"] == 20
+
+
+def test_abandoned_stream_frees_its_slot():
+    scheduler = get_scheduler()
+    provider = get_fake_provider(scheduler, output_tokens=50)
+
+    async def run():
+        async with aclosing(provider.astream_text("one two three", chat_history=[])) as stream:
+            piece = await anext(stream)
+            in_flight = scheduler.in_flight
+        return piece, in_flight
+
+    piece, in_flight_while_streaming = asyncio.run(run())
+
+    assert piece == "one"
+    assert in_flight_while_streaming == 1
+    assert scheduler.in_flight == 0
+
+
+def test_stream_failing_mid_way_is_not_retried():
+    scheduler = get_scheduler()
+    provider = get_fake_provider(scheduler, error_rate=1.0, fail_after_tokens=3, output_tokens=10)
+    pieces = []
+
+    async def run():
+        async with aclosing(provider.astream_text("one two three four", chat_history=[])) as stream:
+            async for piece in stream:
+                pieces.append(piece)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(run())
+
+    # the pieces already sent can't be taken back, so the error goes to the caller
+    assert "".join(pieces) == "one two three"
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["retries"] == 0
+    assert scheduler.stats["failures"] == 1
+
+
+def test_stream_failing_before_its_first_piece_is_retried():
+    scheduler = get_scheduler()
+    provider = get_fake_provider(scheduler, error_rate=1.0, fail_after_tokens=0)
+
+    async def run():
+        async with aclosing(provider.astream_text("one two", chat_history=[])) as stream:
+            return [piece async for piece in stream]
+
+    with pytest.raises(LLMRetriesExhaustedError):
+        asyncio.run(run())
+
+    assert scheduler.in_flight == 0
+    assert scheduler.stats["retries"] == 3
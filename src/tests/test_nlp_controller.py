@@ -0,0 +1,136 @@
+"""
+NLPCntroller end to end, offline: the fake backend for the embeddings and the answers, and a local qdrant
+database (QdrantClient(path=...)) in a temporary directory.
+"""
+from controllers import NLPCntroller
+from models.db_schemes import Project, DataChunk
+from stores.llm.llm_scheduler import LLMCallScheduler
+from stores.llm.providers.fake_provider import FakeProvider
+from stores.llm.templates.template_parser import TemplateParser
+from stores.vector_db.providers.qdrant_db_provider import QdrantDBProvider
+from contextlib import aclosing
+import asyncio
+import pytest
+
+CHUNK_TEXTS = [
+    "cats are small furry pets",
+    "the stock market fell today",
+    "dogs and cats are friendly pets",
+    "rain is expected tomorrow",
+]
+
+
+@pytest.fixture
+def vector_db_client(tmp_path):
+    client = QdrantDBProvider(db_client=str(tmp_path), default_distance_method="cosine", default_vector_dimension=64)
+    asyncio.run(client.connect())
+    yield client
+    asyncio.run(client.disconnect())
+
+
+def get_nlp_controller(vector_db_client, **generation_kwargs) -> NLPCntroller:
+    """generation_kwargs (error_rate, fail_after_tokens...) only apply to the generation client."""
+    generation_client = FakeProvider(**{"latency_ms": 0, "tokens_per_second": 0, "output_tokens": 20, **generation_kwargs})
+    generation_client.set_generation_model("fake-generation")
+    generation_client.set_scheduler(LLMCallScheduler(name="fake-generation", max_retries=1, retry_base_delay=0.001))
+
+    embedding_client = FakeProvider(embedding_latency_ms=0)
+    embedding_client.set_embedding_model("fake-embedding", embedding_size=64)
+    embedding_client.set_scheduler(LLMCallScheduler(name="fake-embedding"))
+
+    return NLPCntroller(vector_db_client=vector_db_client, generation_client=generation_client,
+                        embedding_client=embedding_client, template_parser=TemplateParser(language="en"))
+
+
+def get_chunks(project: Project) -> list:
+    return [
+        DataChunk(chunk_id=index + 1, chunk_text=text, chunk_metadata={}, chunk_order=index + 1,
+                  chunk_project_id=project.project_id, chunk_asset_id=1)
+        for index, text in enumerate(CHUNK_TEXTS)
+    ]
+
+
+def test_index_and_search(vector_db_client):
+    nlp_controller = get_nlp_controller(vector_db_client)
+    project = Project(project_id=1)
+
+    async def run():
+        assert await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        # pushing the same chunks again only skips them
+        assert await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        info = await nlp_controller.get_collection_info(project)
+        return info, await nlp_controller.search_vector_db_collection(project, "furry cats pets", top_k=2)
+
+    info, documents = asyncio.run(run())
+
+    assert info["points_count"] == len(CHUNK_TEXTS)
+    assert [document.chunk_id for document in documents] == [1, 3]
+    assert documents[0].score > documents[1].score
+
+
+def test_answer_rag_question(vector_db_client):
+    nlp_controller = get_nlp_controller(vector_db_client)
+    project = Project(project_id=2)
+
+    async def run():
+        await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        return await nlp_controller.answer_rag_question(project, "furry cats pets", top_k=2)
+
+    answer, full_prompt, chat_history = asyncio.run(run())
+
+    assert "cats are small furry pets" in full_prompt
+    assert "the stock market fell today" not in full_prompt
+    # the fake answer is made of the prompt words
+    assert "furry cats pets" in answer
+    assert chat_history[0]["role"] == "system"
+
+
+def test_failed_generation_returns_no_answer(vector_db_client):
+    nlp_controller = get_nlp_controller(vector_db_client, error_rate=1.0)
+    project = Project(project_id=3)
+
+    async def run():
+        await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        return await nlp_controller.answer_rag_question(project, "furry cats pets", top_k=2)
+
+    answer, full_prompt, _ = asyncio.run(run())
+
+    assert answer is None
+    assert full_prompt is not None
+
+
+def test_stream_abandoned_by_the_client(vector_db_client):
+    nlp_controller = get_nlp_controller(vector_db_client)
+    scheduler = nlp_controller.generation_client.scheduler
+    project = Project(project_id=4)
+
+    async def run():
+        await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        events = []
+        async with aclosing(nlp_controller.stream_rag_answer(project, "furry cats pets", top_k=2)) as stream:
+            async for event, data in stream:
+                events.append(event)
+                if event == "token":
+                    # the client goes away after the first piece
+                    break
+        return events
+
+    events = asyncio.run(run())
+
+    assert events == ["documents", "token"]
+    assert scheduler.in_flight == 0
+
+
+def test_stream_failing_mid_way_ends_with_an_error(vector_db_client):
+    nlp_controller = get_nlp_controller(vector_db_client, error_rate=1.0, fail_after_tokens=3)
+    project = Project(project_id=5)
+
+    async def run():
+        await nlp_controller.index_into_vector_db(project, get_chunks(project))
+        async with aclosing(nlp_controller.stream_rag_answer(project, "furry cats pets", top_k=2)) as stream:
+            return [event async for event, _ in stream]
+
+    events = asyncio.run(run())
+
+    assert events == ["documents", "token", "token", "token", "error"]
+    assert nlp_controller.generation_client.scheduler.in_flight == 0
@@ -0,0 +1,50 @@
+"""
+EXPLAIN checks of the pgvector searches (see benchmarks/pgvector_explain.py): the search of every accuracy
+profile must use the vector index of the collection, except the exact one.
+Skipped when the postgres database of the .env (with the vector extension) can't be reached.
+"""
+from benchmarks.pgvector_explain import get_db_client, check_index_plans
+from helpers import get_settings
+from sqlalchemy.sql import text as sql_text
+import asyncio
+import json
+import pytest
+
+
+async def require_vector_database(db_client):
+    try:
+        async with db_client() as session:
+            result = await asyncio.wait_for(
+                session.execute(sql_text("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'")), timeout=5
+            )
+            has_vector = result.scalar_one_or_none() is not None
+    except Exception as e:
+        pytest.skip(f"no postgres database: {e}")
+    if not has_vector:
+        pytest.skip("the vector extension is not available")
+
+
+@pytest.mark.parametrize("layout,index_type,project_id", [
+    ("table_per_collection", "hnsw", 900001),
+    ("table_per_collection", "ivfflat", 900002),
+    ("partitioned", "hnsw", 900003),
+    ("partitioned", "ivfflat", 900004),
+])
+def test_searches_use_the_vector_index(layout, index_type, project_id):
+    settings = get_settings()
+
+    async def run():
+        engine, db_client = get_db_client(settings)
+        try:
+            await require_vector_database(db_client)
+            return await check_index_plans(db_client, settings, layout, index_type, rows=10000, dim=64, top_k=5,
+                                           project_id=project_id)
+        finally:
+            await engine.dispose()
+
+    index_names, results = asyncio.run(run())
+
+    assert index_names, "the collection has no vector index"
+    assert [accuracy for accuracy, *_ in results] == list(settings.VECTOR_DB_SEARCH_PROFILES)
+    for accuracy, uses_vector_index, expected, plan in results:
+        assert uses_vector_index == expected, f"{accuracy} plan:\n{json.dumps(plan, indent=2)}"
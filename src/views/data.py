@@ -22,12 +22,16 @@ class UploadDataResponse(BaseModel):
 class ProcessDataResponse(BaseModel):
     added_chunks: int
     files_processed: int
+    removed_chunks: int = 0
+    files_skipped: int = 0
     
     model_config = {
         "json_schema_extra": {
             "example": {
                 "added_chunks": 20,
-                "files_processed": 1
+                "files_processed": 1,
+                "removed_chunks": 4,
+                "files_skipped": 2
             }
         }
     }
\ No newline at end of file
@@ -0,0 +1,72 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+
+class JobResponse(BaseModel):
+    job_id: int
+    job_type: str
+    job_status: str
+    project_id: int
+    params: Optional[dict] = None
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_record(cls, job):
+        return cls(
+            job_id=job.job_id,
+            job_type=job.job_type,
+            job_status=job.job_status,
+            project_id=job.job_project_id,
+            params=job.job_params,
+            progress=job.job_progress,
+            result=job.job_result,
+            error=job.job_error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at
+        )
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "job_id": 12,
+                "job_type": "index",
+                "job_status": "running",
+                "project_id": 2,
+                "params": {"do_reset": False, "batch_size": 50},
+                "progress": {"total_chunks": 1200, "chunks_embedded": 450, "chunks_indexed": 450},
+                "result": None,
+                "error": None,
+                "created_at": "2026-10-18T10:00:00Z",
+                "started_at": "2026-10-18T10:00:01Z",
+                "finished_at": None
+            }
+        }
+    }
+    
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse]
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "jobs": [
+                    {
+                        "job_id": 12,
+                        "job_type": "index",
+                        "job_status": "completed",
+                        "project_id": 2,
+                        "progress": {"total_chunks": 1200, "chunks_embedded": 1200, "chunks_indexed": 1200},
+                        "result": {"inserted_items_count": 1200}
+                    }
+                ]
+            }
+        }
+    }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 from models.db_schemes.minirag.schemes.data_chunk import RetrievedDocument
 
 
@@ -65,4 +65,152 @@ class NLPAnswerResponse(BaseModel):
                 "answer": "This is a generated answer based on the retrieved documents and the query."
             }
         }
-    }
\ No newline at end of file
+    }
+
+
+class NLPBatchSearchResponse(BaseModel):
+    results: List[List[RetrievedDocument]]
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "results": [
+                    [
+                        {
+                            "text": "This is a sample chunk of text.",
+                            "score": 0.95
+                        }
+                    ],
+                    [
+                        {
+                            "text": "A chunk relevant to the second query.",
+                            "score": 0.91
+                        }
+                    ]
+                ]
+            }
+        }
+    }
+
+
+class AnswerCacheStatsResponse(BaseModel):
+    enabled: bool
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    stale_puts: int = 0
+    hit_rate: float = 0.0
+    projects: int = 0
+    entries: int = 0
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "enabled": True,
+                "exact_hits": 120,
+                "semantic_hits": 35,
+                "misses": 45,
+                "invalidations": 2,
+                "stale_puts": 0,
+                "hit_rate": 0.775,
+                "projects": 3,
+                "entries": 45
+            }
+        }
+    }
+
+
+class HistogramResponse(BaseModel):
+    buckets: Dict[str, int] = {}
+    count: int = 0
+    sum: float = 0.0
+    mean: float = 0.0
+
+
+class EmbeddingBatchStatsResponse(BaseModel):
+    enabled: bool
+    batches: int = 0
+    texts: int = 0
+    failed_batches: int = 0
+    window_ms: float = 0.0
+    max_batch_size: int = 0
+    batch_size: HistogramResponse = HistogramResponse()
+    wait_ms: HistogramResponse = HistogramResponse()
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "enabled": True,
+                "batches": 3,
+                "texts": 10,
+                "failed_batches": 0,
+                "window_ms": 5.0,
+                "max_batch_size": 64,
+                "batch_size": {"buckets": {"1": 1, "2": 1, "4": 2, "8": 3, "+Inf": 3}, "count": 3, "sum": 10, "mean": 3.33},
+                "wait_ms": {"buckets": {"1": 2, "2": 3, "5": 9, "10": 10, "+Inf": 10}, "count": 10, "sum": 31.5, "mean": 3.15}
+            }
+        }
+    }
+
+
+class LLMSchedulerStats(BaseModel):
+    backend: str
+    calls: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    failures: int = 0
+    concurrency_limit: int = 0
+    in_flight: int = 0
+    waiting: Dict[str, int] = {}
+    latency_seconds: Dict[str, float] = {}
+
+
+class LLMSchedulerStatsResponse(BaseModel):
+    enabled: bool
+    schedulers: List[LLMSchedulerStats] = []
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "enabled": True,
+                "schedulers": [{
+                    "backend": "gemini",
+                    "calls": 1520,
+                    "retries": 12,
+                    "rate_limited": 9,
+                    "failures": 0,
+                    "concurrency_limit": 6,
+                    "in_flight": 4,
+                    "waiting": {"interactive": 0, "bulk": 17},
+                    "latency_seconds": {"embedding": 0.31, "generation": 2.4}
+                }]
+            }
+        }
+    }
+
+
+class NLPIndexBuildResponse(BaseModel):
+    status: str
+    row_count: int
+    index_threshold: int
+    phase: Optional[str] = None
+    blocks_total: Optional[int] = None
+    blocks_done: Optional[int] = None
+    tuples_total: Optional[int] = None
+    tuples_done: Optional[int] = None
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "status": "building",
+                "row_count": 120000,
+                "index_threshold": 8000,
+                "phase": "building index: loading tuples in tree",
+                "blocks_total": 0,
+                "blocks_done": 0,
+                "tuples_total": 120000,
+                "tuples_done": 48213
+            }
+        }
+    }